@@ -3,19 +3,73 @@
 Here reused variables should be defined.
 """
 
+from typing import Optional, Sequence, Union
+
+import numpy as np
 import xarray as xr
 
+from porous_media.data.xdmf_calculations import (
+    map_time_chunks,
+    zone_edges,
+    zone_indices,
+)
+
+
+# cell volume variables of the simulations in order of preference
+VOLUME_VARIABLES: list[str] = ["element_volume_point_TPM", "element_volume_TPM"]
+
+# volume weighted totals of the ensemble metrics, {name: variable}
+TOTAL_VARIABLES: dict[str, str] = {
+    "substrate": "rr_(S_ext)",
+    "product": "rr_(P_ext)",
+    "toxin": "rr_(T)",
+}
+
+
+def _volume_variable(xr_cells: xr.Dataset, volume_variable: Optional[str]) -> str:
+    """Get the cell volume variable of the dataset."""
+    if volume_variable is not None:
+        candidates = [volume_variable]
+    else:
+        candidates = VOLUME_VARIABLES
+    for name in candidates:
+        if name in xr_cells:
+            return name
+    raise ValueError(f"No volume variable {candidates} in cell data: {xr_cells}")
 
-def calculate_necrosis_fraction(xr_cells: xr.Dataset) -> xr.Dataset:
+
+def _validate_necrosis(necrosis: np.ndarray) -> None:
+    """Check that necrosis is in [0, 1]."""
+    dmin, dmax = float(np.min(necrosis)), float(np.max(necrosis))
+    if dmin < 0.0:
+        raise ValueError(f"'necrosis' must be => 0.0, but minimum is {dmin}")
+    if dmax > 1.0:
+        raise ValueError(f"'necrosis' must be <= 1.0, but maximum is {dmax}")
+
+
+def calculate_necrosis_fraction(
+    xr_cells: xr.Dataset, max_memory: Optional[int] = None
+) -> xr.Dataset:
     """Calculate the necrosis fraction from a given geometry.
 
     The necrosis and cell volumes are used to calculate the fraction.
 
+    :param max_memory: memory limit in bytes, the fraction is calculated chunk by
+        chunk over time, e.g. for lazy datasets.
+
     returns necrosis_fraction in [0, 1]
     """
 
-    if not hasattr(xr_cells, "rr_necrosis"):
+    if "rr_necrosis" not in xr_cells:
         raise ValueError(f"No attribute/variable 'necrosis' in cell data: {xr_cells}")
+    volume_key = _volume_variable(xr_cells, volume_variable=None)
+
+    if max_memory is not None:
+        return map_time_chunks(
+            xr_cells[["rr_necrosis", volume_key]],
+            calculate_necrosis_fraction,
+            max_memory=max_memory,
+        )
 
     necrosis = xr_cells.rr_necrosis
     # replace necrosis values > 0 with 1.0 (partial necrosis is necrosis)
@@ -25,15 +79,8 @@ def calculate_necrosis_fraction(xr_cells: xr.Dataset) -> xr.Dataset:
     # necrosis = necrosis.where(necrosis > 1E-3, 1.0)
     # console.print("after:")
 
-    if "element_volume_point_TPM" in xr_cells:
-        cell_volumes = xr_cells.element_volume_point_TPM
-    else:
-        # FIXME: bugfix
-        cell_volumes = xr_cells.element_volume_TPM
-    if necrosis.min() < 0.0:
-        raise ValueError(f"'necrosis' must be => 0.0, but minimum is {necrosis.min()}")
-    if necrosis.max() > 1.0:
-        raise ValueError(f"'necrosis' must be <= 1.0, but maximum is {necrosis.max()}")
+    cell_volumes = xr_cells[volume_key]
+    _validate_necrosis(necrosis.values)
 
     # calculate necrosis fraction over time
     necrosis_fraction: xr.Dataset = (necrosis * cell_volumes).sum(
@@ -41,3 +88,100 @@ def calculate_necrosis_fraction(xr_cells: xr.Dataset) -> xr.Dataset:
     ) / cell_volumes.sum(dim="cell")
 
     return necrosis_fraction
+
+
+def calculate_ensemble_metrics(
+    xr_ensemble: xr.Dataset,
+    zones: Union[int, Sequence[float]] = 10,
+    volume_variable: Optional[str] = None,
+    position_variable: str = "rr_position",
+    max_memory: Optional[int] = None,
+) -> xr.Dataset:
+    """Calculate the liver metrics for all simulations of the ensemble.
+
+    The metrics are calculated in a single vectorised pass over the (sim, time,
+    cell) data, the necrosis is validated on the loaded data:
+    - volume: total cell volume
+    - necrosis_fraction: volume fraction of necrosis
+    - necrosis_zone: volume fraction of necrosis per PP-PV zone, the cells are
+      binned by the positions of the last timepoint
+    - <name>_total: volume weighted totals of the `TOTAL_VARIABLES`
+
+    :param xr_ensemble: ensemble cell dataset, see `ensemble_dataset`.
+    :param zones: number of equidistant zones or zone edges.
+    :param volume_variable: cell volume variable, see `VOLUME_VARIABLES` by default.
+    :param position_variable: cell positions for the zones, the zones are
+        omitted if the variable does not exist.
+    :param max_memory: memory limit in bytes, the metrics are calculated chunk by
+        chunk over the simulations, e.g. for lazy datasets.
+    :returns: Dataset with dims (sim, time[, zone]) and the sim coordinates.
+    """
+    if "rr_necrosis" not in xr_ensemble:
+        raise ValueError(f"No variable 'rr_necrosis' in ensemble: {xr_ensemble}")
+    volume_key = _volume_variable(xr_ensemble, volume_variable)
+    totals = {name: sid for name, sid in TOTAL_VARIABLES.items() if sid in xr_ensemble}
+    variables = ["rr_necrosis", volume_key, *totals.values()]
+    if position_variable in xr_ensemble:
+        variables.append(position_variable)
+    edges = zone_edges(zones)
+    num_zones = len(edges) - 1
+
+    def metrics(ds: xr.Dataset) -> xr.Dataset:
+        """Metrics of the loaded simulations."""
+
+        def values(name: str) -> np.ndarray:
+            return np.asarray(
+                ds[name].transpose("sim", "time", "cell").values, dtype=float
+            )
+
+        necrosis = values("rr_necrosis")
+        _validate_necrosis(necrosis)
+        volume = values(volume_key)
+        volume_total = volume.sum(axis=2)
+        necrosis_volume = necrosis * volume
+
+        data_vars: dict[str, tuple[tuple[str, ...], np.ndarray]] = {
+            "volume": (("sim", "time"), volume_total),
+            "necrosis_fraction": (
+                ("sim", "time"),
+                necrosis_volume.sum(axis=2) / volume_total,
+            ),
+        }
+        if position_variable in ds:
+            # (sim, cell, zone) indicator of the zones
+            zone = zone_indices(values(position_variable)[:, -1, :], edges)
+            indicator = (zone[:, :, None] == np.arange(num_zones)).astype(float)
+            with np.errstate(invalid="ignore"):
+                data_vars["necrosis_zone"] = (
+                    ("sim", "time", "zone"),
+                    np.einsum("stc,scz->stz", necrosis_volume, indicator)
+                    / np.einsum("stc,scz->stz", volume, indicator),
+                )
+        for name, sid in totals.items():
+            data_vars[f"{name}_total"] = (
+                ("sim", "time"),
+                np.einsum("stc,stc->st", values(sid), volume),
+            )
+
+        return xr.Dataset(
+            data_vars=data_vars,
+            coords={
+                name: coord
+                for name, coord in ds.coords.items()
+                if set(coord.dims) <= {"sim", "time"}
+            },
+        )
+
+    if max_memory is not None:
+        xr_metrics = map_time_chunks(
+            xr_ensemble[variables], metrics, max_memory=max_memory, dim="sim"
+        )
+    else:
+        xr_metrics = metrics(xr_ensemble[variables])
+
+    if "necrosis_zone" in xr_metrics:
+        xr_metrics = xr_metrics.assign_coords(
+            zone=np.arange(num_zones),
+            position=(("zone",), (edges[:-1] + edges[1:]) / 2),
+        )
+    return xr_metrics
@@ -2,12 +2,22 @@
 
 from pathlib import Path
 
+import numpy as np
+import xarray as xr
+
+from porous_media.analyses.spt.spt_information import simulation_conditions_df
 from porous_media.console import console
-from porous_media.data.xdmf_calculations import mesh_datasets_from_xdmf
+from porous_media.data.xdmf_calculations import (
+    ensemble_dataset,
+    mesh_datasets_from_xdmf,
+    zonation_profiles,
+)
 from porous_media.data.xdmf_tools import xdmfs_from_directory
 
 
-def process_spt_simulations(input_dir: Path, xdmf_dir: Path) -> dict[Path, Path]:
+def process_spt_simulations(
+    input_dir: Path, xdmf_dir: Path, n_workers: int = 1
+) -> dict[Path, Path]:
     """Process SPT simulation results."""
     # process files
 
@@ -15,6 +25,8 @@ def process_spt_simulations(input_dir: Path, xdmf_dir: Path) -> dict[Path, Path]
         input_dir=input_dir,
         xdmf_dir=xdmf_dir,
         overwrite=False,
+        n_workers=n_workers,
+        shared_geometry=True,
     )
     return xdmfs
 
@@ -28,6 +40,57 @@ def process_spt_meshes(xdmf_dir: Path) -> None:
         _, _ = mesh_datasets_from_xdmf(xdmf_path, overwrite=False)
 
 
+def process_spt_ensemble(
+    xdmf_dir: Path, times: np.ndarray, overwrite: bool = False
+) -> xr.Dataset:
+    """Stack the cell data of the SPT simulations in the ensemble dataset.
+
+    The simulations are indexed by 'sim' with the conditions of the
+    `simulation_conditions_df` as coordinates.
+    """
+    df = simulation_conditions_df()
+    xdmf_paths: dict[str, Path] = {
+        sim_id: xdmf_dir / f"{sim_id}.xdmf"
+        for sim_id in df.index
+        if (xdmf_dir / f"{sim_id}.xdmf").exists()
+    }
+    return ensemble_dataset(
+        xdmf_paths=xdmf_paths,
+        ensemble_path=xdmf_dir / "ensemble_cells.h5",
+        times=times,
+        conditions=df,
+        overwrite=overwrite,
+    )
+
+
+def process_spt_zones(
+    xdmf_dir: Path, zones: int = 10, overwrite: bool = False
+) -> dict[str, xr.Dataset]:
+    """Calculate the (time, zone) profiles of the SPT simulations.
+
+    The cells are binned by 'rr_position' into the PP-PV zones, see
+    `zonation_profiles`.
+    """
+    df = simulation_conditions_df()
+    zones_dict: dict[str, xr.Dataset] = {}
+    for sim_id in df.index:
+        xdmf_path = xdmf_dir / f"{sim_id}.xdmf"
+        if xdmf_path.exists():
+            zones_dict[sim_id] = zonation_profiles(
+                xdmf_path,
+                variables=[
+                    "rr_(S_ext)",
+                    "rr_(P_ext)",
+                    "rr_protein",
+                    "rr_(T)",
+                    "rr_necrosis",
+                ],
+                zones=zones,
+                overwrite=overwrite,
+            )
+    return zones_dict
+
+
 if __name__ == "__main__":
     input_dir = Path("/data/qualiperf/P7-Perf/spt_results/simulation")
     xdmf_dir = Path("/home/mkoenig/git/porous_media/data/spt/2024-02-02/xdmf")
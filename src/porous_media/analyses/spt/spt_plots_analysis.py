@@ -6,14 +6,20 @@ import numpy as np
 import xarray as xr
 from matplotlib import pyplot as plt
 
-from porous_media.analyses.liver_variables import calculate_necrosis_fraction
+from porous_media.analyses.liver_variables import calculate_ensemble_metrics
+from porous_media.analyses.spt.spt_data_processing import (
+    process_spt_ensemble,
+    process_spt_zones,
+)
 from porous_media.analyses.spt.spt_information import (
     boundary_flows,
+    pattern_idx2name,
     pattern_name2idx,
     pattern_order,
     simulation_conditions_df,
 )
 from porous_media.console import console
+from porous_media.data.derived_variables import DERIVED_VARIABLES
 from porous_media.data.xdmf_calculations import mesh_datasets_from_xdmf
 
 
@@ -103,7 +109,10 @@ def plot_positions(
             **kwargs_scatter,
         )
         # Volume scatter
-        y = xr_cells["element_volume_point_TPM"] / 1e-12  # [m^3] -> [nl]
+        xr_cells = DERIVED_VARIABLES.assign(
+            xr_cells, ["element_volume_nl", "rr_Vext_nl", "rr_Vli_nl"]
+        )
+        y = xr_cells["element_volume_nl"]
         ymax: float = float(y.max())
         if ymax > ymax_vol:
             ymax_vol = ymax
@@ -114,7 +123,7 @@ def plot_positions(
         )
 
         # Fluid volume scatter
-        y = xr_cells["rr_Vext"] / 1e-9  # [l] -> [nl]
+        y = xr_cells["rr_Vext_nl"]
         ymax = float(y.max())
         if ymax > ymax_vol:
             ymax_vol = ymax
@@ -124,13 +133,13 @@ def plot_positions(
             **kwargs_scatter,
         )
         # Solid volume scatter
-        y = xr_cells["rr_Vli"] / 1e-9  # [l] -> [nl]
+        y = xr_cells["rr_Vli_nl"]
         ymax = float(y.max())
         if ymax > ymax_vol:
             ymax_vol = ymax
         axes[k_row, 4].plot(
             xr_cells["rr_position"],
-            xr_cells["rr_Vli"] / 1e-9,
+            y,
             **kwargs_scatter,
         )
         # Pressure scatter
@@ -163,14 +172,14 @@ def plot_positions(
 
 def plot_spt_over_time(
     results_dir: Path,
-    xr_cells_dict: dict[str, xr.Dataset],
-    times: np.ndarray,
+    xr_ensemble: xr.Dataset,
 ) -> None:
-    """Plot SPT over time."""
+    """Plot SPT over time.
+
+    :param xr_ensemble: ensemble cell dataset, see `process_spt_ensemble`.
+    """
     console.rule(title="SPT timecourse", style="white")
 
-    # DataFrame information
-    df = simulation_conditions_df()
     n_patterns = len(pattern_order)
     n_cols = 5
 
@@ -193,60 +202,46 @@ def plot_spt_over_time(
         axes[k_row, 4].set_ylabel("Necrosis [%]", **label_kwargs)
         axes[k_row, 4].set_ylim([0, 100 * 1.05])
 
-    ylim_maxs = {}
-    for k_row, pattern_name in enumerate(pattern_order):
-        for boundary_flow_key in range(len(boundary_flows)):
-            pattern_key = pattern_name2idx[pattern_name]
-            df_sim = df[
-                (df.pattern_key == pattern_key)
-                & (df.boundary_flow_key == boundary_flow_key)
-            ]
-            sim_id = df_sim.index[0]
-            color = df_sim.color.values[0]
-            xr_cells_raw = xr_cells_dict[sim_id]
-
-            # interpolate time
-            xr_cells = xr_cells_raw.interp(time=times)
-
-            kwargs = {
-                "linestyle": "-",
-                "marker": "o",
-                "color": color,
-                "markeredgecolor": "black",
-                # "markeredgewidth": 0.5,
-            }
-
-            for k_col, sid in enumerate(
-                ["rr_(S_ext)", "rr_(P_ext)", "rr_protein", "rr_(T)"]
-            ):
-                x = xr_cells.time / 60 / 60  # [s] -> [hr]
-                y = xr_cells[sid].mean(dim="cell")
-                yerr = xr_cells[sid].std(dim="cell")
-
-                # update max
-                if sid not in ylim_maxs:
-                    ylim_maxs[sid] = 0.0
-                if (y + yerr).max() > ylim_maxs[sid]:
-                    ylim_maxs[sid] = float((y + yerr).max())
-
-                ax = axes[k_row, k_col]
-                ax.errorbar(
-                    x=x,
-                    y=y,
-                    yerr=yerr,
-                    label=sim_id,
-                    **kwargs,
-                )
-                # ax.legend()
-
-            necrosis_fraction = calculate_necrosis_fraction(xr_cells=xr_cells)
-            axes[k_row, 4].plot(
-                # convert to hr and percent
-                necrosis_fraction.time / 60 / 60,  # [s] -> [hr]
-                necrosis_fraction * 100,
+    # statistics of all simulations, (sim, time)
+    sids = ["rr_(S_ext)", "rr_(P_ext)", "rr_protein", "rr_(T)"]
+    xr_mean = xr_ensemble[sids].mean(dim="cell")
+    xr_std = xr_ensemble[sids].std(dim="cell")
+    necrosis_fraction = calculate_ensemble_metrics(xr_ensemble).necrosis_fraction
+    ylim_maxs = {sid: float((xr_mean[sid] + xr_std[sid]).max()) for sid in sids}
+
+    x = xr_ensemble.time / 60 / 60  # [s] -> [hr]
+    for sim_id in xr_ensemble.sim.values:
+        xr_mean_sim = xr_mean.sel(sim=sim_id)
+        xr_std_sim = xr_std.sel(sim=sim_id)
+        pattern_name = pattern_idx2name[int(xr_mean_sim.pattern_key)]
+        k_row = pattern_order.index(pattern_name)
+
+        kwargs = {
+            "linestyle": "-",
+            "marker": "o",
+            "color": str(xr_mean_sim.color.values),
+            "markeredgecolor": "black",
+            # "markeredgewidth": 0.5,
+        }
+
+        for k_col, sid in enumerate(sids):
+            ax = axes[k_row, k_col]
+            ax.errorbar(
+                x=x,
+                y=xr_mean_sim[sid],
+                yerr=xr_std_sim[sid],
                 label=sim_id,
                 **kwargs,
             )
+            # ax.legend()
+
+        axes[k_row, 4].plot(
+            # convert to hr and percent
+            x,
+            necrosis_fraction.sel(sim=sim_id) * 100,
+            label=sim_id,
+            **kwargs,
+        )
 
     for k_row, _ in enumerate(pattern_order):
         # axes[k_row, 2].set_title(pattern_name, fontsize=20, fontweight="bold")
@@ -266,11 +261,13 @@ def plot_spt_over_time(
 
 def plot_spt_over_position(
     results_dir: Path,
-    xr_cells_dict: dict[str, xr.Dataset],
+    xr_ensemble: xr.Dataset,
 ) -> None:
-    """Plot SPT over position."""
+    """Plot SPT over position.
+
+    :param xr_ensemble: ensemble cell dataset, see `process_spt_ensemble`.
+    """
     console.rule(title="SPT position", style="white")
-    df = simulation_conditions_df()
     n_patterns = len(pattern_order)
     n_cols = 5
     fig, axes = plt.subplots(
@@ -291,54 +288,39 @@ def plot_spt_over_position(
         axes[k_row, 3].set_ylabel("Toxic compound [mM]", **label_kwargs)
         axes[k_row, 4].set_ylabel("Necrosis [-]", **label_kwargs)
 
-    ylim_maxs = {}
-    for k_row, pattern_name in enumerate(pattern_order):
-        for boundary_flow_key in range(len(boundary_flows)):
-            pattern_key = pattern_name2idx[pattern_name]
-            df_sim = df[
-                (df.pattern_key == pattern_key)
-                & (df.boundary_flow_key == boundary_flow_key)
-            ]
-            sim_id = df_sim.index[0]
-            color = df_sim.color[0]
-
-            xr_cells_raw = xr_cells_dict[sim_id]
-
-            # interpolate time (only last timepoint)
-            xr_cells = xr_cells_raw.interp(time=10 * 60 * 60)  # 10 hr
-
-            kwargs = {
-                "linestyle": "",
-                "marker": "o",
-                "color": color,
-                "markeredgecolor": "black",
-            }
-
-            for k_col, sid in enumerate(
-                ["rr_(S_ext)", "rr_(P_ext)", "rr_protein", "rr_(T)", "rr_necrosis"]
-            ):
-                x = xr_cells.rr_position
-                y = xr_cells[sid]
-
-                # filter necrosis values != 0.0 or 1.0 (partial necrosis due to point averaging)
-                if sid == "rr_necrosis":
-                    x = x.where((y == 0.0) | (y == 1.0))
-                    y = y.where((y == 0.0) | (y == 1.0))
-
-                # update max
-                if sid not in ylim_maxs:
-                    ylim_maxs[sid] = 0.0
-                if y.max() > ylim_maxs[sid]:
-                    ylim_maxs[sid] = float(y.max())
-
-                ax = axes[k_row, k_col]
-                ax.plot(
-                    x,
-                    y,
-                    label=sim_id,
-                    **kwargs,
-                )
-                # ax.legend()
+    # interpolate time of all simulations (only last timepoint)
+    sids = ["rr_(S_ext)", "rr_(P_ext)", "rr_protein", "rr_(T)", "rr_necrosis"]
+    xr_cells = xr_ensemble[["rr_position", *sids]].interp(time=10 * 60 * 60)  # 10 hr
+
+    # filter necrosis values != 0.0 or 1.0 (partial necrosis due to point averaging)
+    necrosis = xr_cells["rr_necrosis"]
+    xr_cells["rr_necrosis"] = necrosis.where((necrosis == 0.0) | (necrosis == 1.0))
+    ylim_maxs = {sid: float(xr_cells[sid].max()) for sid in sids}
+
+    for sim_id in xr_cells.sim.values:
+        xr_cells_sim = xr_cells.sel(sim=sim_id)
+        pattern_name = pattern_idx2name[int(xr_cells_sim.pattern_key)]
+        k_row = pattern_order.index(pattern_name)
+
+        kwargs = {
+            "linestyle": "",
+            "marker": "o",
+            "color": str(xr_cells_sim.color.values),
+            "markeredgecolor": "black",
+        }
+
+        for k_col, sid in enumerate(sids):
+            y = xr_cells_sim[sid]
+            x = xr_cells_sim.rr_position.where(y.notnull())
+
+            ax = axes[k_row, k_col]
+            ax.plot(
+                x,
+                y,
+                label=sim_id,
+                **kwargs,
+            )
+            # ax.legend()
 
     for k_row, _ in enumerate(pattern_order):
         # axes[k_row, 2].set_title(pattern_name, fontsize=20, fontweight="bold")
@@ -357,6 +339,64 @@ def plot_spt_over_position(
     fig.savefig(results_dir / "position_dependency.png", bbox_inches="tight")
 
 
+def plot_spt_kymographs(
+    results_dir: Path,
+    zones_dict: dict[str, xr.Dataset],
+    sid: str = "rr_necrosis",
+) -> None:
+    """Plot kymographs (position ~ time) of the zone means of a variable.
+
+    :param zones_dict: zone profiles of the simulations, see `process_spt_zones`.
+    """
+    console.rule(title=f"SPT kymographs: {sid}", style="white")
+
+    df = simulation_conditions_df()
+    pattern_keys = df.pattern_key.to_dict()
+    boundary_flow_keys = df.boundary_flow_key.to_dict()
+    n_patterns = len(pattern_order)
+    n_cols = len(boundary_flows)
+    fig, axes = plt.subplots(
+        nrows=n_patterns,
+        ncols=n_cols,
+        figsize=(n_cols * 2.0, n_patterns * 2.0),
+        dpi=300,
+        layout="constrained",
+        squeeze=False,
+    )
+    vmax = max(float(xr_zones[sid].max()) for xr_zones in zones_dict.values())
+
+    mesh = None
+    for sim_id, xr_zones in zones_dict.items():
+        pattern_name = pattern_idx2name[int(pattern_keys[sim_id])]
+        k_row = pattern_order.index(pattern_name)
+        k_col = int(boundary_flow_keys[sim_id])
+
+        ax = axes[k_row, k_col]
+        mesh = ax.pcolormesh(
+            xr_zones.time / 60 / 60,  # [s] -> [hr]
+            xr_zones.position,
+            xr_zones[sid].T,
+            vmin=0,
+            vmax=vmax,
+            cmap="viridis",
+            shading="nearest",
+        )
+        ax.set_title(sim_id, fontsize=8)
+
+    for ax in axes[-1, :].flatten():
+        ax.set_xlabel("Time [hr]", **label_kwargs)
+    for ax in axes[:, 0].flatten():
+        ax.yaxis.set_ticks([0, 0.5, 1], labels=["PP", "", "PV"])
+    for ax in axes[:, 1:].flatten():
+        ax.set_yticks([0, 0.5, 1])
+        ax.set_yticklabels([])
+    if mesh is not None:
+        fig.colorbar(mesh, ax=axes, label=sid, shrink=0.5)
+
+    plt.show()
+    fig.savefig(results_dir / f"kymograph_{sid}.png", bbox_inches="tight")
+
+
 if __name__ == "__main__":
     """Analysis plots of the SPT simulations."""
 
@@ -387,6 +427,9 @@ if __name__ == "__main__":
     # figure out end time
     times: np.ndarray = np.linspace(start=0, stop=tend, num=51)
 
+    # stacked simulations on shared time grid
+    xr_ensemble = process_spt_ensemble(xdmf_dir=xdmf_dir, times=times)
+
     from porous_media import RESULTS_DIR
 
     results_dir = RESULTS_DIR / "spt" / results_date
@@ -400,11 +443,15 @@ if __name__ == "__main__":
 
     plot_spt_over_time(
         results_dir=results_dir,
-        xr_cells_dict=xr_cells_dict,
-        times=times,
+        xr_ensemble=xr_ensemble,
     )
 
     plot_spt_over_position(
         results_dir=results_dir,
-        xr_cells_dict=xr_cells_dict,
+        xr_ensemble=xr_ensemble,
+    )
+
+    plot_spt_kymographs(
+        results_dir=results_dir,
+        zones_dict=process_spt_zones(xdmf_dir=xdmf_dir),
     )
@@ -64,7 +64,7 @@ def visualize_spt_2d(
                     overwrite=False,
                 )
 
-                limits = DataLimits.from_xdmf(xdmf_path=xdmf_path, overwrite=True)
+                limits = DataLimits.from_xdmf(xdmf_path=xdmf_path)
                 all_limits.append(limits)
 
             # merge limits from different simulations
@@ -0,0 +1,307 @@
+"""Derived variables defined by expressions over the mesh variables.
+
+Derived point or cell data, e.g. unit conversions ([Pa] -> [mmHg]) or formulas
+over existing variables, are registered by name in `DerivedVariables`. The
+expressions are evaluated lazily and vectorised on demand, i.e. nothing is
+calculated unless the derived variable is requested.
+
+Expressions are python expressions over variables, numbers and numpy functions
+(see `FUNCTIONS`). Variables which are no valid python identifiers are quoted with
+backticks, e.g. "`rr_(S_ext)` * 1000". Derived variables can depend on other
+derived variables.
+
+The derived variables can be used
+- with an `XDMFReader` via `DerivedReader` (memoised per step), e.g. for the sids
+  of `DataLayer`, `DataLimits.from_xdmf` and `mesh_reductions`,
+- with xarray datasets via `DerivedVariables.assign`.
+"""
+
+from __future__ import annotations
+
+import ast
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Optional
+
+import numpy as np
+import xarray as xr
+
+from porous_media.data.xdmf_reader import XDMFReader
+from porous_media.data.xdmf_tools import AttributeType
+
+
+# numpy functions and constants available in expressions
+FUNCTIONS: dict[str, Any] = {
+    "abs": np.abs,
+    "sqrt": np.sqrt,
+    "exp": np.exp,
+    "log": np.log,
+    "log10": np.log10,
+    "minimum": np.minimum,
+    "maximum": np.maximum,
+    "clip": np.clip,
+    "where": np.where,
+    "pi": np.pi,
+}
+
+# allowed syntax of expressions, element-wise logic via &, | and ~ (and, or, not
+# and chained comparisons require the truth value of arrays)
+_NODES = (
+    ast.Expression,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.Compare,
+    ast.Call,
+    ast.Name,
+    ast.Load,
+    ast.Constant,
+    ast.Subscript,
+    ast.Slice,
+    ast.Tuple,
+    ast.operator,
+    ast.UAdd,
+    ast.USub,
+    ast.Invert,
+    ast.cmpop,
+)
+
+
+@dataclass
+class DerivedVariable:
+    """Variable defined by an expression over other variables.
+
+    :param sid: name of the derived variable.
+    :param expression: expression over variables, e.g. "pressure / 133.322".
+    :param unit: unit of the derived variable.
+    :param attribute_type: type of the derived variable.
+    """
+
+    sid: str
+    expression: str
+    unit: Optional[str] = None
+    attribute_type: AttributeType = AttributeType.SCALAR
+
+    def __post_init__(self) -> None:
+        """Parse and validate the expression."""
+        # quoted variables are replaced by identifiers
+        self._names: dict[str, str] = {}
+
+        def quote(match: re.Match) -> str:
+            identifier = f"__v{len(self._names)}"
+            self._names[identifier] = match.group(1)
+            return identifier
+
+        source = re.sub(r"`([^`]+)`", quote, self.expression)
+        try:
+            tree = ast.parse(source.strip(), mode="eval")
+        except SyntaxError as err:
+            raise ValueError(
+                f"Invalid expression for '{self.sid}': {self.expression}"
+            ) from err
+
+        variables: list[str] = []
+        for node in ast.walk(tree):
+            if not isinstance(node, _NODES):
+                raise ValueError(
+                    f"Unsupported syntax '{type(node).__name__}' in expression for "
+                    f"'{self.sid}': {self.expression}"
+                )
+            if isinstance(node, ast.Compare) and len(node.ops) > 1:
+                raise ValueError(
+                    f"Unsupported chained comparison in expression for "
+                    f"'{self.sid}': {self.expression}"
+                )
+            if isinstance(node, ast.Call) and not (
+                isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS
+            ):
+                raise ValueError(
+                    f"Unsupported function in expression for '{self.sid}': "
+                    f"{self.expression}"
+                )
+            if isinstance(node, ast.Name) and node.id not in FUNCTIONS:
+                self._names.setdefault(node.id, node.id)
+                variables.append(self._names[node.id])
+
+        self.variables: list[str] = list(dict.fromkeys(variables))
+        self._code = compile(tree, filename=f"<{self.sid}>", mode="eval")
+
+    def evaluate(self, values: dict[str, Any]) -> Any:
+        """Evaluate the expression.
+
+        :param values: values of the variables, numpy arrays or xarray DataArrays.
+        """
+        namespace = {
+            identifier: values[name] for identifier, name in self._names.items()
+        }
+        return eval(self._code, {"__builtins__": {}, **FUNCTIONS}, namespace)
+
+
+class DerivedVariables:
+    """Registry of derived variables."""
+
+    def __init__(self, variables: Iterable[DerivedVariable] = ()):
+        self._variables: dict[str, DerivedVariable] = {}
+        for variable in variables:
+            self.register(variable)
+
+    def __contains__(self, sid: object) -> bool:
+        return sid in self._variables
+
+    def __getitem__(self, sid: str) -> DerivedVariable:
+        return self._variables[sid]
+
+    @property
+    def sids(self) -> list[str]:
+        """Names of the derived variables."""
+        return list(self._variables)
+
+    def register(self, variable: DerivedVariable) -> None:
+        """Register derived variable, existing variables are replaced."""
+        self._variables[variable.sid] = variable
+        try:
+            self.dependencies(variable.sid)
+        except ValueError:
+            del self._variables[variable.sid]
+            raise
+
+    def dependencies(self, sid: str) -> list[str]:
+        """Variables (not derived) required to evaluate the derived variable."""
+        dependencies: list[str] = []
+
+        def resolve(name: str, path: tuple[str, ...]) -> None:
+            if name in path:
+                raise ValueError(
+                    f"Cyclic derived variable: {' -> '.join((*path, name))}"
+                )
+            if name not in self._variables:
+                dependencies.append(name)
+                return
+            for variable in self._variables[name].variables:
+                resolve(variable, (*path, name))
+
+        resolve(sid, ())
+        return list(dict.fromkeys(dependencies))
+
+    def evaluate(self, sid: str, read: Callable[[str], Any]) -> Any:
+        """Evaluate derived variable.
+
+        :param read: function returning the values of a (derived) variable.
+        """
+        variable = self._variables[sid]
+        return variable.evaluate({name: read(name) for name in variable.variables})
+
+    def reader(self, reader: XDMFReader, cache_steps: int = 1) -> DerivedReader:
+        """Reader for the variables and derived variables of the xdmf."""
+        return DerivedReader(reader=reader, derived=self, cache_steps=cache_steps)
+
+    def assign(self, dataset: xr.Dataset, sids: Iterable[str]) -> xr.Dataset:
+        """Add derived variables to xarray dataset.
+
+        Variables of the dataset take precedence over derived variables with the
+        same name.
+        """
+        values: dict[str, xr.DataArray] = {}
+
+        def read(name: str) -> xr.DataArray:
+            if name in dataset:
+                return dataset[name]
+            if name not in values:
+                values[name] = xr.DataArray(self.evaluate(name, read))
+                if self._variables[name].unit:
+                    values[name].attrs["unit"] = self._variables[name].unit
+            return values[name]
+
+        return dataset.assign({sid: read(sid) for sid in sids})
+
+
+class DerivedReader:
+    """Read variables and derived variables from the XDMF.
+
+    The values are memoised per step, i.e. variables used by multiple derived
+    variables are read once. Only the last `cache_steps` steps are kept.
+    """
+
+    def __init__(self, reader: XDMFReader, derived: DerivedVariables, cache_steps: int):
+        self.reader = reader
+        self.derived = derived
+        self.cache_steps = cache_steps
+        self._cache: OrderedDict[int, dict[str, np.ndarray]] = OrderedDict()
+
+    def center(self, name: str) -> str:
+        """Center of the variable, i.e. 'Node' (point data) or 'Cell' (cell data)."""
+        if name not in self.derived:
+            return self.reader.center(name)
+
+        centers = {self.reader.center(dep) for dep in self.derived.dependencies(name)}
+        if len(centers) != 1:
+            raise ValueError(
+                f"Derived variable '{name}' must depend on either point or cell "
+                f"data: {self.derived[name].expression}"
+            )
+        return centers.pop()
+
+    def read_array(self, k: int, name: str) -> np.ndarray:
+        """Read data of a single variable or derived variable at timestep k."""
+        if k not in self._cache:
+            self._cache[k] = {}
+            while len(self._cache) > self.cache_steps:
+                self._cache.popitem(last=False)
+        values = self._cache[k]
+
+        if name not in values:
+            if name in self.derived:
+                values[name] = np.asarray(
+                    self.derived.evaluate(name, lambda dep: self.read_array(k, dep))
+                )
+            else:
+                values[name] = self.reader.read_array(k, name)
+        return values[name]
+
+    def read_data(
+        self, k: int, variables: Iterable[str]
+    ) -> tuple[float, dict[str, np.ndarray], dict[str, list[np.ndarray]]]:
+        """Read point and cell data of timestep k, see `XDMFReader.read_data`."""
+        point_data: dict[str, np.ndarray] = {}
+        cell_data: dict[str, list[np.ndarray]] = {}
+        for name in variables:
+            data = self.read_array(k, name)
+            if self.center(name) == "Node":
+                point_data[name] = data
+            else:
+                cell_data[name] = self.reader.split_cell_data(data)
+
+        return float(self.reader.times[k]), point_data, cell_data
+
+
+# unit conversions of the FEBio results
+DERIVED_VARIABLES = DerivedVariables(
+    [
+        DerivedVariable("pressure_mmHg", "pressure / 133.322", unit="mmHg"),
+        DerivedVariable(
+            "element_volume_nl", "element_volume_point_TPM / 1e-12", unit="nl"
+        ),
+        DerivedVariable("rr_Vext_nl", "rr_Vext / 1e-9", unit="nl"),
+        DerivedVariable("rr_Vli_nl", "rr_Vli / 1e-9", unit="nl"),
+    ]
+)
+
+
+if __name__ == "__main__":
+    from porous_media import RESOURCES_DIR, RESULTS_DIR
+    from porous_media.console import console
+    from porous_media.data.xdmf_tools import DataLimits, vtks_to_xdmf
+
+    vtk_dir = RESOURCES_DIR / "vtk" / "vtk_timecourse"
+    xdmf_path = RESULTS_DIR / "vtk_timecourse.xdmf"
+    vtks_to_xdmf(vtk_dir, xdmf_path=xdmf_path, overwrite=False)
+
+    DERIVED_VARIABLES.register(
+        DerivedVariable("substrate_uM", "`rr_(S_ext)` * 1000", unit="µM")
+    )
+    data_limits = DataLimits.from_xdmf(
+        xdmf_path,
+        variables=["pressure", "pressure_mmHg", "substrate_uM"],
+        derived=DERIVED_VARIABLES,
+    )
+    console.print(data_limits)
@@ -0,0 +1,438 @@
+"""Reader for the legacy VTK files written by FEBio.
+
+FEBio writes every timestep as legacy VTK (unstructured grid) with the time in
+the header, the constant geometry and the POINT_DATA and CELL_DATA sections.
+The reader parses the geometry once and afterwards only the data sections.
+ASCII data is decoded in bulk with a single NumPy call per data type, binary
+data is read with `np.frombuffer` from the memory-mapped file.
+
+Data structures are identical to `meshio.read`, i.e. the data can be used
+instead of the meshio mesh.
+"""
+
+from __future__ import annotations
+
+import mmap
+import re
+from bisect import bisect_left
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from meshio import CellBlock
+from meshio._vtk_common import meshio_to_vtk_type
+from meshio.vtk._vtk_42 import translate_cells, vtk_to_numpy_dtype_name
+
+
+# section header lines start with a letter, but not the numbers nan and inf
+NUMBER_PATTERN = re.compile(rb"(?:nan|inf)(?:inity)?\b", re.I)
+
+# whitespace to newlines, i.e. a single column of numbers
+WHITESPACE_TABLE = bytes.maketrans(b" \t\r", b"\n\n\n")
+
+
+@dataclass
+class _DataBlock:
+    """Data section of the VTK."""
+
+    name: str
+    center: str
+    dtype: np.dtype
+    shape: tuple[int, ...]
+    start: int
+    end: int
+
+    @property
+    def count(self) -> int:
+        """Number of values."""
+        return int(np.prod(self.shape))
+
+
+class VTKReader:
+    """Reader for the FEBio legacy VTK timesteps.
+
+    The geometry is parsed from the first VTK and reused for all following VTKs
+    with the same number of points and cells.
+    """
+
+    def __init__(self) -> None:
+        self.points: Optional[np.ndarray] = None
+        self.cells: Optional[list[CellBlock]] = None
+        self._geometry_key: Optional[tuple[int, ...]] = None
+
+    def read_points_cells(self, vtk_path: Path) -> tuple[np.ndarray, list[CellBlock]]:
+        """Read points and cells of the VTK."""
+        self.read(vtk_path)
+        assert self.points is not None and self.cells is not None
+        return self.points, self.cells
+
+    def read(
+        self, vtk_path: Path
+    ) -> tuple[float, dict[str, np.ndarray], dict[str, list[np.ndarray]]]:
+        """Read time and data of the VTK timestep.
+
+        :returns: time, point_data and cell_data analogue to meshio.
+        """
+        with (
+            open(vtk_path, "rb") as f_vtk,
+            mmap.mmap(f_vtk.fileno(), 0, access=mmap.ACCESS_READ) as buffer,
+        ):
+            return self._parse(vtk_path, buffer)
+
+    def _parse(
+        self, vtk_path: Path, buffer: Any
+    ) -> tuple[float, dict[str, np.ndarray], dict[str, list[np.ndarray]]]:
+        """Parse the VTK buffer."""
+        pos = 0
+
+        def readline() -> str:
+            nonlocal pos
+            end = buffer.find(b"\n", pos)
+            end = len(buffer) if end == -1 else end
+            line: str = bytes(buffer[pos:end]).decode().strip()
+            pos = end + 1
+            return line
+
+        # header with time
+        if not readline().startswith("# vtk DataFile Version"):
+            raise ValueError(f"Illegal VTK header: {vtk_path}")
+        t = float(readline().split(" ")[-1])
+        data_format = readline().upper()
+        if data_format not in {"ASCII", "BINARY"}:
+            raise ValueError(f"Unknown VTK data format '{data_format}': {vtk_path}")
+        is_ascii = data_format == "ASCII"
+
+        # start of all section header lines, found in a single pass
+        headers: list[int] = _header_starts(buffer, pos) if is_ascii else []
+
+        def skip_data(dtype: np.dtype, count: int) -> tuple[int, int]:
+            """Move behind the data section, returns the start and end of the data."""
+            nonlocal pos
+            start = pos
+            if is_ascii:
+                k = bisect_left(headers, pos)
+                pos = headers[k] if k < len(headers) else len(buffer)
+                return start, pos
+            pos += count * dtype.itemsize
+            end = pos
+            # binary data is terminated by a newline
+            if buffer[pos : pos + 1] == b"\n":
+                pos += 1
+            return start, end
+
+        geometry: dict[str, _DataBlock] = {}
+        blocks: list[_DataBlock] = []
+        center: Optional[str] = None
+        num_items = 0
+        geometry_key: list[int] = []
+
+        while pos < len(buffer):
+            line = readline()
+            if not line:
+                continue
+            split = line.split()
+            section = split[0].upper()
+
+            if section == "DATASET":
+                if split[1].upper() != "UNSTRUCTURED_GRID":
+                    raise ValueError(
+                        f"Only VTK 'UNSTRUCTURED_GRID' supported: {vtk_path}"
+                    )
+            elif section in {"POINTS", "CELLS", "CELL_TYPES"}:
+                if section == "POINTS":
+                    dtype = np.dtype(vtk_to_numpy_dtype_name[split[2].lower()])
+                    shape: tuple[int, ...] = (int(split[1]), 3)
+                elif section == "CELLS":
+                    dtype = np.dtype("int32")
+                    shape = (int(split[2]),)
+                else:
+                    dtype = np.dtype("int32")
+                    shape = (int(split[1]),)
+                geometry_key.append(shape[0])
+                block = _DataBlock(section, "geometry", dtype, shape, 0, 0)
+                block.start, block.end = skip_data(dtype, block.count)
+                geometry[section] = block
+            elif section in {"POINT_DATA", "CELL_DATA"}:
+                center = "Node" if section == "POINT_DATA" else "Cell"
+                num_items = int(split[1])
+            elif section in {"SCALARS", "VECTORS", "NORMALS", "TENSORS"}:
+                if center is None:
+                    raise ValueError(f"'{section}' outside of data: {vtk_path}")
+                dtype = np.dtype(vtk_to_numpy_dtype_name[split[2].lower()])
+                if section == "SCALARS":
+                    num_comp = int(split[3]) if len(split) > 3 else 1
+                    lookup_table = readline().split()
+                    if lookup_table[0].upper() != "LOOKUP_TABLE":
+                        raise ValueError(f"'LOOKUP_TABLE' required: {vtk_path}")
+                    shape = (num_items, num_comp)
+                elif section == "TENSORS":
+                    shape = (num_items, 3, 3)
+                else:
+                    shape = (num_items, 3)
+                block = _DataBlock(split[1], center, dtype, shape, 0, 0)
+                block.start, block.end = skip_data(dtype, block.count)
+                blocks.append(block)
+            elif section == "FIELD":
+                if center is None:
+                    raise ValueError(f"'FIELD' outside of data: {vtk_path}")
+                for _ in range(int(split[2])):
+                    name, num_comp_str, num_tuples_str, dtype_str = readline().split()
+                    dtype = np.dtype(vtk_to_numpy_dtype_name[dtype_str.lower()])
+                    num_comp, num_tuples = int(num_comp_str), int(num_tuples_str)
+                    shape = (num_tuples,) if num_comp == 1 else (num_tuples, num_comp)
+                    block = _DataBlock(name, center, dtype, shape, 0, 0)
+                    block.start, block.end = skip_data(dtype, block.count)
+                    blocks.append(block)
+            else:
+                raise ValueError(f"Unsupported VTK section '{section}': {vtk_path}")
+
+        # geometry is only parsed if it changed
+        if tuple(geometry_key) != self._geometry_key:
+            if len(geometry) != 3:
+                raise ValueError(
+                    f"'POINTS', 'CELLS' and 'CELL_TYPES' required: {vtk_path}"
+                )
+            arrays = self._decode(buffer, list(geometry.values()), is_ascii)
+            self.points = arrays[0]
+            connectivity, types = arrays[1], arrays[2]
+            if np.any(types == meshio_to_vtk_type["polygon"]):
+                raise ValueError(f"Polygon cells are not supported: {vtk_path}")
+            cells, _ = translate_cells(connectivity, types, {})
+            self.cells = [CellBlock(cell_type, data) for cell_type, data in cells]
+            self._geometry_key = tuple(geometry_key)
+
+        assert self.cells is not None
+        point_data: dict[str, np.ndarray] = {}
+        cell_data: dict[str, list[np.ndarray]] = {}
+        for block, data in zip(blocks, self._decode(buffer, blocks, is_ascii)):
+            if block.center == "Node":
+                point_data[block.name] = data
+            else:
+                # split data in cell blocks
+                cell_data[block.name] = []
+                start = 0
+                for cell_block in self.cells:
+                    cell_data[block.name].append(data[start : start + len(cell_block)])
+                    start += len(cell_block)
+
+        return t, point_data, cell_data
+
+    @staticmethod
+    def _decode(
+        buffer: Any, blocks: list[_DataBlock], is_ascii: bool
+    ) -> list[np.ndarray]:
+        """Decode the data of the blocks."""
+        if not is_ascii:
+            # binary data is big endian
+            return [
+                np.frombuffer(
+                    buffer,
+                    dtype=block.dtype.newbyteorder(">"),
+                    count=block.count,
+                    offset=block.start,
+                )
+                .astype(block.dtype)
+                .reshape(block.shape)
+                for block in blocks
+            ]
+
+        # single parse of all ASCII blocks with the same dtype
+        arrays: list[Optional[np.ndarray]] = [None] * len(blocks)
+        for dtype in {block.dtype for block in blocks}:
+            indices = [k for k, block in enumerate(blocks) if block.dtype == dtype]
+            text = b"\n".join(
+                buffer[blocks[k].start : blocks[k].end].translate(WHITESPACE_TABLE)
+                for k in indices
+            )
+            values = _parse_ascii(text, dtype)
+            counts = [blocks[k].count for k in indices]
+            if len(values) != sum(counts):
+                raise ValueError(
+                    f"Expected {sum(counts)} values in VTK data, but found "
+                    f"{len(values)}."
+                )
+            offsets = np.cumsum([0] + counts)
+            for j, k in enumerate(indices):
+                arrays[k] = values[offsets[j] : offsets[j + 1]].reshape(blocks[k].shape)
+
+        return [a for a in arrays if a is not None]
+
+
+def _header_starts(buffer: Any, pos: int) -> list[int]:
+    """Start of the section header lines after pos in ASCII VTK.
+
+    Header lines start with a letter, data lines with a number. Line starts are
+    located vectorized on the bytes of the buffer.
+    """
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    starts = np.flatnonzero(data[pos:-1] == ord("\n")) + pos + 1
+    first = data[starts] | 0x20  # lower case
+    is_letter = ((first >= ord("a")) & (first <= ord("z"))) | (data[starts] == ord("_"))
+    return [
+        int(start)
+        for start in starts[is_letter]
+        if not NUMBER_PATTERN.match(buffer, int(start))
+    ]
+
+
+def _parse_ascii(text: bytes, dtype: np.dtype) -> np.ndarray:
+    """Parse newline separated numbers.
+
+    The numbers are parsed as a single column by the multi-threaded pyarrow CSV
+    reader. Values are parsed in double precision and cast to dtype, identical
+    to the NumPy text parsing.
+    """
+    column_type = pa.float64() if dtype.kind == "f" else pa.int64()
+    table = pa_csv.read_csv(
+        pa.py_buffer(text),
+        read_options=pa_csv.ReadOptions(column_names=["values"]),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={"values": column_type},
+            null_values=[],
+            strings_can_be_null=False,
+        ),
+    )
+    return np.asarray(table.column(0).to_numpy(), dtype=dtype)
+
+
+def _write_vtk_ascii(
+    vtk_path: Path,
+    t: float,
+    points: np.ndarray,
+    cells: list[CellBlock],
+    point_data: dict[str, np.ndarray],
+    cell_data: dict[str, list[np.ndarray]],
+) -> None:
+    """Write ASCII legacy VTK in the FEBio dialect."""
+
+    def write_data(f: Any, name: str, data: np.ndarray) -> None:
+        if data.ndim == 3:
+            f.write(f"TENSORS {name} float\n")
+        elif data.ndim == 2 and data.shape[1] == 3:
+            f.write(f"VECTORS {name} float\n")
+        else:
+            f.write(f"SCALARS {name} float\nLOOKUP_TABLE default\n")
+        np.savetxt(f, data.reshape(len(data), -1), fmt="%g")
+
+    with open(vtk_path, "w") as f:
+        f.write(f"# vtk DataFile Version 3.0\nvtk output at time {t:g}\nASCII\n")
+        f.write(f"DATASET UNSTRUCTURED_GRID\nPOINTS {len(points)} float\n")
+        np.savetxt(f, points, fmt="%g")
+        num_cells = sum(len(c) for c in cells)
+        num_items = sum(c.data.size + len(c) for c in cells)
+        f.write(f"CELLS {num_cells} {num_items}\n")
+        for c in cells:
+            np.savetxt(f, np.insert(c.data, 0, c.data.shape[1], axis=1), fmt="%d")
+        f.write(f"CELL_TYPES {num_cells}\n")
+        for c in cells:
+            np.savetxt(f, np.full(len(c), meshio_to_vtk_type[c.type]), fmt="%d")
+        f.write(f"POINT_DATA {len(points)}\n")
+        for name, data in point_data.items():
+            write_data(f, name, data)
+        f.write(f"CELL_DATA {num_cells}\n")
+        for name, data_blocks in cell_data.items():
+            write_data(f, name, np.concatenate(data_blocks))
+
+
+def scale_vtk(vtk_path: Path, vtk_out: Path, factor: int) -> None:
+    """Create a larger VTK by replicating the mesh and data factor times.
+
+    The replicated meshes are shifted along the x-axis.
+    """
+    reader = VTKReader()
+    t, point_data, cell_data = reader.read(vtk_path)
+    points, cells = reader.points, reader.cells
+    assert points is not None and cells is not None
+
+    width = np.ptp(points[:, 0]) * 1.1
+    points_scaled = np.concatenate(
+        [
+            points + np.array([k * width, 0, 0], dtype=points.dtype)
+            for k in range(factor)
+        ]
+    )
+    cells_scaled = [
+        CellBlock(
+            c.type, np.concatenate([c.data + k * len(points) for k in range(factor)])
+        )
+        for c in cells
+    ]
+    _write_vtk_ascii(
+        vtk_out,
+        t,
+        points=points_scaled,
+        cells=cells_scaled,
+        point_data={
+            name: np.concatenate([data] * factor) for name, data in point_data.items()
+        },
+        cell_data={
+            name: [np.concatenate([d] * factor) for d in data_blocks]
+            for name, data_blocks in cell_data.items()
+        },
+    )
+
+
+def benchmark_vtk_reader(
+    vtk_path: Path, factor: int = 50, repeats: int = 3
+) -> dict[str, dict[str, float]]:
+    """Benchmark the VTKReader against meshio.read.
+
+    The VTK is scaled up by factor. Reported are the best runtime [s] and the
+    peak of allocated memory [MB] for reading a timestep.
+    """
+    import tempfile
+    import time
+    import tracemalloc
+
+    import meshio
+
+    from porous_media.console import console
+
+    def read_meshio(path: Path) -> None:
+        with open(path, "r") as f_vtk:
+            f_vtk.readline()
+            float(f_vtk.readline().strip().split(" ")[-1])
+        meshio.read(path)
+
+    reader = VTKReader()
+    results: dict[str, dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        vtk_scaled = Path(tmp_dir) / f"{vtk_path.stem}_x{factor}.vtk"
+        scale_vtk(vtk_path, vtk_scaled, factor=factor)
+        size_mb = vtk_scaled.stat().st_size / 1e6
+
+        benchmarks = {
+            "meshio.read": read_meshio,
+            "VTKReader (geometry)": lambda p: VTKReader().read(p),
+            "VTKReader (data)": reader.read,
+        }
+        # geometry is cached
+        reader.read(vtk_scaled)
+        for key, f_read in benchmarks.items():
+            runtimes = []
+            for _ in range(repeats):
+                t_start = time.perf_counter()
+                f_read(vtk_scaled)
+                runtimes.append(time.perf_counter() - t_start)
+            tracemalloc.start()
+            f_read(vtk_scaled)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[key] = {"runtime": min(runtimes), "peak_mb": peak / 1e6}
+
+    console.print(f"{vtk_path.name} x{factor}: {size_mb:.1f} MB")
+    for key, res in results.items():
+        console.print(
+            f"{key:<25} {res['runtime']:.3f} s  {size_mb / res['runtime']:.1f} MB/s  "
+            f"peak {res['peak_mb']:.1f} MB"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    from porous_media import DATA_DIR
+
+    benchmark_vtk_reader(DATA_DIR / "lobule_BCflux.t006.vtk", factor=50)
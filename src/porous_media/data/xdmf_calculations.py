@@ -12,109 +12,844 @@ This should work on cell_data and point_data of the mesh
 A lot of the information should be position dependent for analysis.
 Support selections of positions; histogramm over position.
 
+Integrals, means, fractions, min/max and quantiles are calculated with volume
+weights in a single streaming pass over the XDMF by `mesh_reductions`.
+
 """
 
+import hashlib
+import json
+import os
 from pathlib import Path
+from typing import Any, Callable, Iterator, Optional, Sequence, TypeVar, Union
 
-import meshio
+import h5py
 import numpy as np
 import pandas as pd
 import xarray as xr
+from meshio import CellBlock
 from rich.progress import Progress, track
+from xarray.backends import BackendArray
+from xarray.core import indexing
 
 from porous_media.console import console
-from porous_media.data.xdmf_tools import AttributeType, XDMFInfo
+from porous_media.data.derived_variables import DerivedVariables
+from porous_media.data.xdmf_reader import XDMFReader
+from porous_media.data.xdmf_tools import (
+    AttributeType,
+    XDMFInfo,
+    fingerprint,
+    xdmf_fingerprint,
+)
+
+
+MeshArrays = dict[str, tuple[tuple[str, ...], np.ndarray]]
 
 
 def mesh_datasets_from_xdmf(
     xdmf_path: Path,
     overwrite: bool = False,
+    max_memory: Optional[int] = None,
 ) -> tuple[xr.Dataset, xr.Dataset]:
     """Create the cell_data and point_data xarray DataSet.
 
     Here the actual mesh geometry is not important, but information is stored for
     cells and points. Files are serialized as netCDF4 for caching information.
+    The cached files store the fingerprint of the xdmf in the attribute
+    'fingerprint' and are rebuilt if the xdmf changes, see `xdmf_fingerprint`.
+
+    In the lazy mode (`max_memory`) the data is streamed step by step into chunked
+    HDF5 files (`*_cells.h5`, `*_points.h5`) which are opened lazily, i.e. data is
+    only read on access. Use `map_time_chunks` for reductions with bounded memory.
+
+    :param overwrite: recreate the files even if they are up to date.
+    :param max_memory: memory limit in bytes, activates the lazy mode.
     """
-    xr_cells_path = xdmf_path.parent / f"{xdmf_path.stem}_cells.nc"
-    xr_points_path = xdmf_path.parent / f"{xdmf_path.stem}_points.nc"
+    suffix = ".nc" if max_memory is None else ".h5"
+    xr_cells_path = xdmf_path.parent / f"{xdmf_path.stem}_cells{suffix}"
+    xr_points_path = xdmf_path.parent / f"{xdmf_path.stem}_points{suffix}"
+    key = _fingerprint_attr(xdmf_fingerprint(xdmf_path))
     if not overwrite and xr_cells_path.exists() and xr_points_path.exists():
+        xr_cells: xr.Dataset
+        xr_points: xr.Dataset
+        if max_memory is not None:
+            xr_cells = open_mesh_dataset(xr_cells_path)
+            xr_points = open_mesh_dataset(xr_points_path)
+        else:
+            xr_cells = xr.open_dataset(xr_cells_path)
+            xr_points = xr.open_dataset(xr_points_path)
+        if (
+            xr_cells.attrs.get("fingerprint") == key
+            and xr_points.attrs.get("fingerprint") == key
+        ):
+            console.print(
+                f"cells and points files exist: {xr_cells_path} | {xr_points_path}"
+            )
+            return xr_cells, xr_points
+
         console.print(
-            f"cells and points files exist: {xr_cells_path} | {xr_points_path}"
+            f"cells and points files outdated: {xr_cells_path} | {xr_points_path}"
         )
-        xr_cells: xr.Dataset = xr.open_dataset(xr_cells_path)
-        xr_points: xr.Dataset = xr.open_dataset(xr_points_path)
-        return xr_cells, xr_points
+        xr_cells.close()
+        xr_points.close()
 
     xdmf_info: XDMFInfo = XDMFInfo.from_path(xdmf_path)
     # console.print(xdmf_info)
 
-    dfs_cell_data: list[pd.DataFrame] = []
-    dfs_point_data: list[pd.DataFrame] = []
+    if max_memory is not None:
+        for path, dim in [(xr_cells_path, "cell"), (xr_points_path, "point")]:
+            _write_mesh_h5(path, xdmf_info, dim=dim, fingerprint=key)
+        return open_mesh_dataset(xr_cells_path), open_mesh_dataset(xr_points_path)
 
-    with meshio.xdmf.TimeSeriesReader(xdmf_path) as reader:
-        data_cell: dict[str, np.ndarray] = {}
-        data_point: dict[str, np.ndarray] = {}
+    # (time, cell, ...) and (time, point, ...) blocks are allocated once and
+    # filled in place, the dtype is taken from the first timestep
+    tnum = xdmf_info.num_steps
+    timepoints = np.empty(shape=(tnum,))
+    data_cell: MeshArrays = {}
+    data_point: MeshArrays = {}
+    for k, t, arrays_cell, arrays_point in _mesh_steps(xdmf_info):
+        timepoints[k] = t
+        for blocks, arrays in [(data_cell, arrays_cell), (data_point, arrays_point)]:
+            for name, (dims, values) in arrays.items():
+                if k == 0:
+                    blocks[name] = (
+                        dims,
+                        np.empty((tnum, *values.shape), dtype=values.dtype),
+                    )
+                blocks[name][1][k] = values
 
-        _, _ = reader.read_points_cells()
-        tnum = reader.num_steps
-        timepoints = np.ndarray(shape=(tnum,))
+    with Progress() as progress:
+        _ = progress.add_task("Create xarray datasets ...", total=None)
+
+        # (time, cell, ...) xarray Dataset
+        xr_cells = _dataset_from_blocks(
+            data_cell, timepoints, dim="cell", size=xdmf_info.num_cells
+        )
+        xr_cells.attrs["fingerprint"] = key
+        # serialize to netCDF4
+        xr_cells.to_netcdf(xr_cells_path)
+
+        # (time, point, ...) xarray Dataset
+        xr_points = _dataset_from_blocks(
+            data_point, timepoints, dim="point", size=xdmf_info.num_points
+        )
+        xr_points.attrs["fingerprint"] = key
+        # serialize to netCDF4
+        xr_points.to_netcdf(xr_points_path)
+
+    return xr_cells, xr_points
+
+
+VECTOR_COMPONENTS: list[str] = ["x", "y", "z"]
+TENSOR_COMPONENTS: list[str] = [f"{i}{j}" for i in "xyz" for j in "xyz"]
+
+
+def _mesh_steps(
+    xdmf_info: XDMFInfo, dims: tuple[str, ...] = ("cell", "point")
+) -> Iterator[tuple[int, float, MeshArrays, MeshArrays]]:
+    """Iterate over the timesteps of the XDMF.
+
+    Scalar, vector and tensor variables are read; matrices are skipped.
+
+    :param dims: 'cell' and/or 'point' data to read.
+    :returns: iterator of index, time, cell arrays and point arrays.
+    """
+    attribute_types = {
+        AttributeType.SCALAR,
+        AttributeType.VECTOR,
+        AttributeType.TENSOR,
+    }
+    cell_variables: dict[str, AttributeType] = {
+        key: info.attribute_type
+        for key, info in xdmf_info.cell_data.items()
+        if info.attribute_type in attribute_types and "cell" in dims
+    }
+    point_variables: dict[str, AttributeType] = {
+        key: info.attribute_type
+        for key, info in xdmf_info.point_data.items()
+        if info.attribute_type in attribute_types and "point" in dims
+    }
+
+    with XDMFReader(xdmf_info.path, mmap=False) as reader:
         for k in track(
-            range(tnum),
-            description=f"Create dataframes for mesh data '{xdmf_path}' ...",
+            range(reader.num_steps),
+            description=f"Create datasets for mesh data '{xdmf_info.path}' ...",
         ):
-            t, point_data, cell_data = reader.read_data(k)
-            timepoints[k] = t
+            arrays_cell: MeshArrays = {}
+            arrays_point: MeshArrays = {}
+            for variables, arrays, size in [
+                (cell_variables, arrays_cell, xdmf_info.num_cells),
+                (point_variables, arrays_point, xdmf_info.num_points),
+            ]:
+                for key, attribute_type in variables.items():
+                    data = reader.read_array(k, key).reshape(size, -1)
+                    arrays.update(_mesh_arrays(key, data, attribute_type))
 
-            # parse cell data
-            for key, data in cell_data.items():
-                # How to deal with vectors and tensors (FIXME)? (length of the vector)
-                if xdmf_info.cell_data[key].attribute_type != AttributeType.SCALAR:
-                    continue
+            yield k, float(reader.times[k]), arrays_cell, arrays_point
 
-                data = np.dstack(data)
-                data = data.squeeze()
-                data_cell[key] = data
 
-            df_cell = pd.DataFrame(data_cell)
-            dfs_cell_data.append(df_cell)
+def _mesh_arrays(
+    key: str, data: np.ndarray, attribute_type: AttributeType
+) -> MeshArrays:
+    """Arrays of a variable and its derived quantities for a single timestep.
 
-            # parse point data
-            for key, data in point_data.items():
-                if xdmf_info.point_data[key].attribute_type != AttributeType.SCALAR:
-                    continue
+    Vectors are stored with a 'component' dimension and their magnitude,
+    tensors with a 'tensor_component' dimension (xx, xy, ..., zz) and their trace.
 
-                data = np.dstack(data)
-                data = data.squeeze()
-                data_point[key] = data
+    :param data: variable data with shape (index, components).
+    :returns: dictionary of name: (extra dimensions, array).
+    """
+    if attribute_type == AttributeType.SCALAR:
+        return {key: ((), data[:, 0])}
+    elif attribute_type == AttributeType.VECTOR:
+        return {
+            key: (("component",), data),
+            f"{key}_magnitude": ((), np.sqrt(np.einsum("ij,ij->i", data, data))),
+        }
+    elif attribute_type == AttributeType.TENSOR:
+        return {
+            key: (("tensor_component",), data),
+            f"{key}_trace": ((), data[:, [0, 4, 8]].sum(axis=1)),
+        }
+    raise ValueError(f"Unsupported attribute type '{attribute_type}': {key}")
 
-            # FIXME: directly create the xarray datasets;
-            df_point = pd.DataFrame(data_point)
-            dfs_point_data.append(df_point)
 
-    with Progress() as progress:
-        _ = progress.add_task("Create xarray datasets ...", total=None)
+def _component_coords(arrays: MeshArrays) -> dict[str, list[str]]:
+    """Coordinates of the component dimensions."""
+    coords: dict[str, list[str]] = {}
+    for dims, values in arrays.values():
+        if "component" in dims:
+            coords["component"] = VECTOR_COMPONENTS[: values.shape[-1]]
+        elif "tensor_component" in dims:
+            coords["tensor_component"] = TENSOR_COMPONENTS
+    return coords
+
+
+def _dataset_from_blocks(
+    data: MeshArrays,
+    timepoints: np.ndarray,
+    dim: str,
+    size: int,
+) -> xr.Dataset:
+    """Wrap (time, dim, ...) blocks in a xarray Dataset without copying.
+
+    The dimension is indexed by the integer coordinate 'index'.
+    """
+    coords: dict[str, Any] = {"time": timepoints, "index": np.arange(size)}
+    coords.update(_component_coords(data))
+
+    dataset = xr.Dataset(
+        data_vars={
+            key: (("time", "index", *dims), block)
+            for key, (dims, block) in data.items()
+        },
+        coords=coords,
+    )
+    return dataset.rename_dims(dims_dict={"index": dim})
+
 
-        # (cell, time) xarray Dataset
-        xr_cells = xr.concat(
-            [df.to_xarray() for df in dfs_cell_data],
-            dim="time",
+# target size of the HDF5 chunks in the lazy mode
+CHUNK_BYTES: int = 2**20
+
+
+def _chunk_rows(row_bytes: int, num_rows: int) -> int:
+    """Number of rows (timesteps) per chunk of about CHUNK_BYTES."""
+    return max(1, min(num_rows, CHUNK_BYTES // max(1, row_bytes)))
+
+
+def _fingerprint_attr(key: dict[str, Any]) -> str:
+    """Serialize fingerprint for the attributes of the netCDF and HDF5 files."""
+    return json.dumps(key, sort_keys=True)
+
+
+def _write_mesh_h5(
+    h5_path: Path, xdmf_info: XDMFInfo, dim: str, fingerprint: str
+) -> None:
+    """Stream the cell or point data of the XDMF in a chunked HDF5 file.
+
+    Variables are stored in the group 'data_vars', coordinates in the group
+    'coords'; the dimensions of every dataset are stored in the attribute 'dims'.
+    Chunks span all cells (points) and as many timesteps as fit in CHUNK_BYTES.
+    The file is created atomically.
+
+    :param fingerprint: serialized fingerprint of the xdmf, stored as attribute.
+    """
+    tnum = xdmf_info.num_steps
+    size = xdmf_info.num_cells if dim == "cell" else xdmf_info.num_points
+    h5_tmp = h5_path.parent / f"{h5_path.name}.{os.getpid()}.tmp"
+    with h5py.File(h5_tmp, "w") as f:
+        f.attrs["fingerprint"] = fingerprint
+        coords = f.create_group("coords", track_order=True)
+        data_vars = f.create_group("data_vars", track_order=True)
+        _h5_coord(coords, "time", ["time"], np.empty(shape=(tnum,)))
+        _h5_coord(coords, "index", [dim], np.arange(size))
+
+        for k, t, arrays_cell, arrays_point in _mesh_steps(xdmf_info, dims=(dim,)):
+            arrays = arrays_cell if dim == "cell" else arrays_point
+            coords["time"][k] = t
+            if k == 0:
+                for name, labels in _component_coords(arrays).items():
+                    _h5_coord(coords, name, [name], labels)
+
+                for name, (dims, values) in arrays.items():
+                    rows = _chunk_rows(values.nbytes, tnum)
+                    dset = data_vars.create_dataset(
+                        name,
+                        shape=(tnum, *values.shape),
+                        dtype=values.dtype,
+                        chunks=(rows, *values.shape),
+                    )
+                    dset.attrs["dims"] = ["time", dim, *dims]
+
+            for name, (_, values) in arrays.items():
+                data_vars[name][k] = values
+
+    os.replace(h5_tmp, h5_path)
+
+
+def _h5_coord(group: h5py.Group, name: str, dims: list[str], values: Any) -> None:
+    """Store a coordinate in the HDF5 group, strings are stored as bytes."""
+    data = np.asarray(values)
+    if data.dtype.kind in "UO":
+        data = data.astype(str).astype("S")
+    group.create_dataset(name, data=data).attrs["dims"] = dims
+
+
+class _H5Array(BackendArray):
+    """Lazily indexed HDF5 dataset, the file is opened on every access."""
+
+    def __init__(self, h5_path: Path, name: str, shape: tuple, dtype: np.dtype):
+        self.h5_path = h5_path
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+    def __getitem__(self, key: indexing.ExplicitIndexer) -> np.ndarray:
+        return np.asarray(
+            indexing.explicit_indexing_adapter(
+                key, self.shape, indexing.IndexingSupport.BASIC, self._read
+            )
         )
-        xr_cells = xr_cells.rename_dims(dims_dict={"index": "cell"})
-        xr_cells = xr_cells.assign_coords(coords={"time": timepoints})
-        # serialize to netCDF4
-        xr_cells.to_netcdf(xr_cells_path)
 
-        # (point, time) xarray Dataset
-        xr_points = xr.concat(
-            [df.to_xarray() for df in dfs_point_data],
-            dim="time",
+    def _read(self, key: tuple) -> np.ndarray:
+        with h5py.File(self.h5_path, "r") as f:
+            return np.asarray(f["data_vars"][self.name][key])
+
+
+def open_mesh_dataset(h5_path: Path) -> xr.Dataset:
+    """Open the HDF5 file of the lazy mode as xarray Dataset.
+
+    Coordinates and attributes are read, variables are read lazily on access or
+    `load`.
+    """
+    if not h5_path.exists():
+        raise IOError(f"h5_path does not exist: {h5_path}")
+
+    with h5py.File(h5_path, "r") as f:
+        attrs: dict[str, Any] = {
+            key: value.decode() if isinstance(value, bytes) else value
+            for key, value in f.attrs.items()
+        }
+        coords: dict[str, Any] = {}
+        for name, dset in f["coords"].items():
+            values = dset[()]
+            if values.dtype.kind == "S":
+                values = values.astype(str)
+            coords[name] = (list(dset.attrs["dims"]), values)
+
+        data_vars: dict[str, xr.Variable] = {
+            name: xr.Variable(
+                list(dset.attrs["dims"]),
+                indexing.LazilyIndexedArray(
+                    _H5Array(h5_path, name, dset.shape, dset.dtype)
+                ),
+            )
+            for name, dset in f["data_vars"].items()
+        }
+
+    return xr.Dataset(data_vars=data_vars, coords=coords, attrs=attrs)
+
+
+T = TypeVar("T", xr.Dataset, xr.DataArray)
+
+# temporary arrays of the reductions relative to the loaded data
+_MEMORY_FACTOR: int = 4
+
+
+def map_time_chunks(
+    dataset: xr.Dataset,
+    func: Callable[[xr.Dataset], T],
+    max_memory: int,
+    dim: str = "time",
+) -> T:
+    """Apply a function chunk by chunk over time with bounded memory.
+
+    The dataset is loaded in blocks of timesteps, so that the loaded data and
+    temporary arrays of `func` stay below `max_memory`. The results are
+    concatenated along time, i.e. `func` must be independent per timestep, e.g.
+    `lambda ds: ds.mean(dim="cell")`. Select the required variables beforehand,
+    all variables with a time dimension are loaded.
+
+    :param max_memory: memory limit in bytes.
+    :param dim: dimension of the chunks instead of time, e.g. 'sim' of the
+        ensemble dataset.
+    """
+    tnum = dataset.sizes[dim]
+    step_bytes = sum(
+        variable.nbytes // tnum
+        for variable in dataset.data_vars.values()
+        if dim in variable.dims
+    )
+    steps = max(1, max_memory // max(1, _MEMORY_FACTOR * step_bytes))
+
+    results = []
+    for k in range(0, tnum, steps):
+        chunk = dataset.isel({dim: slice(k, k + steps)}).load()
+        results.append(func(chunk))
+        del chunk
+
+    return xr.concat(results, dim=dim)
+
+
+def ensemble_dataset(
+    xdmf_paths: dict[str, Path],
+    ensemble_path: Path,
+    times: np.ndarray,
+    conditions: Optional[pd.DataFrame] = None,
+    variables: Optional[list[str]] = None,
+    dim: str = "cell",
+    overwrite: bool = False,
+) -> xr.Dataset:
+    """Stack the mesh datasets of multiple simulations in an ensemble dataset.
+
+    The cell (point) data of every simulation is interpolated on the shared time
+    grid and stacked along the dimension 'sim' in a chunked HDF5 file, with one
+    simulation per chunk. Simulations are processed one by one, i.e. only a single
+    simulation is in memory. The ensemble is opened lazily via `open_mesh_dataset`.
+
+    The columns of `conditions` (indexed by sim id) are stored as coordinates along
+    'sim', e.g. `pattern_key` and `boundary_flow_key`. These allow vectorised
+    statistics over conditions, e.g. `ensemble.groupby("pattern_key").mean()`, or
+    selection via `ensemble.set_xindex(["pattern_key", "boundary_flow_key"])`.
+
+    The file stores the fingerprint of the xdmfs and parameters and is rebuilt if
+    these change.
+
+    :param xdmf_paths: dictionary of sim id: xdmf path.
+    :param times: shared time grid.
+    :param conditions: simulation conditions indexed by the sim ids.
+    :param variables: variables to stack, all variables of the first simulation
+        by default.
+    :param dim: stack the 'cell' or 'point' data.
+    :param overwrite: recreate the ensemble even if it is up to date.
+    """
+    sim_ids = list(xdmf_paths)
+    if not sim_ids:
+        raise ValueError("No simulations for ensemble dataset.")
+
+    key = _fingerprint_attr(
+        fingerprint(
+            files={},
+            sims={sim_id: xdmf_fingerprint(xdmf_paths[sim_id]) for sim_id in sim_ids},
+            times=np.asarray(times, dtype=float).tolist(),
+            conditions=None if conditions is None else conditions.to_json(),
+            variables=variables,
+            dim=dim,
         )
-        xr_points = xr_points.rename_dims(dims_dict={"index": "point"})
-        xr_points = xr_points.assign_coords(coords={"time": timepoints})
-        # serialize to netCDF4
-        xr_points.to_netcdf(xr_points_path)
+    )
+    if not overwrite and ensemble_path.exists():
+        ensemble = open_mesh_dataset(ensemble_path)
+        if ensemble.attrs.get("fingerprint") == key:
+            console.print(f"ensemble file exists: {ensemble_path}")
+            return ensemble
+        console.print(f"ensemble file outdated: {ensemble_path}")
 
-    return xr_cells, xr_points
+    h5_tmp = ensemble_path.parent / f"{ensemble_path.name}.{os.getpid()}.tmp"
+    with h5py.File(h5_tmp, "w") as f:
+        f.attrs["fingerprint"] = key
+        coords = f.create_group("coords", track_order=True)
+        data_vars = f.create_group("data_vars", track_order=True)
+        _h5_coord(coords, "sim", ["sim"], sim_ids)
+        _h5_coord(coords, "time", ["time"], times)
+        if conditions is not None:
+            for column in conditions.columns:
+                _h5_coord(
+                    coords,
+                    column,
+                    ["sim"],
+                    conditions.loc[sim_ids, column].tolist(),
+                )
+
+        for k, sim_id in enumerate(
+            track(sim_ids, description="Create ensemble dataset ...")
+        ):
+            xr_cells, xr_points = mesh_datasets_from_xdmf(xdmf_paths[sim_id])
+            xr_data = xr_cells if dim == "cell" else xr_points
+            if variables is None:
+                variables = [str(name) for name in xr_data.data_vars]
+            xr_sim = xr_data[variables].interp(time=times)
+
+            if k == 0:
+                for name in ["index", "component", "tensor_component"]:
+                    if name in xr_data.coords:
+                        dims = [str(d) for d in xr_data[name].dims]
+                        _h5_coord(coords, name, dims, xr_data[name])
+                for name in variables:
+                    shape = xr_sim[name].shape
+                    dtype = xr_sim[name].dtype
+                    rows = _chunk_rows(
+                        int(np.prod(shape[1:])) * dtype.itemsize, len(times)
+                    )
+                    dset = data_vars.create_dataset(
+                        name,
+                        shape=(len(sim_ids), *shape),
+                        dtype=dtype,
+                        chunks=(1, rows, *shape[1:]),
+                    )
+                    dset.attrs["dims"] = ["sim", *map(str, xr_sim[name].dims)]
+
+            for name in variables:
+                data_vars[name][k] = xr_sim[name].values
+            xr_cells.close()
+            xr_points.close()
+
+    os.replace(h5_tmp, ensemble_path)
+    return open_mesh_dataset(ensemble_path)
+
+
+# decomposition of cells in tetrahedra (volumes) or triangles (areas)
+_CELL_SIMPLICES: dict[str, list[list[int]]] = {
+    "triangle": [[0, 1, 2]],
+    "quad": [[0, 1, 2], [0, 2, 3]],
+    "tetra": [[0, 1, 2, 3]],
+    "wedge": [[0, 1, 2, 3], [1, 2, 3, 4], [2, 3, 4, 5]],
+    "hexahedron": [
+        [0, 1, 3, 4],
+        [1, 2, 3, 6],
+        [1, 4, 5, 6],
+        [3, 4, 6, 7],
+        [1, 3, 4, 6],
+    ],
+}
+
+
+def cell_volumes(points: np.ndarray, cells: list[CellBlock]) -> np.ndarray:
+    """Calculate the volumes (areas for 2D cells) of all cells of the mesh.
+
+    Cells are decomposed in tetrahedra (triangles), which is exact for cells with
+    planar faces.
+    """
+    volumes: list[np.ndarray] = []
+    for cell_block in cells:
+        if cell_block.type not in _CELL_SIMPLICES:
+            raise ValueError(f"Unsupported cell type for volumes: {cell_block.type}")
+        volume = np.zeros(len(cell_block.data))
+        for simplex in _CELL_SIMPLICES[cell_block.type]:
+            p = points[cell_block.data[:, simplex]]
+            edges = p[:, 1:] - p[:, :1]
+            if len(simplex) == 4:
+                volume += np.abs(np.linalg.det(edges)) / 6.0
+            else:
+                cross = np.cross(edges[:, 0], edges[:, 1])
+                volume += np.sqrt(np.einsum("ij,ij->i", cross, cross)) / 2.0
+        volumes.append(volume)
+    return np.concatenate(volumes)
+
+
+def point_volumes(
+    num_points: int, cells: list[CellBlock], volumes: np.ndarray
+) -> np.ndarray:
+    """Lumped point volumes, the cell volumes are distributed equally on the nodes."""
+    point_volume = np.zeros(num_points)
+    start = 0
+    for cell_block in cells:
+        n_cells, n_nodes = cell_block.data.shape
+        point_volume += np.bincount(
+            cell_block.data.ravel(),
+            weights=np.repeat(volumes[start : start + n_cells] / n_nodes, n_nodes),
+            minlength=num_points,
+        )
+        start += n_cells
+    return point_volume
+
+
+def _weighted_quantiles(
+    values: np.ndarray, weights: np.ndarray, quantiles: np.ndarray
+) -> np.ndarray:
+    """Weighted quantiles (inverted cumulative distribution)."""
+    order = np.argsort(values)
+    cumulative = np.cumsum(weights[order])
+    indices = np.searchsorted(cumulative, quantiles * cumulative[-1])
+    return np.asarray(values[order][np.minimum(indices, len(values) - 1)])
+
+
+def mesh_reductions(
+    xdmf_path: Path,
+    variables: Optional[list[str]] = None,
+    quantiles: Sequence[float] = (0.05, 0.5, 0.95),
+    threshold: float = 0.0,
+    volume_variable: Optional[str] = None,
+    derived: Optional[DerivedVariables] = None,
+) -> pd.DataFrame:
+    """Calculate volume weighted reductions of variables over the mesh.
+
+    The steps are streamed from the XDMF in a single pass, i.e. only one step is in
+    memory. For every variable and step the following metrics are calculated
+    - integral: sum of value * volume
+    - mean: integral / total volume (density)
+    - fraction: volume fraction with value > threshold
+    - min, max
+    - q<quantile>: volume weighted quantiles
+
+    Cell data is weighted by the cell volumes, point data by the lumped point
+    volumes. The volumes are calculated once from the geometry (reference
+    configuration) and reused for all steps. Vectors and tensors are reduced via
+    their magnitude and trace.
+
+    :param variables: cell and point variables, all variables by default.
+    :param threshold: threshold for the volume fraction.
+    :param volume_variable: cell variable with the cell volumes, e.g.
+        'element_volume_point_TPM', read once from the first step instead of the
+        geometric volumes.
+    :param derived: derived variables which can be used in the variables.
+    :returns: DataFrame with time index and (variable, metric) columns.
+    """
+    xdmf_info: XDMFInfo = XDMFInfo.from_path(xdmf_path)
+    attribute_types = {
+        name: info.attribute_type
+        for name, info in {**xdmf_info.point_data, **xdmf_info.cell_data}.items()
+    }
+    if variables is None:
+        variables = list(attribute_types)
+    for name in variables:
+        if derived is not None and name in derived:
+            attribute_types[name] = derived[name].attribute_type
+        elif name not in attribute_types:
+            raise ValueError(f"Variable '{name}' does not exist: {xdmf_path}")
+    variables = [
+        name
+        for name in variables
+        if attribute_types[name]
+        in {AttributeType.SCALAR, AttributeType.VECTOR, AttributeType.TENSOR}
+    ]
+    q = np.asarray(quantiles, dtype=float)
+    metrics = ["integral", "mean", "fraction", "min", "max"] + [
+        f"q{quantile:g}" for quantile in q
+    ]
+
+    with XDMFReader(xdmf_path, mmap=False) as reader:
+        # volumes are calculated once
+        points, cells = reader.read_points_cells()
+        if volume_variable is not None:
+            volume_cell = reader.read_array(0, volume_variable).reshape(-1)
+            volume_cell = volume_cell.astype(float)
+        else:
+            volume_cell = cell_volumes(points, cells)
+        volume_point = point_volumes(len(points), cells, volume_cell)
+
+        # derived variables are evaluated per step
+        source = reader if derived is None else derived.reader(reader)
+        cell_variables = {name for name in variables if source.center(name) == "Cell"}
+
+        tnum = reader.num_steps
+        results: dict[str, np.ndarray] = {}
+        for k in track(
+            range(tnum), description=f"Calculate mesh reductions '{xdmf_path}' ..."
+        ):
+            for name in variables:
+                if name in cell_variables:
+                    size, weights = xdmf_info.num_cells, volume_cell
+                else:
+                    size, weights = xdmf_info.num_points, volume_point
+                data = source.read_array(k, name).reshape(size, -1)
+                for key, (dims, values) in _mesh_arrays(
+                    name, data, attribute_types[name]
+                ).items():
+                    if dims:
+                        continue
+                    if key not in results:
+                        results[key] = np.empty((tnum, len(metrics)))
+                    values = values.astype(float)
+                    integral = np.dot(values, weights)
+                    total = weights.sum()
+                    results[key][k, :5] = [
+                        integral,
+                        integral / total,
+                        weights[values > threshold].sum() / total,
+                        values.min(),
+                        values.max(),
+                    ]
+                    results[key][k, 5:] = _weighted_quantiles(values, weights, q)
+
+        times = reader.times
+
+    df = pd.concat(
+        {key: pd.DataFrame(data, columns=metrics) for key, data in results.items()},
+        axis=1,
+    )
+    df.index = pd.Index(times, name="time")
+    return df
+
+
+def zone_edges(zones: Union[int, Sequence[float]]) -> np.ndarray:
+    """Edges of the PP-PV zones.
+
+    :param zones: number of equidistant zones in [0, 1] or zone edges.
+    """
+    edges = (
+        np.linspace(0.0, 1.0, num=zones + 1)
+        if isinstance(zones, int)
+        else np.asarray(zones, dtype=float)
+    )
+    if len(edges) < 2 or np.any(np.diff(edges) <= 0.0):
+        raise ValueError(f"Zone edges must be increasing: {edges}")
+    return edges
+
+
+def zone_indices(positions: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Zone of the positions, -1 for positions outside of the zones or nan."""
+    positions = np.asarray(positions, dtype=float)
+    num_zones = len(edges) - 1
+    zone = np.searchsorted(edges, positions, side="right") - 1
+    # last edge belongs to last zone
+    zone[positions == edges[-1]] = num_zones - 1
+    zone[zone >= num_zones] = -1
+    return zone
+
+
+def zonation_profiles(
+    xdmf_path: Path,
+    variables: Optional[list[str]] = None,
+    zones: Union[int, Sequence[float]] = 10,
+    positions: Optional[np.ndarray] = None,
+    position_variable: str = "rr_position",
+    volume_variable: Optional[str] = None,
+    overwrite: bool = False,
+) -> xr.Dataset:
+    """Calculate volume weighted profiles of cell variables over the PP-PV zones.
+
+    Cells are binned once by their position in [0, 1] (periportal to perivenous)
+    into zones. For every step the volume weighted mean and standard deviation
+    per zone are calculated in a single streaming pass, resulting in (time, zone)
+    arrays, i.e. kymographs. Cells outside of the zones (or without position) are
+    ignored. Vectors and tensors are reduced via their magnitude and trace.
+
+    The profiles are cached in `*_zones.nc` with the fingerprint of the xdmf and
+    parameters, see `xdmf_fingerprint`.
+
+    :param variables: cell variables, all cell variables by default.
+    :param zones: number of equidistant zones or zone edges.
+    :param positions: cell positions, e.g. the 'position' of the `ZonatedMesh`.
+    :param position_variable: cell variable with the positions, used if no positions
+        are provided. Read from the last step, positions are not set in the initial
+        step of the simulations.
+    :param volume_variable: cell variable with the cell volumes, read once from
+        the first step instead of the geometric volumes.
+    :param overwrite: recalculate the profiles even if they are up to date.
+    :returns: Dataset with '<variable>' (mean) and '<variable>_std' with dims
+        (time, zone), the zone volumes and the zone edges and centers.
+    """
+    edges = zone_edges(zones)
+    zones_path = xdmf_path.parent / f"{xdmf_path.stem}_zones.nc"
+    key = _fingerprint_attr(
+        xdmf_fingerprint(
+            xdmf_path,
+            variables=variables,
+            edges=edges.tolist(),
+            positions=None
+            if positions is None
+            else hashlib.sha256(np.ascontiguousarray(positions).tobytes()).hexdigest(),
+            position_variable=position_variable,
+            volume_variable=volume_variable,
+        )
+    )
+    if not overwrite and zones_path.exists():
+        xr_zones: xr.Dataset = xr.open_dataset(zones_path)
+        if xr_zones.attrs.get("fingerprint") == key:
+            console.print(f"zones file exists: {zones_path}")
+            return xr_zones
+        console.print(f"zones file outdated: {zones_path}")
+        xr_zones.close()
+
+    xdmf_info: XDMFInfo = XDMFInfo.from_path(xdmf_path)
+    if variables is None:
+        variables = list(xdmf_info.cell_data)
+    for name in variables:
+        if name not in xdmf_info.cell_data:
+            raise ValueError(f"Cell variable '{name}' does not exist: {xdmf_path}")
+    variables = [
+        name
+        for name in variables
+        if xdmf_info.cell_data[name].attribute_type
+        in {AttributeType.SCALAR, AttributeType.VECTOR, AttributeType.TENSOR}
+    ]
+    num_zones = len(edges) - 1
+
+    with XDMFReader(xdmf_path, mmap=False) as reader:
+        # zones and volume weights are calculated once
+        if positions is None:
+            positions = reader.read_array(reader.num_steps - 1, position_variable)
+        zone = zone_indices(np.asarray(positions).reshape(-1), edges)
+        mask = zone >= 0
+        zone = zone[mask]
+
+        if volume_variable is not None:
+            volume = reader.read_array(0, volume_variable).reshape(-1).astype(float)
+        else:
+            volume = cell_volumes(*reader.read_points_cells())
+        volume = volume[mask]
+        zone_volume = np.bincount(zone, weights=volume, minlength=num_zones)
+        # empty zones result in nan
+        with np.errstate(divide="ignore"):
+            zone_volume_inv = np.where(zone_volume > 0, 1.0 / zone_volume, np.nan)
+
+        tnum = reader.num_steps
+        data_vars: dict[str, tuple[tuple[str, ...], np.ndarray]] = {}
+        for k in track(range(tnum), description=f"Calculate zones '{xdmf_path}' ..."):
+            for name in variables:
+                data = reader.read_array(k, name).reshape(xdmf_info.num_cells, -1)
+                for var_key, (dims, values) in _mesh_arrays(
+                    name, data[mask], xdmf_info.cell_data[name].attribute_type
+                ).items():
+                    if dims:
+                        continue
+                    if var_key not in data_vars:
+                        for suffix in ["", "_std"]:
+                            data_vars[f"{var_key}{suffix}"] = (
+                                ("time", "zone"),
+                                np.empty((tnum, num_zones)),
+                            )
+                    values = values.astype(float)
+                    mean = (
+                        np.bincount(zone, weights=volume * values, minlength=num_zones)
+                        * zone_volume_inv
+                    )
+                    mean_square = (
+                        np.bincount(
+                            zone, weights=volume * values**2, minlength=num_zones
+                        )
+                        * zone_volume_inv
+                    )
+                    data_vars[var_key][1][k] = mean
+                    data_vars[f"{var_key}_std"][1][k] = np.sqrt(
+                        np.maximum(mean_square - mean**2, 0.0)
+                    )
+
+        times = np.asarray(reader.times, dtype=float)
+
+    xr_zones = xr.Dataset(
+        data_vars={**data_vars, "volume": (("zone",), zone_volume)},
+        coords={
+            "time": times,
+            "zone": np.arange(num_zones),
+            "position": (("zone",), (edges[:-1] + edges[1:]) / 2),
+            "zone_start": (("zone",), edges[:-1]),
+            "zone_end": (("zone",), edges[1:]),
+        },
+        attrs={"fingerprint": key},
+    )
+    xr_zones.to_netcdf(zones_path)
+    return xr_zones
 
 
 if __name__ == "__main__":
@@ -130,3 +865,6 @@ if __name__ == "__main__":
     console.print(xr_cells)
     console.rule(align="left", title="point_data", style="white")
     console.print(xr_points)
+
+    console.rule(align="left", title="mesh reductions", style="white")
+    console.print(mesh_reductions(xdmf_path, variables=["rr_necrosis", "rr_protein"]))
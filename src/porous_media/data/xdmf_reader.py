@@ -0,0 +1,330 @@
+"""Random access reader for timecourse XDMF with HDF5 data.
+
+The XDMF XML is parsed once and every (step, variable) is mapped to its HDF5
+dataset. Arbitrary subsets of variables, steps and index ranges are read
+directly with h5py, i.e. only the requested data is read from disk.
+
+The reader is compatible with `meshio.xdmf.TimeSeriesReader`, i.e.
+`read_points_cells` and `read_data` return the same data structures.
+
+Geometry from shared, content-hashed geometry files (see `XDMFWriter`) is
+read once per process and reused for all XDMFs referencing the file.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Optional
+from xml.etree import ElementTree as ET
+
+import h5py
+import numpy as np
+from meshio import CellBlock
+from meshio.xdmf.common import (
+    translate_mixed_cells,
+    xdmf_to_meshio_type,
+    xdmf_to_numpy_type,
+)
+
+
+# prefix of the shared, content-hashed geometry files
+GEOMETRY_PREFIX = "geometry_"
+
+# read-only geometry of the shared geometry files, {(h5_path, dataset): data}
+_geometry_cache: dict[tuple[Path, str], np.ndarray] = {}
+
+
+@dataclass
+class DataItem:
+    """HDF5 dataset referenced by a DataItem in the XDMF."""
+
+    h5_path: Path
+    dataset: str
+    shape: tuple[int, ...]
+    dtype: np.dtype
+
+
+@dataclass
+class XDMFAttribute:
+    """Attribute (point or cell data) of a timestep."""
+
+    name: str
+    center: str
+    attribute_type: str
+    data_item: DataItem
+
+
+class XDMFReader:
+    """Random access reader for timecourse XDMF.
+
+    :param xdmf_path: timecourse xdmf with HDF5 data.
+    :param mmap: return memory-mapped arrays for contiguous, uncompressed datasets.
+    """
+
+    def __init__(self, xdmf_path: Path, mmap: bool = True):
+        self.path: Path = Path(xdmf_path)
+        self.mmap: bool = mmap
+        self._h5_files: dict[Path, h5py.File] = {}
+        self._cell_blocks: Optional[list[tuple[str, int]]] = None
+
+        root = ET.parse(self.path).getroot()
+        if root.tag != "Xdmf":
+            raise ValueError(f"Not an XDMF file: {self.path}")
+        domain = root.find("Domain")
+        if domain is None:
+            raise ValueError(f"No 'Domain' in XDMF: {self.path}")
+
+        collection: Optional[ET.Element] = None
+        mesh_grid: Optional[ET.Element] = None
+        for grid in domain.findall("Grid"):
+            if grid.get("GridType") == "Collection":
+                collection = grid
+            elif grid.get("GridType") == "Uniform":
+                mesh_grid = grid
+        if collection is None or collection.get("CollectionType") != "Temporal":
+            raise ValueError(f"No temporal collection in XDMF: {self.path}")
+        if mesh_grid is None:
+            raise ValueError(f"No mesh grid in XDMF: {self.path}")
+
+        # geometry and topology
+        geometry = mesh_grid.find("Geometry")
+        topology = mesh_grid.find("Topology")
+        if geometry is None or topology is None:
+            raise ValueError(f"No 'Geometry' or 'Topology' in XDMF: {self.path}")
+        self.geometry: DataItem = self._parse_data_item(geometry)
+        self.topology: DataItem = self._parse_data_item(topology)
+        self.topology_type: str = topology.get("TopologyType", topology.get("Type", ""))
+        self.num_cells: int = int(topology.get("NumberOfElements", 0))
+
+        # timesteps
+        times: list[float] = []
+        self.steps: list[dict[str, XDMFAttribute]] = []
+        for step in collection.findall("Grid"):
+            time = step.find("Time")
+            if time is None:
+                raise ValueError(f"Timestep without 'Time' in XDMF: {self.path}")
+            times.append(float(time.attrib["Value"]))
+
+            attributes: dict[str, XDMFAttribute] = {}
+            for attribute in step.findall("Attribute"):
+                name = attribute.attrib["Name"]
+                attributes[name] = XDMFAttribute(
+                    name=name,
+                    center=attribute.get("Center", "Node"),
+                    attribute_type=attribute.get("AttributeType", "Scalar"),
+                    data_item=self._parse_data_item(attribute),
+                )
+            self.steps.append(attributes)
+
+        self.times: np.ndarray = np.array(times, dtype=float)
+
+    def __enter__(self) -> XDMFReader:
+        """Enter context."""
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        """Exit context and close the HDF5 files."""
+        self.close()
+
+    def close(self) -> None:
+        """Close all opened HDF5 files."""
+        for f in self._h5_files.values():
+            f.close()
+        self._h5_files = {}
+
+    @property
+    def num_steps(self) -> int:
+        """Number of timesteps."""
+        return len(self.steps)
+
+    @property
+    def num_points(self) -> int:
+        """Number of points."""
+        return self.geometry.shape[0]
+
+    @property
+    def point_variables(self) -> list[str]:
+        """Names of point data in the first timestep."""
+        if not self.steps:
+            return []
+        return [a.name for a in self.steps[0].values() if a.center == "Node"]
+
+    @property
+    def cell_variables(self) -> list[str]:
+        """Names of cell data in the first timestep."""
+        if not self.steps:
+            return []
+        return [a.name for a in self.steps[0].values() if a.center == "Cell"]
+
+    def _parse_data_item(self, element: ET.Element) -> DataItem:
+        """Parse the HDF5 DataItem of an XDMF element."""
+        data_items = element.findall("DataItem")
+        if len(data_items) != 1:
+            raise ValueError(f"Exactly one DataItem required in '{element.tag}'.")
+        data_item = data_items[0]
+
+        data_format = data_item.get("Format", "XML")
+        if data_format != "HDF":
+            raise ValueError(
+                f"Only HDF data supported, but format is '{data_format}': {self.path}"
+            )
+        data_type = data_item.get("DataType", data_item.get("NumberType", "Float"))
+        precision = data_item.get("Precision", "4")
+        shape = tuple(int(d) for d in data_item.attrib["Dimensions"].split())
+
+        # HDF5 paths are relative to the XDMF file
+        if data_item.text is None:
+            raise ValueError(f"Empty DataItem in '{element.tag}': {self.path}")
+        filename, dataset = data_item.text.strip().split(":")
+        return DataItem(
+            h5_path=self.path.resolve().parent / filename,
+            dataset=dataset,
+            shape=shape,
+            dtype=np.dtype(xdmf_to_numpy_type[(data_type, precision)]),
+        )
+
+    def _h5_file(self, h5_path: Path) -> h5py.File:
+        """Get opened HDF5 file."""
+        if h5_path not in self._h5_files:
+            self._h5_files[h5_path] = h5py.File(h5_path, "r")
+        return self._h5_files[h5_path]
+
+    def read_data_item(self, data_item: DataItem, index: Any = None) -> np.ndarray:
+        """Read data of DataItem.
+
+        Contiguous and uncompressed datasets are memory-mapped (if `mmap`), in
+        all other cases only the selected index range is read by h5py.
+
+        :param index: index or slice in the first dimension (points or cells).
+        """
+        dset: h5py.Dataset = self._h5_file(data_item.h5_path)[data_item.dataset]
+
+        if self.mmap and dset.chunks is None and dset.compression is None:
+            offset = dset.id.get_offset()
+            if offset is not None:
+                data: np.ndarray = np.memmap(
+                    data_item.h5_path,
+                    mode="r",
+                    dtype=dset.dtype,
+                    shape=dset.shape,
+                    offset=offset,
+                )
+                return data if index is None else data[index]
+
+        if index is None:
+            return np.asarray(dset[()])
+        if isinstance(index, np.ndarray) and index.dtype != bool:
+            # h5py requires increasing indices
+            order, inverse = np.unique(index, return_inverse=True)
+            return np.asarray(dset[order])[inverse]
+        return np.asarray(dset[index])
+
+    def _cell_block_info(self) -> list[tuple[str, int]]:
+        """Cell types and number of cells for the cell blocks."""
+        if self._cell_blocks is None:
+            self._cell_blocks = [
+                (cell_block.type, len(cell_block)) for cell_block in self.read_cells()
+            ]
+        return self._cell_blocks
+
+    def _read_geometry(self, data_item: DataItem) -> np.ndarray:
+        """Read geometry or topology.
+
+        Shared geometry files are content-hashed, i.e. immutable, and the
+        read-only data is cached for the process.
+        """
+        if not data_item.h5_path.name.startswith(GEOMETRY_PREFIX):
+            return np.asarray(self.read_data_item(data_item))
+
+        key = (data_item.h5_path.resolve(), data_item.dataset)
+        if key not in _geometry_cache:
+            data = np.array(self.read_data_item(data_item))
+            data.flags.writeable = False
+            _geometry_cache[key] = data
+        return _geometry_cache[key]
+
+    def read_points(self) -> np.ndarray:
+        """Read points of the mesh."""
+        return self._read_geometry(self.geometry)
+
+    def read_cells(self) -> list[CellBlock]:
+        """Read cell blocks of the mesh."""
+        data = self._read_geometry(self.topology)
+        if self.topology_type == "Mixed":
+            cells: list[CellBlock] = translate_mixed_cells(data)
+        else:
+            cells = [CellBlock(xdmf_to_meshio_type[self.topology_type], data)]
+        self._cell_blocks = [(c.type, len(c)) for c in cells]
+        return cells
+
+    def read_points_cells(self) -> tuple[np.ndarray, list[CellBlock]]:
+        """Read points and cells of the mesh."""
+        return self.read_points(), self.read_cells()
+
+    def read_array(self, k: int, name: str, index: Any = None) -> np.ndarray:
+        """Read data of a single variable at timestep k.
+
+        :param index: index or slice in the first dimension (points or cells).
+        """
+        attributes = self.steps[k]
+        if name not in attributes:
+            raise KeyError(f"Variable '{name}' does not exist in step {k}.")
+        return self.read_data_item(attributes[name].data_item, index=index)
+
+    def center(self, name: str) -> str:
+        """Center of the variable, i.e. 'Node' (point data) or 'Cell' (cell data)."""
+        if not self.steps or name not in self.steps[0]:
+            raise KeyError(f"Variable '{name}' does not exist.")
+        return self.steps[0][name].center
+
+    def split_cell_data(self, data: np.ndarray) -> list[np.ndarray]:
+        """Split cell data of all cells in the data of the cell blocks."""
+        blocks: list[np.ndarray] = []
+        start = 0
+        for _, n_cells in self._cell_block_info():
+            blocks.append(data[start : start + n_cells])
+            start += n_cells
+        return blocks
+
+    def read_variable(
+        self,
+        name: str,
+        steps: Optional[Iterable[int]] = None,
+        index: Any = None,
+    ) -> np.ndarray:
+        """Read a variable for multiple timesteps.
+
+        :param steps: timestep indices, all steps by default.
+        :param index: index or slice in the first dimension (points or cells).
+        :returns: array with shape (steps, index, ...)
+        """
+        step_indices = range(self.num_steps) if steps is None else steps
+        return np.stack([self.read_array(k, name, index=index) for k in step_indices])
+
+    def read_data(
+        self, k: int, variables: Optional[Iterable[str]] = None
+    ) -> tuple[float, dict[str, np.ndarray], dict[str, list[np.ndarray]]]:
+        """Read point and cell data of timestep k.
+
+        :param variables: subset of variables to read, all variables by default.
+        :returns: time, point_data and cell_data analogue to meshio.
+        """
+        attributes = self.steps[k]
+        names = list(attributes) if variables is None else list(variables)
+
+        point_data: dict[str, np.ndarray] = {}
+        cell_data: dict[str, list[np.ndarray]] = {}
+        for name in names:
+            if name not in attributes:
+                raise KeyError(f"Variable '{name}' does not exist in step {k}.")
+            attribute = attributes[name]
+            data = self.read_data_item(attribute.data_item)
+            if attribute.center == "Node":
+                point_data[name] = data
+            elif attribute.center == "Cell":
+                cell_data[name] = self.split_cell_data(data)
+            else:
+                raise ValueError(f"Unsupported center '{attribute.center}': {name}")
+
+        return float(self.times[k]), point_data, cell_data
@@ -6,29 +6,81 @@ https://www.xdmf.org/index.php/XDMF_Model_and_Format
 
 from __future__ import annotations
 
+import hashlib
 import json
+import multiprocessing
 import os
-import shutil
+import re
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
 from copy import deepcopy
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from enum import Enum
 from pathlib import Path
-from typing import Any
+from queue import Empty
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, Optional
 
-import meshio
 import numpy as np
+import pandas as pd
 from dataclasses_json import dataclass_json
 from meshio import CellBlock
-from meshio._common import raw_from_cell_data
-from meshio.xdmf.common import attribute_type
-from rich.progress import track
+from rich.progress import Progress, TaskID, track
 
+from porous_media import __version__
 from porous_media.console import console
+from porous_media.data.xdmf_reader import XDMFAttribute, XDMFReader
+from porous_media.data.vtk_reader import VTKReader
+from porous_media.data.xdmf_writer import (
+    STORAGE_PROFILES,
+    StorageProfile,
+    XDMFWriter,
+)
 from porous_media.log import get_logger
 
 
+if TYPE_CHECKING:
+    from porous_media.data.derived_variables import DerivedVariables
+
+
 logger = get_logger(__name__)
 
+# version of the derived artifacts (sidecars and caches), increase on changes of
+# their content to invalidate existing caches
+CACHE_VERSION: str = f"{__version__}-1"
+
+
+def fingerprint(files: dict[str, Path], **params: Any) -> dict[str, Any]:
+    """Fingerprint of the inputs of a derived artifact.
+
+    Derived artifacts store the fingerprint of their inputs and are reused as long
+    as the fingerprint is unchanged, otherwise they are rebuilt. The fingerprint
+    consists of the cache version, modification time and size of the input files,
+    and a hash of the parameters.
+
+    :param files: dictionary of key: input file.
+    :param params: JSON serializable parameters of the artifact.
+    """
+    stats: dict[str, list[int]] = {}
+    for key, path in files.items():
+        stat = path.stat()
+        stats[key] = [stat.st_mtime_ns, stat.st_size]
+
+    d: dict[str, Any] = {"version": CACHE_VERSION, "files": stats}
+    if params:
+        content = json.dumps(params, sort_keys=True, default=str)
+        d["params"] = hashlib.sha256(content.encode()).hexdigest()
+    return d
+
+
+def xdmf_fingerprint(xdmf_path: Path, **params: Any) -> dict[str, Any]:
+    """Fingerprint of the XDMF and the referenced HDF5 files, see `fingerprint`."""
+    h5_refs = set(re.findall(r"([^\s<>\"]+\.h5):", xdmf_path.read_text()))
+    files: dict[str, Path] = {xdmf_path.name: xdmf_path}
+    for h5_ref in sorted(h5_refs):
+        files[h5_ref] = xdmf_path.parent / h5_ref
+    return fingerprint(files, **params)
+
 
 class AttributeType(str, Enum):
     """Definition of variable type."""
@@ -61,6 +113,9 @@ class XDMFInfo:
     - figure out scalars, vectors, ...
 
     Preprocessing of all the important information for the visualization later on.
+
+    The information is created from the XDMF metadata only, i.e. no data is read.
+    Points and cells are read lazily on access and are not stored.
     """
 
     path: Path
@@ -69,57 +124,132 @@ class XDMFInfo:
     num_steps: int
     num_points: int
     num_cells: int
-    points: list[Any]
-    cells: list[Any]
     point_data: dict[str, AttributeInfo]
     cell_data: dict[str, AttributeInfo]
 
+    @property
+    def points(self) -> np.ndarray:
+        """Read points of the mesh."""
+        with XDMFReader(self.path, mmap=False) as reader:
+            return reader.read_points()
+
+    @property
+    def cells(self) -> list[CellBlock]:
+        """Read cells of the mesh."""
+        with XDMFReader(self.path, mmap=False) as reader:
+            return reader.read_cells()
+
+    @classmethod
+    def json_path_from_xdmf(cls, xdmf_path: Path) -> Path:
+        """Calculate JSON path from xdmf path."""
+        return xdmf_path.parent / f"{xdmf_path.stem}_info.json"
+
     @staticmethod
-    def from_path(xdmf_path: Path) -> XDMFInfo:
-        """Create XDMFInformation from xdmf path."""
-        if not xdmf_path:
+    def from_path(xdmf_path: Path, use_cache: bool = True) -> XDMFInfo:
+        """Create XDMFInformation from xdmf path.
+
+        The information is cached in a JSON sidecar which is reused as long as
+        the fingerprint of the xdmf is unchanged, see `xdmf_fingerprint`.
+
+        :param use_cache: read and write the cached information.
+        """
+        if not xdmf_path.exists():
             raise IOError(f"xdmf_path does not exist: {xdmf_path}")
 
-        with meshio.xdmf.TimeSeriesReader(xdmf_path) as reader:
-            points, cells = reader.read_points_cells()
+        key = xdmf_fingerprint(xdmf_path)
+        json_path = XDMFInfo.json_path_from_xdmf(xdmf_path)
+        if use_cache and json_path.exists():
+            with open(json_path, "r") as f_json:
+                d = json.load(f_json)
+            if d.get("fingerprint") == key:
+                return XDMFInfo._from_dict(xdmf_path, d["info"])
 
-            # process most information based on initial data and points and cells
-            tstart, point_data, cell_data = reader.read_data(0)
+        with XDMFReader(xdmf_path) as reader:
+            if reader.num_steps == 0:
+                raise IOError(f"xdmf_path has no timesteps: {xdmf_path}")
 
-            point_data_info = {}
-            for name, data in point_data.items():
-                point_data_info[name] = AttributeInfo(
+            point_data_info: dict[str, AttributeInfo] = {}
+            cell_data_info: dict[str, AttributeInfo] = {}
+            for name, attribute in reader.steps[0].items():
+                info = AttributeInfo(
                     name=name,
-                    attribute_type=attribute_type(data),
-                    shape=np.dstack(data).shape,
+                    attribute_type=_attribute_type(attribute.attribute_type),
+                    shape=attribute.data_item.shape,
+                )
+                if attribute.center == "Node":
+                    point_data_info[name] = info
+                else:
+                    cell_data_info[name] = info
+
+            xdmf_info = XDMFInfo(
+                path=xdmf_path,
+                tstart=float(reader.times[0]),
+                tend=float(reader.times[-1]),
+                num_steps=reader.num_steps,
+                num_points=reader.num_points,
+                num_cells=reader.num_cells,
+                point_data=point_data_info,
+                cell_data=cell_data_info,
+            )
+
+        if use_cache:
+            with open(json_path, "w") as f_json:
+                json.dump(
+                    {"fingerprint": key, "info": xdmf_info._to_dict()}, f_json, indent=2
                 )
 
-            cell_data_info = {}
-            raw = raw_from_cell_data(cell_data)
-            for name, data in raw.items():
-                cell_data_info[name] = AttributeInfo(
+        return xdmf_info
+
+    def _to_dict(self) -> dict[str, Any]:
+        """Serialize information (without path) to dictionary."""
+        return {
+            "tstart": self.tstart,
+            "tend": self.tend,
+            "num_steps": self.num_steps,
+            "num_points": self.num_points,
+            "num_cells": self.num_cells,
+            "point_data": {
+                name: [info.attribute_type.value, list(info.shape)]
+                for name, info in self.point_data.items()
+            },
+            "cell_data": {
+                name: [info.attribute_type.value, list(info.shape)]
+                for name, info in self.cell_data.items()
+            },
+        }
+
+    @staticmethod
+    def _from_dict(xdmf_path: Path, d: dict[str, Any]) -> XDMFInfo:
+        """Create information from serialized dictionary."""
+        attribute_infos: dict[str, dict[str, AttributeInfo]] = {}
+        for key in ["point_data", "cell_data"]:
+            attribute_infos[key] = {
+                name: AttributeInfo(
                     name=name,
-                    attribute_type=AttributeType(attribute_type(data)),
-                    shape=np.dstack(data).shape,
+                    attribute_type=AttributeType(atype),
+                    shape=tuple(shape),
                 )
+                for name, (atype, shape) in d[key].items()
+            }
 
-            # get end time
-            tend, _, _ = reader.read_data(reader.num_steps - 1)
-
-        cell_block: CellBlock = cells[0]
-        xdmf_info = XDMFInfo(
+        return XDMFInfo(
             path=xdmf_path,
-            tstart=tstart,
-            tend=tend,
-            num_steps=reader.num_steps,
-            num_points=len(points),
-            num_cells=len(cell_block),
-            points=points,
-            cells=cells,
-            point_data=point_data_info,
-            cell_data=cell_data_info,
+            tstart=d["tstart"],
+            tend=d["tend"],
+            num_steps=d["num_steps"],
+            num_points=d["num_points"],
+            num_cells=d["num_cells"],
+            point_data=attribute_infos["point_data"],
+            cell_data=attribute_infos["cell_data"],
         )
-        return xdmf_info
+
+
+def _attribute_type(value: str) -> AttributeType:
+    """Get AttributeType for XDMF AttributeType, unknown types are OTHER."""
+    try:
+        return AttributeType(value)
+    except ValueError:
+        return AttributeType.OTHER
 
 
 @dataclass_json
@@ -135,85 +265,108 @@ class DataLimits:
         return xdmf_path.parent / f"{xdmf_path.stem}_limits.json"
 
     @classmethod
-    def from_xdmf(cls, xdmf_path: Path, overwrite: bool = False) -> DataLimits:
+    def from_xdmf(
+        cls,
+        xdmf_path: Path,
+        overwrite: bool = False,
+        variables: Optional[Iterable[str]] = None,
+        derived: Optional[DerivedVariables] = None,
+    ) -> DataLimits:
         """Calculate data limits from XDMF timecourse..
 
         This takes some time because it requires iteration over the complete dataset.
         Should support subsets and operations such as merging of limits from multiple
         simulations.
+
+        The limits are cached in a JSON sidecar with the fingerprint of the xdmf and
+        are recalculated if the xdmf changes, see `xdmf_fingerprint`.
+
+        :param overwrite: recalculate the limits even if the JSON is up to date.
+        :param variables: subset of variables, only these variables are read. The
+            JSON is only written for the limits of all variables.
+        :param derived: derived variables which can be used in the variables.
         """
+        selection: Optional[list[str]] = None if variables is None else list(variables)
+
         # check existing Json
         json_path = cls.json_path_from_xdmf(xdmf_path)
+        key = xdmf_fingerprint(xdmf_path)
         if not overwrite and json_path.exists():
-            console.print(f"json file exists: {json_path}")
             with open(json_path, "r") as f_json:
                 d = json.load(f_json)
-                return DataLimits(**d)
-
-        # read information
-        xdmf_info = XDMFInfo.from_path(xdmf_path)
+            if d.pop("fingerprint", None) != key:
+                console.print(f"json file outdated: {json_path}")
+            else:
+                console.print(f"json file exists: {json_path}")
+                data_limits = DataLimits(**d)
+                if selection is None:
+                    return data_limits
+                if all(name in data_limits.limits for name in selection):
+                    return DataLimits(
+                        limits={name: data_limits.limits[name] for name in selection}
+                    )
 
-        point_limits: dict[str, tuple[float, float]] = {}
-        cell_limits: dict[str, tuple[float, float]] = {}
-        with meshio.xdmf.TimeSeriesReader(xdmf_path) as reader:
-            _, _ = reader.read_points_cells()
+        data_limits = DataLimits(limits={})
+        with XDMFReader(xdmf_path) as reader:
+            if selection is None:
+                selection = reader.point_variables + reader.cell_variables
+            read_data = (
+                reader.read_data
+                if derived is None
+                else derived.reader(reader).read_data
+            )
 
             for k in track(
                 range(reader.num_steps), description="Calculating data limits ..."
             ):
-                t, point_data, cell_data = reader.read_data(k)
-
-                # point data limits
-                for name in xdmf_info.point_data:
-                    # min and max from data
-                    data = point_data[name]
-                    data = np.dstack(data)
-                    data = data.squeeze()
-                    dmin = float(data.min())  # casting for JSON serialization
-                    dmax = float(data.max())
-
-                    limits: tuple[float, float]
-                    if k == 0:
-                        point_limits[name] = (dmin, dmax)
-
-                    # update limits
-                    limits = point_limits[name]
-                    point_limits[name] = (
-                        dmin if limits[0] > dmin else limits[0],
-                        dmax if limits[1] < dmax else limits[1],
-                    )
+                _, point_data, cell_data = read_data(k, variables=selection)
+                data_limits.update(point_data=point_data, cell_data=cell_data)
 
-                # cell data limits
-                for name in xdmf_info.cell_data:
-                    # min and max from data
-                    data = cell_data[name]
-                    data = np.dstack(data)
-                    data = data.squeeze()
-                    dmin = float(data.min())
-                    dmax = float(data.max())
-
-                    if k == 0:
-                        cell_limits[name] = (dmin, dmax)
-
-                    # update limits
-                    limits = cell_limits[name]
-                    cell_limits[name] = (
-                        dmin if limits[0] > dmin else limits[0],
-                        dmax if limits[1] < dmax else limits[1],
-                    )
+        if variables is None:
+            data_limits.save_json(json_path, fingerprint=key)
+        return data_limits
 
-        data_limits = DataLimits(
-            limits={
-                **point_limits,
-                **cell_limits,
-            }
-        )
+    def update(
+        self,
+        point_data: dict[str, np.ndarray],
+        cell_data: dict[str, list[np.ndarray]],
+    ) -> None:
+        """Update limits with the point and cell data of a single timestep.
+
+        Allows to accumulate the limits in the same pass which writes the data.
+        """
+        for name, data in point_data.items():
+            self._update_limits(name, [data])
+        for name, data_blocks in cell_data.items():
+            self._update_limits(name, data_blocks)
+
+    def _update_limits(self, name: str, data_blocks: list[np.ndarray]) -> None:
+        """Update limits of variable with data from cell blocks."""
+        # casting for JSON serialization
+        dmin = float(min(np.min(data) for data in data_blocks))
+        dmax = float(max(np.max(data) for data in data_blocks))
+
+        if name in self.limits:
+            limits = self.limits[name]
+            dmin = dmin if limits[0] > dmin else limits[0]
+            dmax = dmax if limits[1] < dmax else limits[1]
+
+        self.limits[name] = (dmin, dmax)
+
+    def save_json(
+        self, json_path: Path, fingerprint: Optional[dict[str, Any]] = None
+    ) -> None:
+        """Serialize limits to JSON.
+
+        :param fingerprint: fingerprint of the xdmf the limits are calculated from.
+        """
         with open(json_path, "w") as f_json:
-            djson: dict = data_limits.to_dict()  # type: ignore
+            djson: dict = self.to_dict()  # type: ignore
+            if fingerprint is not None:
+                djson["fingerprint"] = fingerprint
             json.dump(djson, fp=f_json, indent=2)
 
         console.print(f"json file created: {json_path}")
-        return data_limits
 
     @staticmethod
     def merge_limits(data_limits: list[DataLimits]) -> DataLimits:
@@ -226,6 +379,9 @@ class DataLimits:
                 continue
             else:
                 for name, lims_k in dlim.limits.items():
+                    if name not in limits:
+                        limits[name] = lims_k
+                        continue
                     lims = limits[name]
                     limits[name] = (
                         lims_k[0] if lims_k[0] < lims[0] else lims[0],
@@ -236,7 +392,12 @@ class DataLimits:
 
 
 def xdmfs_from_directory(
-    input_dir: Path, xdmf_dir: Path, overwrite: bool = False
+    input_dir: Path,
+    xdmf_dir: Path,
+    overwrite: bool = False,
+    n_workers: int = 1,
+    storage_profile: Optional[StorageProfile] = None,
+    shared_geometry: bool = False,
 ) -> dict[Path, Path]:
     """Create the XDMF files from a given input directory.
 
@@ -245,31 +406,42 @@ def xdmfs_from_directory(
 
     Processes directory and all subdirectories which contain vtks. This allows to
     easily create all xdms for a given directory.
-    XDMF file structure is analogue to the structure in the original directory
+    XDMF file structure is analogue to the structure in the original directory.
+    Existing XDMFs are updated incrementally, i.e. only new VTK steps are appended.
+
+    With `n_workers > 1` the directories are converted in a process pool, the
+    largest directories are scheduled first. The limits of all XDMFs are merged
+    and stored in the xdmf_dir.
 
     :param input_dir: directory with VTKs, possible subdirectories
     :param xdmf_dir: directory in which the xdmfs are generated
+    :param n_workers: number of worker processes for converting the directories
+    :param storage_profile: compression, chunking and precision of the HDF5 data
+    :param shared_geometry: store the geometry once in the 'geometry' subdirectory
+        of the xdmf_dir, which is referenced by all XDMFs.
     :returns: Dictionary {xdmf_path: subdirectory}
     """
     console.rule(title="XDMF from directory", align="left", style="white")
     # processes all folders with vtk
 
-    # iterate over all directories and subdirectories to collect vtk directories
-    vtk_dirs: list[Path] = []
-    all_dirs = sorted([input_dir] + list(input_dir.rglob("*")))
+    # single walk over the directory tree to collect the vtk directories
+    vtk_counts: dict[Path, int] = {}
+    vtk_sizes: dict[Path, int] = {}
+    for vtk_path in input_dir.rglob("*.vtk"):
+        d = vtk_path.parent
+        vtk_counts[d] = vtk_counts.get(d, 0) + 1
+        vtk_sizes[d] = vtk_sizes.get(d, 0) + vtk_path.stat().st_size
 
-    for d in all_dirs:
-        vtk_paths = sorted(list(d.glob("*.vtk")))
-        n_vtks = len(vtk_paths)
-        if n_vtks > 0:
-            console.print(f"{n_vtks} VTKs: {d}")
-            vtk_dirs.append(d)
+    vtk_dirs: list[Path] = sorted(vtk_counts)
+    for d in vtk_dirs:
+        console.print(f"{vtk_counts[d]} VTKs: {d}")
 
     if not vtk_dirs:
         logger.error(
             f"No directory with VTKs in '{input_dir}'. "
             f"Check if the 'febio_dir' is correct."
         )
+        return {}
 
     # process the VTKs in the directory
     xdmf_dict: dict[Path, Path] = {}
@@ -278,54 +450,531 @@ def xdmfs_from_directory(
         d_name = d_name.replace("/", "__")
         xdmf_path = xdmf_dir / f"{d_name}.xdmf"
         xdmf_dict[xdmf_path] = vtk_dir
-        vtks_to_xdmf(vtk_dir=vtk_dir, xdmf_path=xdmf_path, overwrite=overwrite)
+
+    geometry_dir = xdmf_dir / "geometry" if shared_geometry else None
+    if n_workers <= 1:
+        for xdmf_path, vtk_dir in xdmf_dict.items():
+            vtks_to_xdmf(
+                vtk_dir=vtk_dir,
+                xdmf_path=xdmf_path,
+                overwrite=overwrite,
+                storage_profile=storage_profile,
+                geometry_dir=geometry_dir,
+            )
+    else:
+        _xdmfs_from_directories(
+            xdmf_dict,
+            vtk_counts=vtk_counts,
+            vtk_sizes=vtk_sizes,
+            overwrite=overwrite,
+            n_workers=n_workers,
+            storage_profile=storage_profile,
+            geometry_dir=geometry_dir,
+        )
+
+    # merge limits of all simulations
+    data_limits = DataLimits.merge_limits(
+        [DataLimits.from_xdmf(xdmf_path) for xdmf_path in xdmf_dict]
+    )
+    data_limits.save_json(xdmf_dir / "merged_limits.json")
 
     return xdmf_dict
 
 
-def vtks_to_xdmf(vtk_dir: Path, xdmf_path: Path, overwrite: bool = False) -> None:
+def _vtks_to_xdmf_worker(
+    vtk_dir: Path,
+    xdmf_path: Path,
+    overwrite: bool,
+    storage_profile: Optional[StorageProfile],
+    geometry_dir: Optional[Path],
+    queue: Any,
+) -> Path:
+    """Convert VTK directory in a worker process.
+
+    Every converted step is reported via the queue, the console output of the
+    worker is suppressed.
+    """
+    console.quiet = True
+    vtks_to_xdmf(
+        vtk_dir=vtk_dir,
+        xdmf_path=xdmf_path,
+        overwrite=overwrite,
+        storage_profile=storage_profile,
+        geometry_dir=geometry_dir,
+        step_callback=lambda: queue.put(str(xdmf_path)),
+    )
+    return xdmf_path
+
+
+def _xdmfs_from_directories(
+    xdmf_dict: dict[Path, Path],
+    vtk_counts: dict[Path, int],
+    vtk_sizes: dict[Path, int],
+    overwrite: bool,
+    n_workers: int,
+    storage_profile: Optional[StorageProfile] = None,
+    geometry_dir: Optional[Path] = None,
+) -> None:
+    """Convert the VTK directories in a process pool with progress per directory."""
+    # largest directories first, the executor processes submissions in order
+    xdmf_paths = sorted(xdmf_dict, key=lambda p: vtk_sizes[xdmf_dict[p]], reverse=True)
+
+    # spawn workers, forking the multi-threaded parent can deadlock
+    mp_context = multiprocessing.get_context("spawn")
+    with (
+        mp_context.Manager() as manager,
+        ProcessPoolExecutor(max_workers=n_workers, mp_context=mp_context) as executor,
+        Progress(console=console) as progress,
+    ):
+        queue = manager.Queue()
+        tasks: dict[Path, TaskID] = {}
+        futures: dict[Future, Path] = {}
+        for xdmf_path in xdmf_paths:
+            vtk_dir = xdmf_dict[xdmf_path]
+            tasks[xdmf_path] = progress.add_task(
+                xdmf_path.stem, total=vtk_counts[vtk_dir]
+            )
+            future = executor.submit(
+                _vtks_to_xdmf_worker,
+                vtk_dir,
+                xdmf_path,
+                overwrite,
+                storage_profile,
+                geometry_dir,
+                queue,
+            )
+            futures[future] = xdmf_path
+
+        pending: set[Future] = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            while True:
+                try:
+                    progress.advance(tasks[Path(queue.get_nowait())])
+                except Empty:
+                    break
+            for future in done:
+                # raises exceptions of the worker
+                xdmf_path = future.result()
+                progress.update(
+                    tasks[xdmf_path], completed=vtk_counts[xdmf_dict[xdmf_path]]
+                )
+
+
+@dataclass_json
+@dataclass
+class VTKStep:
+    """VTK file converted to a timestep of the XDMF."""
+
+    name: str
+    size: int
+    mtime_ns: int
+    time: float
+
+    @staticmethod
+    def from_path(vtk_path: Path, time: float) -> VTKStep:
+        """Create step information from the VTK file."""
+        stat = vtk_path.stat()
+        return VTKStep(
+            name=vtk_path.name, size=stat.st_size, mtime_ns=stat.st_mtime_ns, time=time
+        )
+
+    def is_unchanged(self, vtk_path: Path) -> bool:
+        """Check that the VTK file was not modified since the conversion."""
+        stat = vtk_path.stat()
+        return (
+            self.name == vtk_path.name
+            and self.size == stat.st_size
+            and self.mtime_ns == stat.st_mtime_ns
+        )
+
+
+@dataclass_json
+@dataclass
+class ConversionManifest:
+    """Manifest of the VTK steps converted to the XDMF.
+
+    The manifest is updated after every written step and allows to append new
+    steps to existing XDMFs and to resume interrupted conversions.
+    """
+
+    steps: list[VTKStep]
+
+    @classmethod
+    def json_path_from_xdmf(cls, xdmf_path: Path) -> Path:
+        """Calculate JSON path from xdmf path."""
+        return xdmf_path.parent / f"{xdmf_path.stem}_manifest.json"
+
+    @classmethod
+    def load(cls, json_path: Path) -> Optional[ConversionManifest]:
+        """Load manifest from JSON, None if the manifest does not exist."""
+        if not json_path.exists():
+            return None
+        with open(json_path, "r") as f_json:
+            d = json.load(f_json)
+        return ConversionManifest(steps=[VTKStep(**step) for step in d["steps"]])
+
+    def save(self, json_path: Path) -> None:
+        """Serialize manifest to JSON."""
+        # atomic replacement, the manifest is rewritten after every step
+        tmp_path = json_path.parent / f"{json_path.name}.tmp"
+        with open(tmp_path, "w") as f_json:
+            djson: dict = self.to_dict()  # type: ignore
+            json.dump(djson, fp=f_json, indent=2)
+        os.replace(tmp_path, json_path)
+
+
+def _read_vtk_time(vtk_path: Path) -> float:
+    """Read time of the VTK timestep from the header."""
+    with open(vtk_path, "r") as f_vtk:
+        f_vtk.readline()  # skip first line
+        line = f_vtk.readline()
+        return float(line.strip().split(" ")[-1])
+
+
+# VTK reader of the process, caches the geometry of the current VTK directory
+_vtk_readers: dict[Path, VTKReader] = {}
+
+
+def _vtk_reader(vtk_dir: Path) -> VTKReader:
+    """Get the VTK reader for the directory."""
+    if vtk_dir not in _vtk_readers:
+        _vtk_readers.clear()
+        _vtk_readers[vtk_dir] = VTKReader()
+    return _vtk_readers[vtk_dir]
+
+
+def _read_vtk_step(
+    vtk_path: Path,
+) -> tuple[float, dict[str, np.ndarray], dict[str, list[np.ndarray]]]:
+    """Read time and data of a single VTK timestep.
+
+    Module level function so it can be pickled to the worker processes.
+    """
+    return _vtk_reader(vtk_path.parent).read(vtk_path)
+
+
+def _iter_vtk_steps(
+    vtk_paths: list[Path], n_workers: int = 1, max_pending: Optional[int] = None
+) -> Iterator[tuple[float, dict[str, np.ndarray], dict[str, list[np.ndarray]]]]:
+    """Iterate over the parsed VTK timesteps in order of the paths.
+
+    With `n_workers > 1` the steps are parsed in a process pool. At most
+    `max_pending` steps are submitted, parsed or being consumed, which provides
+    the back-pressure on the workers.
+    """
+    if n_workers <= 1:
+        for vtk_path in vtk_paths:
+            yield _read_vtk_step(vtk_path)
+        return
+
+    if max_pending is None:
+        max_pending = 2 * n_workers
+    if max_pending < 1:
+        raise ValueError(f"'max_pending' must be >= 1, but is {max_pending}")
+
+    paths = iter(vtk_paths)
+    # spawn workers, forking the multi-threaded parent can deadlock
+    mp_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp_context) as executor:
+        pending: deque[Future] = deque()
+        for vtk_path in paths:
+            pending.append(executor.submit(_read_vtk_step, vtk_path))
+            if len(pending) >= max_pending:
+                break
+
+        while pending:
+            yield pending.popleft().result()
+            # refill after the writer consumed the step
+            next_path: Optional[Path] = next(paths, None)
+            if next_path is not None:
+                pending.append(executor.submit(_read_vtk_step, next_path))
+
+
+def _converted_steps(vtk_paths: list[Path], xdmf_path: Path) -> list[VTKStep]:
+    """Get the VTK steps which are already converted to the XDMF.
+
+    These are the steps of the manifest up to the first VTK which was modified
+    since the conversion and which are complete in the XDMF. XDMFs without a
+    manifest are adopted if the times agree with the VTK headers.
+    """
+    with XDMFReader(xdmf_path) as reader:
+        times_xdmf = reader.times
+
+    manifest = ConversionManifest.load(
+        ConversionManifest.json_path_from_xdmf(xdmf_path)
+    )
+    if manifest is None:
+        steps: list[VTKStep] = []
+        for vtk_path, t in zip(vtk_paths, times_xdmf):
+            time = _read_vtk_time(vtk_path)
+            if not np.isclose(time, t):
+                break
+            steps.append(VTKStep.from_path(vtk_path, time=time))
+        return steps
+
+    num_steps = 0
+    for step, vtk_path in zip(manifest.steps, vtk_paths):
+        if not step.is_unchanged(vtk_path):
+            break
+        num_steps += 1
+    return manifest.steps[: min(num_steps, len(times_xdmf))]
+
+
+def vtks_to_xdmf(
+    vtk_dir: Path,
+    xdmf_path: Path,
+    overwrite: bool = False,
+    n_workers: int = 1,
+    max_pending: Optional[int] = None,
+    storage_profile: Optional[StorageProfile] = None,
+    geometry_dir: Optional[Path] = None,
+    step_callback: Optional[Callable[[], None]] = None,
+) -> None:
     """Convert VTK timesteps to XDMF time course.
 
-    :param overwrite: forces overwrite of files, by default existing files are ignored.
+    The VTK steps can be parsed in parallel by a process pool (`n_workers > 1`).
+    Parsed steps are handed back to a single writer which appends them in order
+    of the VTK files to the time series.
+
+    The converted VTKs (size, mtime and time) are recorded in a manifest next to
+    the XDMF. Existing XDMFs are updated incrementally, new VTK steps are appended
+    and interrupted conversions are resumed from the last complete step. Steps
+    from modified VTKs onwards are converted again.
+
+    :param overwrite: forces conversion of all steps, by default existing steps
+        are reused.
+    :param n_workers: number of worker processes for parsing the VTKs, 1 is serial
+    :param max_pending: maximum number of parsed or submitted steps not yet written,
+        bounds the peak memory; defaults to 2 * n_workers.
+    :param storage_profile: compression, chunking and precision of the HDF5 data,
+        for appended steps the profile applies to the new steps.
+    :param geometry_dir: directory of the shared, content-hashed geometry files;
+        by default the geometry is stored in the HDF5 of the XDMF.
+    :param step_callback: called after every converted step, e.g. for reporting
+        the progress.
     """
     console.rule(title=f"{xdmf_path}", style="white")
 
     vtk_paths = sorted(list(vtk_dir.glob("*.vtk")))
-    mesh: meshio.Mesh = meshio.read(vtk_paths[0])
 
     if not xdmf_path.parent.exists():
         xdmf_path.parent.mkdir(parents=True)
 
     console.print(f"{vtk_dir} -> {xdmf_path}")
+    manifest_path = ConversionManifest.json_path_from_xdmf(xdmf_path)
+    limits_path = DataLimits.json_path_from_xdmf(xdmf_path)
+
+    steps: list[VTKStep] = []
+    num_steps_xdmf = 0
     if not overwrite and xdmf_path.exists():
-        console.print(f"xdmf file exists: {xdmf_path}")
+        steps = _converted_steps(vtk_paths, xdmf_path)
+        num_steps_xdmf = XDMFInfo.from_path(xdmf_path).num_steps
+
+    if steps and len(steps) == len(vtk_paths) == num_steps_xdmf:
+        console.print(f"xdmf file is up to date: {xdmf_path}")
+        ConversionManifest(steps=steps).save(manifest_path)
         DataLimits.from_xdmf(xdmf_path=xdmf_path, overwrite=overwrite)
         return
 
-    with meshio.xdmf.TimeSeriesWriter(xdmf_path, data_format="HDF") as writer:
-        writer.write_points_cells(mesh.points, mesh.cells)
-
-        for k in track(range(len(vtk_paths)), description="Processing VTKs ..."):
-            vtk_path = vtk_paths[k]
-            # read timepoint
-            with open(vtk_path, "r") as f_vtk:
-                f_vtk.readline()  # skip first line
-                line = f_vtk.readline()
-                t = float(line.strip().split(" ")[-1])
+    # limits of the existing steps are updated with the new steps
+    data_limits: Optional[DataLimits] = DataLimits(limits={})
+    if steps:
+        console.print(
+            f"append {len(vtk_paths) - len(steps)} steps to {len(steps)} steps: "
+            f"{xdmf_path}"
+        )
+        if len(steps) == num_steps_xdmf and limits_path.exists():
+            data_limits = DataLimits.from_xdmf(xdmf_path=xdmf_path)
+        else:
+            # removed steps, limits are recalculated
+            data_limits = None
+
+    vtk_paths_new = vtk_paths[len(steps) :]
+    with XDMFWriter(
+        xdmf_path,
+        mode="a" if steps else "w",
+        storage_profile=storage_profile,
+        geometry_dir=geometry_dir,
+    ) as writer:
+        if steps:
+            writer.truncate(len(steps))
+        else:
+            points, cells = _vtk_reader(vtk_dir).read_points_cells(vtk_paths[0])
+            writer.write_points_cells(points, cells)
+        ConversionManifest(steps=steps).save(manifest_path)
+
+        for vtk_path, (t, point_data, cell_data) in zip(
+            vtk_paths_new,
+            track(
+                _iter_vtk_steps(
+                    vtk_paths_new, n_workers=n_workers, max_pending=max_pending
+                ),
+                total=len(vtk_paths_new),
+                description="Processing VTKs ...",
+                console=console,
+            ),
+        ):
+            writer.write_data(t, point_data=point_data, cell_data=cell_data)
+            if data_limits is not None:
+                data_limits.update(point_data=point_data, cell_data=cell_data)
+
+            # step is complete in the XDMF
+            steps.append(VTKStep.from_path(vtk_path, time=t))
+            ConversionManifest(steps=steps).save(manifest_path)
+            if step_callback is not None:
+                step_callback()
+
+    # Store limits
+    if data_limits is not None:
+        data_limits.save_json(limits_path, fingerprint=xdmf_fingerprint(xdmf_path))
+    else:
+        DataLimits.from_xdmf(xdmf_path=xdmf_path, overwrite=True)
+
+
+class InterpolationMethod(str, Enum):
+    """Method for the interpolation of timecourses."""
+
+    NEAREST = "nearest"
+    LINEAR = "linear"
+    MONOTONE_CUBIC = "monotone_cubic"
+
+
+class _StreamingInterpolator:
+    """Interpolation of all variables of the XDMF steps.
+
+    All variables of a step are stacked in a single vector. The source steps are
+    read once in increasing order, only the window of steps required for the
+    current interval is kept in the cache.
+    """
 
-            # read mesh
-            mesh = meshio.read(vtk_path)
-            writer.write_data(t, point_data=mesh.point_data, cell_data=mesh.cell_data)
+    def __init__(self, reader: XDMFReader, method: InterpolationMethod):
+        self.reader = reader
+        self.method = method
+        self.times: np.ndarray = reader.times
+        self.attributes: list[XDMFAttribute] = list(reader.steps[0].values())
+        self.sizes: list[int] = [
+            int(np.prod(a.data_item.shape)) for a in self.attributes
+        ]
+        self.offsets: np.ndarray = np.cumsum([0] + self.sizes)
+
+        self._data: dict[int, np.ndarray] = {}
+        self._slopes: dict[int, np.ndarray] = {}
+
+    def _window(self, i: int) -> range:
+        """Source steps required for the interval [i, i+1]."""
+        n = len(self.times)
+        if self.method == InterpolationMethod.MONOTONE_CUBIC:
+            return range(max(i - 1, 0), min(i + 2, n - 1) + 1)
+        return range(i, min(i + 1, n - 1) + 1)
+
+    def _update_cache(self, i: int) -> None:
+        """Slide the cache to the window of interval i."""
+        window = self._window(i)
+        for cache in [self._data, self._slopes]:
+            for k in [k for k in cache if k < window.start]:
+                del cache[k]
+        for k in window:
+            if k not in self._data:
+                self._data[k] = np.concatenate(
+                    [
+                        self.reader.read_array(k, a.name).ravel().astype(np.float64)
+                        for a in self.attributes
+                    ]
+                )
 
-    # Fix incorrect *.h5 path
-    # https://github.com/nschloe/meshio/pull/1358
-    h5_path = xdmf_path.parent / f"{xdmf_path.stem}.h5"
-    if h5_path.exists():
-        os.remove(h5_path)
-    shutil.move(f"{xdmf_path.stem}.h5", str(xdmf_path.parent))
+    def _secant(self, k: int) -> np.ndarray:
+        """Slope between step k and k+1."""
+        h = self.times[k + 1] - self.times[k]
+        if h <= 0.0:
+            return np.zeros_like(self._data[k])
+        result: np.ndarray = (self._data[k + 1] - self._data[k]) / h
+        return result
+
+    def _slope(self, k: int) -> np.ndarray:
+        """Monotone (Fritsch-Carlson) derivative at step k analogue to PCHIP."""
+        if k in self._slopes:
+            return self._slopes[k]
+
+        n = len(self.times)
+        t = self.times
+        d: np.ndarray
+        if n == 2:
+            d = self._secant(0)
+        elif k == 0 or k == n - 1:
+            # one-sided three-point estimate, shape preserving
+            if k == 0:
+                h0, h1 = t[1] - t[0], t[2] - t[1]
+                m0, m1 = self._secant(0), self._secant(1)
+            else:
+                h0, h1 = t[n - 1] - t[n - 2], t[n - 2] - t[n - 3]
+                m0, m1 = self._secant(n - 2), self._secant(n - 3)
+            d = ((2 * h0 + h1) * m0 - h0 * m1) / (h0 + h1)
+            d[np.sign(d) != np.sign(m0)] = 0.0
+            mask = (np.sign(m0) != np.sign(m1)) & (np.abs(d) > 3.0 * np.abs(m0))
+            d[mask] = 3.0 * m0[mask]
+        else:
+            # weighted harmonic mean of the secants
+            h0, h1 = t[k] - t[k - 1], t[k + 1] - t[k]
+            m0, m1 = self._secant(k - 1), self._secant(k)
+            w1, w2 = 2 * h1 + h0, h1 + 2 * h0
+            d = np.zeros_like(m0)
+            mask = (np.sign(m0) * np.sign(m1)) > 0
+            d[mask] = (w1 + w2) / (w1 / m0[mask] + w2 / m1[mask])
+
+        self._slopes[k] = d
+        return d
+
+    def interpolate(self, t: float, i: int) -> np.ndarray:
+        """Interpolate stacked data at time t in the interval [i, i+1]."""
+        self._update_cache(i)
+        if len(self.times) == 1:
+            return self._data[0]
+
+        h = self.times[i + 1] - self.times[i]
+        s = 1.0 if h <= 0.0 else (t - self.times[i]) / h
+        x0, x1 = self._data[i], self._data[i + 1]
+
+        if self.method == InterpolationMethod.NEAREST:
+            return x0 if s <= 0.5 else x1
+        elif self.method == InterpolationMethod.LINEAR:
+            result: np.ndarray = (1.0 - s) * x0 + s * x1
+            return result
+        elif self.method == InterpolationMethod.MONOTONE_CUBIC:
+            # cubic Hermite basis
+            h00 = 2 * s**3 - 3 * s**2 + 1
+            h10 = s**3 - 2 * s**2 + s
+            h01 = -2 * s**3 + 3 * s**2
+            h11 = s**3 - s**2
+            result = (
+                h00 * x0
+                + h10 * h * self._slope(i)
+                + h01 * x1
+                + h11 * h * self._slope(i + 1)
+            )
+            return result
+
+        raise ValueError(f"Unsupported interpolation method: {self.method}")
+
+    def unstack(
+        self, data: np.ndarray
+    ) -> tuple[dict[str, np.ndarray], dict[str, list[np.ndarray]]]:
+        """Split stacked data in point data and cell data."""
+        point_data: dict[str, np.ndarray] = {}
+        cell_data: dict[str, list[np.ndarray]] = {}
+        for k, a in enumerate(self.attributes):
+            values = (
+                data[self.offsets[k] : self.offsets[k + 1]]
+                .reshape(a.data_item.shape)
+                .astype(a.data_item.dtype)
+            )
+            if a.center == "Node":
+                point_data[a.name] = values
+            else:
+                # single cell block of all cells
+                cell_data[a.name] = [values]
 
-    # Calculate limits
-    DataLimits.from_xdmf(xdmf_path=xdmf_path, overwrite=overwrite)
+        return point_data, cell_data
 
 
 def interpolate_xdmf(
@@ -333,95 +982,193 @@ def interpolate_xdmf(
     xdmf_out: Path,
     times_interpolate: np.ndarray,
     overwrite: bool = False,
+    method: InterpolationMethod = InterpolationMethod.LINEAR,
+    storage_profile: Optional[StorageProfile] = None,
+    geometry_dir: Optional[Path] = None,
 ) -> None:
-    """Interpolate XDMF."""
-    console.rule(title=f"Interpolate {xdmf_in}", style="white")
+    """Interpolate XDMF.
 
-    if not overwrite and xdmf_out.exists():
-        console.print(f"xdmf file exists: {xdmf_out}")
-        DataLimits.from_xdmf(xdmf_path=xdmf_out, overwrite=overwrite)
-        return
+    The source steps are read once in order with a sliding window cache, all
+    variables of a step are interpolated together as a single stacked array.
 
-    with meshio.xdmf.TimeSeriesReader(xdmf_in) as reader:
-        points, cells = reader.read_points_cells()
-
-        with meshio.xdmf.TimeSeriesWriter(xdmf_out) as writer:
-            writer.write_points_cells(points, cells)
+    The fingerprints of the source with the interpolation parameters and of the
+    written output are stored in the JSON sidecar `*_source.json`, existing
+    interpolations are reused as long as both fingerprints are unchanged.
 
-            tnum = reader.num_steps
-            times_data = np.zeros((tnum,))
-            for k in track(range(tnum), description="Calculating timepoints ..."):
-                t, _, _ = reader.read_data(k)
-                times_data[k] = t
+    :param times_interpolate: increasing timepoints within the time range of the data
+    :param overwrite: interpolate even if the existing interpolation is up to date.
+    :param method: interpolation method, nearest, linear or monotone cubic (PCHIP)
+    :param storage_profile: compression, chunking and precision of the HDF5 data
+    :param geometry_dir: directory of the shared, content-hashed geometry files
+    """
+    console.rule(title=f"Interpolate {xdmf_in}", style="white")
 
-            if times_interpolate[0] < times_data[0]:
-                raise ValueError(
-                    f"Lower interpolation range outside of data: {times_interpolate[0]} < {times_data[0]}"
-                )
-            if times_interpolate[-1] > times_data[-1]:
-                raise ValueError(
-                    f"Upper interpolation range outside of data: {times_interpolate[-1]} > {times_data[-1]}"
-                )
+    times_interpolate = np.asarray(times_interpolate, dtype=float)
+    source_path = xdmf_out.parent / f"{xdmf_out.stem}_source.json"
+    key = xdmf_fingerprint(
+        xdmf_in,
+        times=times_interpolate.tolist(),
+        method=method.value,
+        storage_profile=asdict(
+            storage_profile if storage_profile is not None else StorageProfile()
+        ),
+        geometry_dir=str(geometry_dir.resolve()) if geometry_dir else None,
+    )
+    if not overwrite and xdmf_out.exists() and source_path.exists():
+        with open(source_path, "r") as f_json:
+            d = json.load(f_json)
+        if d.get("fingerprint") == key and d.get("output") == xdmf_fingerprint(
+            xdmf_out
+        ):
+            console.print(f"xdmf file is up to date: {xdmf_out}")
+            DataLimits.from_xdmf(xdmf_path=xdmf_out)
+            return
+
+    if np.any(np.diff(times_interpolate) < 0.0):
+        raise ValueError("Interpolation timepoints must be increasing.")
+
+    with XDMFReader(xdmf_in) as reader:
+        points, cells = reader.read_points_cells()
+        times_data = reader.times
+
+        if times_interpolate[0] < times_data[0]:
+            raise ValueError(
+                f"Lower interpolation range outside of data: {times_interpolate[0]} < {times_data[0]}"
+            )
+        if times_interpolate[-1] > times_data[-1]:
+            raise ValueError(
+                f"Upper interpolation range outside of data: {times_interpolate[-1]} > {times_data[-1]}"
+            )
+
+        # lower index of the interval [i, i+1] for all timepoints
+        lower_indices = np.clip(
+            np.searchsorted(times_data, times_interpolate, side="right") - 1,
+            0,
+            max(reader.num_steps - 2, 0),
+        )
+        interpolator = _StreamingInterpolator(reader=reader, method=method)
 
-            lower_indices = np.zeros_like(times_interpolate, dtype=int)
-            upper_indices = np.zeros_like(times_interpolate, dtype=int)
-            for ki, ti in enumerate(times_interpolate):
-                lower_indices[ki] = np.argwhere(times_data <= ti).flatten()[-1]
-                upper_indices[ki] = np.argwhere(times_data >= ti).flatten()[0]
+        # limits are accumulated while writing the data
+        data_limits = DataLimits(limits={})
+        with XDMFWriter(
+            xdmf_out, storage_profile=storage_profile, geometry_dir=geometry_dir
+        ) as writer:
+            writer.write_points_cells(points, cells)
 
             # interpolate data for all data points
             for k in track(
                 range(len(times_interpolate)), description="Interpolating data ..."
             ):
-                t_interpolate = times_interpolate[k]
-                idx_low = lower_indices[k]
-                idx_up = upper_indices[k]
-
-                # interpolate all numpy matrices
-                t_low, point_data_low, cell_data_low = reader.read_data(idx_low)
-                t_up, point_data_up, cell_data_up = reader.read_data(idx_up)
-                f_up: float
-                f_low: float
-                if np.isclose(t_up, t_low):
-                    f_low = 0.0
-                    f_up = 1.0
-                else:
-                    f_low = (t_interpolate - t_low) / (t_up - t_low)
-                    f_up = (t_up - t_interpolate) / (t_up - t_low)
-
-                # interpolate point data
-                point_data = {}
-                for key in point_data_low:
-                    point_data[key] = (f_low * point_data_low[key]) + (
-                        f_up * point_data_up[key]
-                    )
-
-                # interpolate cell data
-                cell_data = {}
-                for key in cell_data_low:
-                    # console.print(f"{cell_data_low[key]}")
-                    # process the list
-                    cell_data[key] = [
-                        (f_low * cell_data_low[key][k]) + (f_up * cell_data_low[key][k])
-                        for k in range(len(cell_data_low[key]))
-                    ]
+                t_interpolate = float(times_interpolate[k])
+                data = interpolator.interpolate(t_interpolate, int(lower_indices[k]))
+                point_data, cell_data = interpolator.unstack(data)
 
                 # write interpolation point
                 writer.write_data(
                     t_interpolate, point_data=point_data, cell_data=cell_data
                 )
+                data_limits.update(point_data=point_data, cell_data=cell_data)
 
-        # Fix incorrect *.h5 path
-        # https://github.com/nschloe/meshio/pull/1358
+        # Store limits
+        key_out = xdmf_fingerprint(xdmf_out)
+        data_limits.save_json(
+            DataLimits.json_path_from_xdmf(xdmf_out), fingerprint=key_out
+        )
+        with open(source_path, "w") as f_json:
+            json.dump({"fingerprint": key, "output": key_out}, f_json, indent=2)
+
+        console.print(f"Interpolated data: {xdmf_out}")
+
+
+def copy_xdmf(
+    xdmf_in: Path,
+    xdmf_out: Path,
+    storage_profile: Optional[StorageProfile] = None,
+    geometry_dir: Optional[Path] = None,
+) -> None:
+    """Copy XDMF timecourse with the given storage profile.
+
+    Allows to compress or downcast existing XDMFs and to move the geometry of
+    existing XDMFs to a shared geometry file.
+    """
+    with (
+        XDMFReader(xdmf_in) as reader,
+        XDMFWriter(
+            xdmf_out, storage_profile=storage_profile, geometry_dir=geometry_dir
+        ) as writer,
+    ):
+        points, cells = reader.read_points_cells()
+        writer.write_points_cells(points, cells)
+        # limits are accumulated while copying the data
+        data_limits = DataLimits(limits={})
+        for k in range(reader.num_steps):
+            t, point_data, cell_data = reader.read_data(k)
+            writer.write_data(t, point_data=point_data, cell_data=cell_data)
+            data_limits.update(point_data=point_data, cell_data=cell_data)
+
+    data_limits.save_json(
+        DataLimits.json_path_from_xdmf(xdmf_out),
+        fingerprint=xdmf_fingerprint(xdmf_out),
+    )
+
+
+def benchmark_storage_profiles(
+    xdmf_path: Path,
+    output_dir: Path,
+    profiles: Optional[dict[str, StorageProfile]] = None,
+    num_cells: int = 100,
+) -> pd.DataFrame:
+    """Benchmark the size and read throughput of the storage profiles.
+
+    The XDMF is copied with every profile. Measured are the size of the HDF5,
+    the throughput for reading all variables of all timesteps (snapshot access)
+    and for reading num_cells cells of every variable over all timesteps
+    (time series access). Reads are from the page cache.
+
+    :returns: DataFrame with the results per profile.
+    """
+    if profiles is None:
+        profiles = STORAGE_PROFILES
+
+    results: list[dict[str, Any]] = []
+    for key, profile in profiles.items():
+        xdmf_out = output_dir / f"{xdmf_path.stem}_{key}.xdmf"
+        copy_xdmf(xdmf_path, xdmf_out, storage_profile=profile)
         h5_path = xdmf_out.parent / f"{xdmf_out.stem}.h5"
-        if h5_path.exists():
-            os.remove(h5_path)
-        shutil.move(f"{xdmf_out.stem}.h5", str(xdmf_out.parent))
 
-        # Calculate limits
-        DataLimits.from_xdmf(xdmf_path=xdmf_out, overwrite=overwrite)
+        with XDMFReader(xdmf_out) as reader:
+            nbytes = 0
+            time_start = time.perf_counter()
+            for k in range(reader.num_steps):
+                _, point_data, cell_data = reader.read_data(k)
+                for data in point_data.values():
+                    nbytes += np.array(data).nbytes
+                for data_blocks in cell_data.values():
+                    nbytes += sum(np.array(d).nbytes for d in data_blocks)
+            time_snapshot = time.perf_counter() - time_start
+
+            nbytes_series = 0
+            time_start = time.perf_counter()
+            for name in reader.point_variables + reader.cell_variables:
+                data = reader.read_variable(name, index=slice(0, num_cells))
+                nbytes_series += data.nbytes
+            time_series = time.perf_counter() - time_start
+
+        results.append(
+            {
+                "profile": key,
+                "size_mb": h5_path.stat().st_size / 1e6,
+                "snapshot_mb_per_s": nbytes / 1e6 / time_snapshot,
+                "series_mb_per_s": nbytes_series / 1e6 / time_series,
+            }
+        )
 
-        console.print(f"Interpolated data: {xdmf_out}")
+    df = pd.DataFrame(results).set_index("profile")
+    size_reference = df["size_mb"].iloc[0]
+    df["saved_mb"] = size_reference - df["size_mb"]
+    df["saved_percent"] = 100 * df["saved_mb"] / size_reference
+    console.print(df.to_string(float_format="{:.2f}".format))
+    return df
 
 
 if __name__ == "__main__":
@@ -435,6 +1182,11 @@ if __name__ == "__main__":
     xdmf_info: XDMFInfo = XDMFInfo.from_path(xdmf_path)
     console.print(xdmf_info)
 
+    # size and read throughput of the storage profiles
+    storage_dir = RESULTS_DIR / "storage_profiles"
+    storage_dir.mkdir(parents=True, exist_ok=True)
+    benchmark_storage_profiles(xdmf_path, output_dir=storage_dir)
+
     xdmf_paths: list[Path] = [
         Path(f"/home/mkoenig/git/porous_media/data/spt_substrate_scan/sim_{k}.xdmf")
         for k in range(21, 26)
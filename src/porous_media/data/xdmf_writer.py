@@ -0,0 +1,451 @@
+"""Writer for timecourse XDMF with HDF5 data.
+
+Writes the same XDMF/HDF5 layout as `meshio.xdmf.TimeSeriesWriter`, but
+
+- the HDF5 file is created next to the XDMF (and not in the working directory,
+  see https://github.com/nschloe/meshio/pull/1358)
+- existing timecourses can be opened for appending steps (`mode="a"`)
+- the XDMF is valid after every written step, i.e. an interrupted conversion
+  keeps all complete steps
+- the datasets can be compressed, chunked and downcast (`StorageProfile`)
+- the geometry can be written to a shared, content-hashed HDF5 which is
+  referenced by all XDMFs of a simulation ensemble (`geometry_dir`).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, Optional
+from xml.etree import ElementTree as ET
+
+import h5py
+import numpy as np
+from meshio import CellBlock
+from meshio._common import raw_from_cell_data
+from meshio.xdmf.common import (
+    attribute_type,
+    meshio_to_xdmf_type,
+    meshio_type_to_xdmf_index,
+    numpy_to_xdmf_dtype,
+)
+
+from porous_media.data.xdmf_reader import GEOMETRY_PREFIX
+
+
+XINCLUDE_NAMESPACE = "http://www.w3.org/2003/XInclude"
+ET.register_namespace("xi", XINCLUDE_NAMESPACE)
+
+
+@dataclass
+class StorageProfile:
+    """Storage of the datasets in the HDF5.
+
+    :param compression: HDF5 filter 'gzip' or 'lzf', None for uncompressed data.
+    :param compression_opts: gzip compression level (0-9).
+    :param shuffle: byte shuffle filter, improves the compression of floats.
+    :param chunk_bytes: target size of the chunks in bytes. Large chunks are
+        efficient for reading complete timesteps, small chunks for reading
+        subsets of cells over time. None stores uncompressed data contiguous and
+        uses automatic chunks for compressed data.
+    :param float32_variables: variables downcast to single precision.
+    """
+
+    compression: Optional[str] = None
+    compression_opts: Optional[int] = None
+    shuffle: bool = False
+    chunk_bytes: Optional[int] = None
+    float32_variables: list[str] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        """Validate profile."""
+        if self.compression not in {None, "gzip", "lzf"}:
+            raise ValueError(
+                f"Unsupported compression '{self.compression}', use 'gzip' or 'lzf'."
+            )
+
+    @property
+    def is_chunked(self) -> bool:
+        """Datasets are stored in chunks."""
+        return self.compression is not None or self.shuffle or bool(self.chunk_bytes)
+
+    def cast(self, name: str, data: np.ndarray) -> np.ndarray:
+        """Downcast the data of the variable."""
+        if name in self.float32_variables and data.dtype == np.float64:
+            return data.astype(np.float32)
+        return data
+
+    def dataset_kwargs(self, data: np.ndarray) -> dict[str, Any]:
+        """Keyword arguments for creating the HDF5 dataset of the data."""
+        kwargs: dict[str, Any] = {}
+        if data.ndim == 0 or data.size == 0:
+            return kwargs
+        if self.compression is not None:
+            kwargs["compression"] = self.compression
+            kwargs["compression_opts"] = self.compression_opts
+        if self.shuffle:
+            kwargs["shuffle"] = True
+        if self.chunk_bytes is not None:
+            row_bytes = data.itemsize * int(np.prod(data.shape[1:]))
+            rows = max(1, min(data.shape[0], self.chunk_bytes // row_bytes))
+            kwargs["chunks"] = (rows, *data.shape[1:])
+        return kwargs
+
+
+# storage profiles for the XDMF data
+STORAGE_PROFILES: dict[str, StorageProfile] = {
+    "default": StorageProfile(),
+    "lzf": StorageProfile(compression="lzf", shuffle=True, chunk_bytes=2**20),
+    "gzip": StorageProfile(
+        compression="gzip", compression_opts=4, shuffle=True, chunk_bytes=2**20
+    ),
+    "gzip_timeseries": StorageProfile(
+        compression="gzip", compression_opts=4, shuffle=True, chunk_bytes=2**14
+    ),
+}
+
+
+class XDMFWriter:
+    """Writer for timecourse XDMF.
+
+    Every step is flushed to the HDF5 file before it is added to the XDMF. The
+    XDMF is updated in place after every step by overwriting the closing tags.
+
+    :param xdmf_path: timecourse xdmf, the HDF5 is written next to the file.
+    :param mode: 'w' creates a new timecourse, 'a' appends to an existing one.
+    :param storage_profile: compression, chunking and precision of the datasets.
+    :param geometry_dir: directory of the shared geometry files. The geometry is
+        stored once per content hash and referenced by the XDMF. By default the
+        geometry is stored in the HDF5 of the XDMF.
+    """
+
+    def __init__(
+        self,
+        xdmf_path: Path,
+        mode: str = "w",
+        storage_profile: Optional[StorageProfile] = None,
+        geometry_dir: Optional[Path] = None,
+    ):
+        if mode not in {"w", "a"}:
+            raise ValueError(f"Unsupported mode '{mode}', use 'w' or 'a'.")
+
+        self.xdmf_path: Path = Path(xdmf_path)
+        self.h5_path: Path = self.xdmf_path.parent / f"{self.xdmf_path.stem}.h5"
+        self.mode: str = mode
+        self.storage_profile: StorageProfile = (
+            storage_profile if storage_profile is not None else StorageProfile()
+        )
+        self.geometry_dir: Optional[Path] = geometry_dir
+        self.mesh_name: str = "mesh"
+
+        self._mesh: Optional[str] = None
+        self._steps: list[str] = []
+        self._step_datasets: list[list[str]] = []
+        self._data_counter: int = 0
+        self._offset: int = 0
+        self.h5_file: Optional[h5py.File] = None
+        self._xdmf_file: Optional[Any] = None
+
+    def __enter__(self) -> XDMFWriter:
+        """Open HDF5 and XDMF file."""
+        if self.mode == "a" and self.xdmf_path.exists():
+            self._load()
+            self.h5_file = h5py.File(self.h5_path, "a", libver=self._libver)
+            self._remove_orphans()
+        else:
+            self.h5_file = h5py.File(self.h5_path, "w", libver=self._libver)
+
+        self._write_xdmf()
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        """Close HDF5 and XDMF file."""
+        if self._xdmf_file is not None:
+            self._xdmf_file.close()
+            self._xdmf_file = None
+        if self.h5_file is not None:
+            self.h5_file.close()
+            self.h5_file = None
+
+    @property
+    def _libver(self) -> Optional[str]:
+        """HDF5 file format version.
+
+        The latest format has compact chunk indices, which reduces the overhead
+        of the many small chunked datasets.
+        """
+        return "latest" if self.storage_profile.is_chunked else None
+
+    @property
+    def num_steps(self) -> int:
+        """Number of written timesteps."""
+        return len(self._steps)
+
+    def _load(self) -> None:
+        """Load steps and mesh of existing XDMF."""
+        root = ET.parse(self.xdmf_path).getroot()
+        domain = root.find("Domain")
+        if domain is None:
+            raise ValueError(f"No 'Domain' in XDMF: {self.xdmf_path}")
+
+        for grid in domain.findall("Grid"):
+            if grid.get("GridType") == "Collection":
+                for step in grid.findall("Grid"):
+                    self._steps.append(ET.tostring(step, encoding="unicode"))
+                    self._step_datasets.append(self._datasets(step))
+            elif grid.get("GridType") == "Uniform":
+                self.mesh_name = grid.get("Name", self.mesh_name)
+                self._mesh = ET.tostring(grid, encoding="unicode")
+
+    @staticmethod
+    def _datasets(element: ET.Element) -> list[str]:
+        """Names of the HDF5 datasets referenced in element."""
+        names: list[str] = []
+        for data_item in element.iter("DataItem"):
+            if data_item.get("Format") == "HDF" and data_item.text:
+                names.append(data_item.text.strip().split(":/")[-1])
+        return names
+
+    def _remove_orphans(self) -> None:
+        """Remove datasets which are not referenced in the XDMF.
+
+        These are left over by steps which were interrupted before they were
+        added to the XDMF.
+        """
+        assert self.h5_file is not None
+        referenced: set[str] = set()
+        if self._mesh is not None:
+            referenced.update(self._datasets(ET.fromstring(self._mesh)))
+        for datasets in self._step_datasets:
+            referenced.update(datasets)
+
+        for name in list(self.h5_file.keys()):
+            if name not in referenced:
+                del self.h5_file[name]
+
+        counters = [int(name[4:]) for name in referenced if name[4:].isdigit()]
+        self._data_counter = max(counters) + 1 if counters else 0
+
+    def _suffix(self) -> str:
+        """Closing part of the XDMF after the timesteps."""
+        mesh = self._mesh if self._mesh is not None else ""
+        return f"</Grid>{mesh}</Domain></Xdmf>"
+
+    def _write_xdmf(self) -> None:
+        """Write complete XDMF and keep it open for adding steps."""
+        if self._xdmf_file is not None:
+            self._xdmf_file.close()
+
+        prefix = (
+            '<Xdmf Version="3.0"><Domain>'
+            '<Grid Name="TimeSeries_meshio" GridType="Collection" '
+            'CollectionType="Temporal">'
+        )
+        content = (prefix + "".join(self._steps)).encode()
+
+        # atomic replacement of existing files
+        tmp_path = self.xdmf_path.parent / f"{self.xdmf_path.name}.tmp"
+        with open(tmp_path, "wb") as f_tmp:
+            f_tmp.write(content + self._suffix().encode())
+        os.replace(tmp_path, self.xdmf_path)
+
+        self._xdmf_file = open(self.xdmf_path, "r+b")
+        self._offset = len(content)
+
+    def _append_xdmf(self, step: str) -> None:
+        """Add step to the XDMF by overwriting the closing tags."""
+        assert self._xdmf_file is not None
+        self._xdmf_file.seek(self._offset)
+        self._xdmf_file.write(step.encode())
+        self._offset = self._xdmf_file.tell()
+        self._xdmf_file.write(self._suffix().encode())
+        self._xdmf_file.truncate()
+        self._xdmf_file.flush()
+
+    def truncate(self, num_steps: int) -> None:
+        """Remove all steps after the first num_steps."""
+        assert self.h5_file is not None
+        for datasets in self._step_datasets[num_steps:]:
+            for name in datasets:
+                if name in self.h5_file:
+                    del self.h5_file[name]
+        self._steps = self._steps[:num_steps]
+        self._step_datasets = self._step_datasets[:num_steps]
+        self._write_xdmf()
+
+    @staticmethod
+    def _add_data_item(
+        parent: ET.Element, data: np.ndarray, dim: str, reference: str
+    ) -> None:
+        """Add DataItem referencing the HDF5 dataset to parent."""
+        dt, prec = numpy_to_xdmf_dtype[data.dtype.name]
+        data_item = ET.SubElement(
+            parent,
+            "DataItem",
+            DataType=dt,
+            Dimensions=dim,
+            Format="HDF",
+            Precision=prec,
+        )
+        data_item.text = reference
+
+    def _data_item(self, parent: ET.Element, data: np.ndarray, dim: str) -> str:
+        """Write data to HDF5 and add the DataItem to parent."""
+        assert self.h5_file is not None
+        name = f"data{self._data_counter}"
+        self._data_counter += 1
+        self.h5_file.create_dataset(
+            name, data=data, **self.storage_profile.dataset_kwargs(data)
+        )
+        self._add_data_item(parent, data, dim, f"{self.h5_path.name}:/{name}")
+        return name
+
+    def _shared_geometry(self, points: np.ndarray, topology: np.ndarray) -> str:
+        """Write geometry to the shared geometry file.
+
+        :returns: path of the geometry file relative to the XDMF.
+        """
+        assert self.geometry_dir is not None
+        sha256 = hashlib.sha256()
+        for data in [points, topology]:
+            sha256.update(f"{data.dtype.str}{data.shape}".encode())
+            sha256.update(np.ascontiguousarray(data).tobytes())
+        h5_path = self.geometry_dir / f"{GEOMETRY_PREFIX}{sha256.hexdigest()[:16]}.h5"
+
+        if not h5_path.exists():
+            self.geometry_dir.mkdir(parents=True, exist_ok=True)
+            # atomic creation, other processes can write the same geometry
+            tmp_path = h5_path.parent / f"{h5_path.name}.{os.getpid()}.tmp"
+            with h5py.File(tmp_path, "w") as f_h5:
+                f_h5.create_dataset("points", data=points)
+                f_h5.create_dataset("topology", data=topology)
+            os.replace(tmp_path, h5_path)
+
+        return os.path.relpath(h5_path, self.xdmf_path.parent)
+
+    def write_points_cells(
+        self, points: np.ndarray, cells: list[CellBlock] | list[tuple[str, Any]]
+    ) -> None:
+        """Write the mesh geometry and topology."""
+        if self._mesh is not None:
+            raise ValueError(f"Mesh already written to XDMF: {self.xdmf_path}")
+
+        points = np.asarray(points)
+        if points.shape[1] == 2:
+            geometry_type = "XY"
+        elif points.shape[1] == 3:
+            geometry_type = "XYZ"
+        else:
+            raise ValueError("Points must be 2D or 3D.")
+
+        cell_blocks: list[CellBlock] = [
+            c if isinstance(c, CellBlock) else CellBlock(c[0], np.asarray(c[1]))
+            for c in cells
+        ]
+        if len(cell_blocks) == 1:
+            topology_type = meshio_to_xdmf_type[cell_blocks[0].type][0]
+            topology = cell_blocks[0].data
+            topology_dim = "{} {}".format(*topology.shape)
+        else:
+            # mixed topology with prepended xdmf type index, polylines require
+            # the number of nodes
+            mixed = []
+            for c in cell_blocks:
+                data = c.data
+                if c.type == "line":
+                    data = np.insert(data, 0, 2, axis=1)
+                mixed.append(
+                    np.insert(
+                        data, 0, meshio_type_to_xdmf_index[c.type], axis=1
+                    ).flatten()
+                )
+            topology_type = "Mixed"
+            topology = np.concatenate(mixed)
+            topology_dim = str(len(topology))
+
+        grid = ET.Element("Grid", Name=self.mesh_name, GridType="Uniform")
+        geometry_element = ET.SubElement(grid, "Geometry", GeometryType=geometry_type)
+        topology_element = ET.SubElement(
+            grid,
+            "Topology",
+            TopologyType=topology_type,
+            NumberOfElements=str(sum(len(c.data) for c in cell_blocks)),
+        )
+        points_dim = "{} {}".format(*points.shape)
+        if self.geometry_dir is None:
+            self._data_item(geometry_element, points, points_dim)
+            self._data_item(topology_element, topology, topology_dim)
+        else:
+            reference = self._shared_geometry(points, topology)
+            self._add_data_item(
+                geometry_element, points, points_dim, f"{reference}:/points"
+            )
+            self._add_data_item(
+                topology_element, topology, topology_dim, f"{reference}:/topology"
+            )
+
+        self._mesh = ET.tostring(grid, encoding="unicode")
+        self._write_xdmf()
+
+    def write_data(
+        self,
+        t: float,
+        point_data: Optional[dict[str, np.ndarray]] = None,
+        cell_data: Optional[dict[str, list[np.ndarray]]] = None,
+    ) -> None:
+        """Write point and cell data of timestep t."""
+        raw_data: list[tuple[str, str, np.ndarray]] = []
+        if point_data:
+            raw_data.extend(
+                ("Node", name, np.asarray(data)) for name, data in point_data.items()
+            )
+        if cell_data:
+            raw_data.extend(
+                ("Cell", name, data)
+                for name, data in raw_from_cell_data(cell_data).items()
+            )
+        self.write_attributes(t, raw_data)
+
+    def write_attributes(
+        self, t: float, attributes: Iterable[tuple[str, str, np.ndarray]]
+    ) -> None:
+        """Write the attributes of timestep t.
+
+        The attributes are consumed one by one, i.e. a generator streams the data
+        of a step with many variables without holding all of it in memory.
+
+        :param attributes: (center, name, data) with center 'Node' or 'Cell' and
+            the data of all points or cells.
+        """
+        if self._mesh is None:
+            raise ValueError("Mesh must be written before the data.")
+        assert self.h5_file is not None
+
+        grid = ET.Element("Grid")
+        ptr = (
+            f'xpointer(//Grid[@Name="{self.mesh_name}"]'
+            f"/*[self::Topology or self::Geometry])"
+        )
+        ET.SubElement(grid, f"{{{XINCLUDE_NAMESPACE}}}include", xpointer=ptr)
+        ET.SubElement(grid, "Time", Value=str(t))
+
+        datasets: list[str] = []
+        for center, name, data in attributes:
+            data = self.storage_profile.cast(name, data)
+            attribute = ET.SubElement(
+                grid,
+                "Attribute",
+                Name=name,
+                AttributeType=attribute_type(data),
+                Center=center,
+            )
+            dim = " ".join([str(s) for s in data.shape])
+            datasets.append(self._data_item(attribute, data, dim))
+
+        # data is complete on disk before it is referenced in the XDMF
+        self.h5_file.flush()
+        self._steps.append(ET.tostring(grid, encoding="unicode"))
+        self._step_datasets.append(datasets)
+        self._append_xdmf(self._steps[-1])
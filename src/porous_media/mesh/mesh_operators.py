@@ -0,0 +1,211 @@
+"""Sparse averaging operators between point and cell data of a mesh.
+
+The operators are built once per mesh from the volume weighted incidence matrix
+A (points x cells) with A[p, c] = V_c / n_c for the n_c points of cell c, i.e.
+every cell distributes its volume equally to its points (lumped point volumes,
+see `point_volumes`).
+
+- point -> cell: mean of the point values of the cell, diag(1/V_cell) A^T
+- cell -> point: volume weighted mean of the adjacent cells, diag(1/V_point) A
+
+Data of all timesteps (time, n, ...) is mapped with a single sparse matmul.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import xarray as xr
+from meshio import CellBlock
+from scipy import sparse
+
+from porous_media.data.xdmf_calculations import cell_volumes
+from porous_media.data.xdmf_reader import GEOMETRY_PREFIX, XDMFReader
+
+
+# operators of the last used xdmf geometries, {(geometry, topology): operators}
+_operator_cache: OrderedDict[tuple, MeshOperators] = OrderedDict()
+_OPERATOR_CACHE_SIZE = 8
+
+
+@dataclass
+class MeshOperators:
+    """Averaging operators between point and cell data.
+
+    :param point_to_cell: CSR matrix (cells x points)
+    :param cell_to_point: CSR matrix (points x cells)
+    """
+
+    point_to_cell: sparse.csr_matrix
+    cell_to_point: sparse.csr_matrix
+
+    @property
+    def num_points(self) -> int:
+        """Number of points."""
+        return int(self.point_to_cell.shape[1])
+
+    @property
+    def num_cells(self) -> int:
+        """Number of cells."""
+        return int(self.point_to_cell.shape[0])
+
+    @staticmethod
+    def from_mesh(
+        num_points: int, cells: list[CellBlock], volumes: Optional[np.ndarray] = None
+    ) -> MeshOperators:
+        """Create operators for the mesh.
+
+        :param volumes: cell volumes, equal weights of all cells by default.
+        """
+        rows: list[np.ndarray] = []
+        weights: list[np.ndarray] = []
+        for cell_block in cells:
+            n_cells, n_nodes = cell_block.data.shape
+            rows.append(cell_block.data.reshape(-1))
+            weights.append(np.full(n_cells * n_nodes, 1.0 / n_nodes))
+        row = np.concatenate(rows)
+        weight = np.concatenate(weights)
+        num_cells = sum(len(cell_block) for cell_block in cells)
+        n_nodes_cells = np.concatenate(
+            [np.full(len(c), c.data.shape[1]) for c in cells]
+        )
+        col = np.repeat(np.arange(num_cells), n_nodes_cells)
+
+        if volumes is not None:
+            volumes = np.asarray(volumes, dtype=float).reshape(-1)
+            if len(volumes) != num_cells:
+                raise ValueError(
+                    f"Number of volumes '{len(volumes)}' != number of cells "
+                    f"'{num_cells}'."
+                )
+            weight = weight * volumes[col]
+
+        incidence = sparse.csr_matrix(
+            (weight, (row, col)), shape=(num_points, num_cells)
+        )
+        with np.errstate(divide="ignore"):
+            # points without cells and cells without volume are mapped to 0
+            point_norm = 1.0 / np.asarray(incidence.sum(axis=1)).reshape(-1)
+            cell_norm = 1.0 / np.asarray(incidence.sum(axis=0)).reshape(-1)
+        point_norm[~np.isfinite(point_norm)] = 0.0
+        cell_norm[~np.isfinite(cell_norm)] = 0.0
+
+        return MeshOperators(
+            point_to_cell=sparse.csr_matrix(
+                sparse.diags(cell_norm) @ incidence.T.tocsr()
+            ),
+            cell_to_point=sparse.csr_matrix(sparse.diags(point_norm) @ incidence),
+        )
+
+    def points_to_cells(self, data: np.ndarray, axis: int = 0) -> np.ndarray:
+        """Map point data to the cells.
+
+        :param data: point data with the points in `axis`, e.g. (time, point, ...)
+            with axis=1.
+        """
+        return _apply(self.point_to_cell, data, axis=axis)
+
+    def cells_to_points(self, data: np.ndarray, axis: int = 0) -> np.ndarray:
+        """Map cell data to the points.
+
+        :param data: cell data with the cells in `axis`, e.g. (time, cell, ...)
+            with axis=1.
+        """
+        return _apply(self.cell_to_point, data, axis=axis)
+
+    def dataset_to_cells(self, xr_points: xr.Dataset) -> xr.Dataset:
+        """Map the variables of the (time, point) dataset to the cells."""
+        return _apply_dataset(self.point_to_cell, xr_points, "point", "cell")
+
+    def dataset_to_points(self, xr_cells: xr.Dataset) -> xr.Dataset:
+        """Map the variables of the (time, cell) dataset to the points."""
+        return _apply_dataset(self.cell_to_point, xr_cells, "cell", "point")
+
+
+def _apply(operator: sparse.csr_matrix, data: np.ndarray, axis: int) -> np.ndarray:
+    """Apply operator to all data along the axis with a single sparse matmul."""
+    data = np.moveaxis(np.asarray(data), axis, 0)
+    if data.shape[0] != operator.shape[1]:
+        raise ValueError(
+            f"Data with size '{data.shape[0]}' in axis {axis} does not match the "
+            f"operator with shape {operator.shape}."
+        )
+    result = operator @ data.reshape(data.shape[0], -1).astype(float, copy=False)
+    return np.moveaxis(result.reshape(operator.shape[0], *data.shape[1:]), 0, axis)
+
+
+def _apply_dataset(
+    operator: sparse.csr_matrix, dataset: xr.Dataset, dim: str, new_dim: str
+) -> xr.Dataset:
+    """Apply operator to all variables of the dataset along dim."""
+    data_vars: dict[str, tuple[tuple[str, ...], np.ndarray]] = {}
+    for name, variable in dataset.data_vars.items():
+        if dim not in variable.dims:
+            continue
+        dims = tuple(str(d) for d in variable.dims)
+        data_vars[str(name)] = (
+            tuple(new_dim if d == dim else d for d in dims),
+            _apply(operator, variable.values, axis=dims.index(dim)),
+        )
+    coords = {
+        str(name): coord
+        for name, coord in dataset.coords.items()
+        if dim not in coord.dims
+    }
+    return xr.Dataset(data_vars=data_vars, coords=coords, attrs=dataset.attrs)
+
+
+def mesh_operators_from_xdmf(xdmf_path: Path) -> MeshOperators:
+    """Create volume weighted operators for the mesh of the xdmf.
+
+    The operators are cached with the geometry, i.e. they are created once per
+    process for the shared, content-hashed geometry files (see `XDMFWriter`) and
+    recreated for other geometries if the file changes. The operators of the
+    last `_OPERATOR_CACHE_SIZE` geometries are kept, see `clear_operator_cache`.
+    """
+    with XDMFReader(xdmf_path, mmap=False) as reader:
+        key: tuple = (
+            reader.geometry.h5_path.resolve(),
+            reader.geometry.dataset,
+            reader.topology.dataset,
+        )
+        if not reader.geometry.h5_path.name.startswith(GEOMETRY_PREFIX):
+            stat = reader.geometry.h5_path.stat()
+            key = (*key, stat.st_mtime_ns, stat.st_size)
+
+        if key not in _operator_cache:
+            points, cells = reader.read_points_cells()
+            _operator_cache[key] = MeshOperators.from_mesh(
+                num_points=len(points),
+                cells=cells,
+                volumes=cell_volumes(points, cells),
+            )
+            if len(_operator_cache) > _OPERATOR_CACHE_SIZE:
+                _operator_cache.popitem(last=False)
+    _operator_cache.move_to_end(key)
+    return _operator_cache[key]
+
+
+def clear_operator_cache() -> None:
+    """Remove all cached operators, see `mesh_operators_from_xdmf`."""
+    _operator_cache.clear()
+
+
+if __name__ == "__main__":
+    from porous_media import RESOURCES_DIR, RESULTS_DIR
+    from porous_media.console import console
+    from porous_media.data.xdmf_calculations import mesh_datasets_from_xdmf
+    from porous_media.data.xdmf_tools import vtks_to_xdmf
+
+    vtk_dir = RESOURCES_DIR / "vtk" / "vtk_timecourse"
+    xdmf_path = RESULTS_DIR / "vtk_timecourse.xdmf"
+    vtks_to_xdmf(vtk_dir, xdmf_path=xdmf_path, overwrite=False)
+
+    operators = mesh_operators_from_xdmf(xdmf_path)
+    xr_cells, xr_points = mesh_datasets_from_xdmf(xdmf_path)
+    console.print(operators.dataset_to_cells(xr_points[["displacement"]]))
+    console.print(operators.dataset_to_points(xr_cells[["rr_necrosis"]]))
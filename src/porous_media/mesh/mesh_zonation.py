@@ -1,10 +1,16 @@
 """Helpers for zonated meshes."""
 
+import hashlib
+from collections import OrderedDict
+from enum import Enum
 from pathlib import Path
-from typing import Callable, Optional
+from typing import Any, Callable, Optional, Sequence
 
 import meshio
 import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+from scipy.spatial import cKDTree
 
 from porous_media import RESOURCES_DIR
 from porous_media.console import console
@@ -46,9 +52,8 @@ class ZonationPatterns:
         f_scale: float = 1.0,
     ) -> np.ndarray:
         """Random zonation in [min_value, max_value]."""
-        return f_scale * (
-            value_min + (value_max - value_min) * np.random.rand(*p.shape)
-        )
+        shape = np.broadcast_shapes(p.shape, np.shape(value_min), np.shape(value_max))
+        return f_scale * (value_min + (value_max - value_min) * np.random.rand(*shape))
 
     @staticmethod
     def linear_increase(
@@ -102,9 +107,9 @@ class ZonationPatterns:
         f_scale: float = 1.0,
     ) -> np.ndarray:
         """Only periveneous pattern in [0, 1]."""
-        data = np.zeros_like(p)
-        data[p >= 0.8] = value_max
-        data[p < 0.2] = value_min
+        data = np.where(
+            p >= 0.8, value_max, np.where(p < 0.2, value_min, np.zeros_like(p))
+        )
         return f_scale * data
 
     @staticmethod
@@ -115,9 +120,9 @@ class ZonationPatterns:
         f_scale: float = 1.0,
     ) -> np.ndarray:
         """Only periportal pattern in [0, 1]."""
-        data = np.zeros_like(p)
-        data[p <= 0.2] = value_max
-        data[p > 0.2] = value_min
+        data = np.where(
+            p <= 0.2, value_max, np.where(p > 0.2, value_min, np.zeros_like(p))
+        )
         return f_scale * data
 
     @staticmethod
@@ -129,8 +134,9 @@ class ZonationPatterns:
         f_scale: float = 1.0,
     ) -> np.ndarray:
         """Sharp periportal pattern in [0, 1]."""
+        pn = p**n
         result: np.ndarray = f_scale * (
-            value_min + (value_max - value_min) * (1 - p**n / (p**n + 0.25**n))
+            value_min + (value_max - value_min) * (1 - pn / (pn + 0.25**n))
         )
         return result
 
@@ -143,14 +149,150 @@ class ZonationPatterns:
         f_scale: float = 1.0,
     ) -> np.ndarray:
         """Sharp periveneous pattern in [0, 1]."""
-        result: np.ndarray = f_scale * (value_min + (value_max - value_min) *
-                                        (1 - (1 - p) ** n / ((1 - p) ** n + 0.25**n)))
+        pn = (1 - p) ** n
+        result: np.ndarray = f_scale * (
+            value_min + (value_max - value_min) * (1 - pn / (pn + 0.25**n))
+        )
         return result
 
 
 
 
 
+# number of values per batched pattern evaluation, see `evaluate_patterns`
+_PATTERN_CHUNK_VALUES = 2**16
+
+
+class PositionMode(str, Enum):
+    """Calculation of the position between periportal and perivenous cells.
+
+    The position of a cell is dpp / (dpv + dpp) with the shortest distances
+    to the periportal (dpp) and perivenous (dpv) cells.
+
+    EUCLIDEAN: euclidean distances, pairwise for all cells (reference)
+    KDTREE: euclidean distances, batched queries of a KD-tree
+    GEODESIC: shortest paths through the mesh along adjacent cells, correct for
+        non-convex lobuli and holes, see `cell_adjacency`
+    """
+
+    EUCLIDEAN = "euclidean"
+    KDTREE = "kdtree"
+    GEODESIC = "geodesic"
+
+
+# topological dimension of the cell types
+_CELL_DIMENSIONS: dict[str, int] = {
+    "triangle": 2,
+    "quad": 2,
+    "tetra": 3,
+    "pyramid": 3,
+    "wedge": 3,
+    "hexahedron": 3,
+}
+
+# cell adjacency graphs of the last used meshes, {content hash of mesh: graph}
+_adjacency_cache: OrderedDict[str, sparse.csr_matrix] = OrderedDict()
+_ADJACENCY_CACHE_SIZE = 8
+
+
+def _cell_centers(m: meshio.Mesh) -> np.ndarray:
+    """Center of mass of all cells."""
+    return np.concatenate(
+        [m.points[cell_block.data].mean(axis=1, dtype=float) for cell_block in m.cells]
+    )
+
+
+def cell_adjacency(m: meshio.Mesh) -> sparse.csr_matrix:
+    """Cell adjacency graph of the mesh.
+
+    Cells are adjacent if they share a face (3D cells) or an edge (2D cells),
+    the edges are weighted with the distance of the cell centers. The graph is
+    created once per geometry, i.e. cached by the content of points and cells.
+    The graphs of the last `_ADJACENCY_CACHE_SIZE` geometries are kept, see
+    `clear_adjacency_cache`.
+
+    :returns: symmetric CSR matrix (cells x cells)
+    """
+    h = hashlib.sha256(np.ascontiguousarray(m.points).tobytes())
+    for cell_block in m.cells:
+        if cell_block.type not in _CELL_DIMENSIONS:
+            raise ValueError(f"Unsupported cell type for adjacency: {cell_block.type}")
+        h.update(cell_block.type.encode())
+        h.update(np.ascontiguousarray(cell_block.data).tobytes())
+    key = h.hexdigest()
+
+    if key not in _adjacency_cache:
+        # (cells x points) incidence, shared points of cells by a single matmul
+        rows = np.concatenate(
+            [np.repeat(np.arange(len(c)), c.data.shape[1]) for c in m.cells]
+        )
+        offsets = np.cumsum([0] + [len(c) for c in m.cells[:-1]])
+        rows += np.repeat(offsets, [c.data.size for c in m.cells])
+        cols = np.concatenate([c.data.reshape(-1) for c in m.cells])
+        num_cells = sum(len(c) for c in m.cells)
+        incidence = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)), shape=(num_cells, len(m.points))
+        )
+        shared = (incidence @ incidence.T).tocoo()
+
+        # faces have at least 3 points, edges 2 points
+        min_shared = max(_CELL_DIMENSIONS[c.type] for c in m.cells)
+        mask = (shared.data >= min_shared) & (shared.row != shared.col)
+        i, j = shared.row[mask], shared.col[mask]
+        centers = _cell_centers(m)
+        _adjacency_cache[key] = sparse.csr_matrix(
+            (np.linalg.norm(centers[i] - centers[j], axis=1), (i, j)),
+            shape=(num_cells, num_cells),
+        )
+        if len(_adjacency_cache) > _ADJACENCY_CACHE_SIZE:
+            _adjacency_cache.popitem(last=False)
+    _adjacency_cache.move_to_end(key)
+    return _adjacency_cache[key]
+
+
+def clear_adjacency_cache() -> None:
+    """Remove all cached adjacency graphs, see `cell_adjacency`."""
+    _adjacency_cache.clear()
+
+
+def _geodesic_distances(graph: sparse.csr_matrix, sources: np.ndarray) -> np.ndarray:
+    """Shortest path distances of all cells to the nearest source cell."""
+    if not np.any(sources):
+        raise ValueError("Periportal and perivenous cells required for positions.")
+    distances: np.ndarray = csgraph.dijkstra(
+        graph, directed=False, indices=np.flatnonzero(sources), min_only=True
+    )
+    return distances
+
+
+def _min_distances(
+    centers: np.ndarray, targets: np.ndarray, position_mode: PositionMode
+) -> np.ndarray:
+    """Shortest euclidean distance of the centers to the targets."""
+    if len(targets) == 0:
+        raise ValueError("Periportal and perivenous cells required for positions.")
+
+    if position_mode == PositionMode.KDTREE:
+        distances: np.ndarray = cKDTree(targets).query(centers, k=1, workers=-1)[0]
+        return distances
+
+    # pairwise distances chunk by chunk to bound the memory
+    distances = np.empty(len(centers))
+    rows = max(1, 2**22 // len(targets))
+    for k in range(0, len(centers), rows):
+        d = np.linalg.norm(
+            centers[k : k + rows, None, :] - targets[None, :, :], axis=-1
+        )
+        distances[k : k + rows] = d.min(axis=1)
+    return distances
+
+
+def _split_cell_blocks(m: meshio.Mesh, data: np.ndarray) -> list[np.ndarray]:
+    """Split data of all cells in the data of the cell blocks."""
+    sizes = [len(cell_block) for cell_block in m.cells]
+    return np.split(data, np.cumsum(sizes)[:-1])
+
+
 class ZonatedMesh:
     """Class for zonated meshes."""
 
@@ -179,6 +321,7 @@ class ZonatedMesh:
         remove_point_data: bool = True,
         remove_cell_data: bool = True,
         copy_mesh: bool = True,
+        position_mode: PositionMode = PositionMode.KDTREE,
     ) -> meshio.Mesh:
         """Create a zonated mesh from VTK and serialize results to XDMF."""
         f_patterns: list[Callable] = cls.patterns if patterns is None else patterns
@@ -190,14 +333,14 @@ class ZonatedMesh:
             remove_point_data=remove_point_data,
             remove_cell_data=remove_cell_data,
             copy_mesh=copy_mesh,
+            position_mode=position_mode,
         )
 
-        for f_pattern in f_patterns:
-            cls._add_zonated_variable(
-                m=m,
-                variable_id=f"pattern__{f_pattern.__name__}",
-                f_zonation=f_pattern,
-            )
+        cls._add_zonated_variables(
+            m=m,
+            variable_ids=[f"pattern__{f.__name__}" for f in f_patterns],
+            patterns=f_patterns,
+        )
 
         return m
 
@@ -207,6 +350,7 @@ class ZonatedMesh:
         remove_point_data: bool = True,
         remove_cell_data: bool = True,
         copy_mesh: bool = True,
+        position_mode: PositionMode = PositionMode.KDTREE,
     ) -> meshio.Mesh:
         """Calculate the distance from periportal and perivenous.
 
@@ -215,6 +359,8 @@ class ZonatedMesh:
             0: internal node
             1: periportal (inflow)
             2: perivenous (outflow)
+
+        :param position_mode: calculation of the distances, see `PositionMode`.
         """
 
         # clone mesh
@@ -240,69 +386,111 @@ class ZonatedMesh:
         if remove_point_data:
             m.point_data = {}
 
-        # calculate positions based on cell_type info
-        cell_type: np.ndarray = m.cell_data["cell_type"][0]
-        position = np.nan * np.ones_like(cell_type)
-
-        pp_cells: dict[int, np.ndarray] = {}
-        pv_cells: dict[int, np.ndarray] = {}
-        inner_cells: dict[int, np.ndarray] = {}
-        cell_block: meshio._mesh.CellBlock
-
-        for _, cell_block in enumerate(m.cells):
-            for kc, cell in enumerate(cell_block.data):
-                # calculate the center of mass of cell
-                count = 0
-                center = np.zeros(shape=3)
-                for kp in cell:
-                    center += m.points[kp]
-                    count += 1
-                center = center / count
-
-                # periportal cell (inside)
-                if np.isclose(cell_type[kc], 1.0):
-                    position[kc] = 0
-                    pp_cells[kc] = center
-
-                # periveneous cell (outside)
-                elif np.isclose(cell_type[kc], 2.0):
-                    position[kc] = 1.0
-                    pv_cells[kc] = center
-
-                # inner cell
-                elif np.isclose(cell_type[kc], 0.0):
-                    position[kc] = np.nan
-                    inner_cells[kc] = center
-
-        # calculate pp-pv position for all inner cells
-        for kc, center in inner_cells.items():
-            # shortest distance perivenous
-            dpv = 1.0
-            for center_pv in pv_cells.values():
-                d: float = float(np.linalg.norm(center - center_pv))
-                if d < dpv:
-                    dpv = d
-
-            # shortest distance periportal
-            dpp = 1.0
-            for center_pp in pp_cells.values():
-                d = float(np.linalg.norm(center - center_pp))
-                if d < dpp:
-                    dpp = d
-
-            position[kc] = dpp / (dpv + dpp)
-
-        m.cell_data["position"] = [position]
+        # calculate positions based on cell_type info (all cell blocks)
+        cell_type: np.ndarray = np.concatenate(m.cell_data["cell_type"])
+        types = cell_type.reshape(len(cell_type), -1)[:, 0]
+
+        centers = _cell_centers(m)
+        pp_mask = np.isclose(types, 1.0)  # periportal cell (inside)
+        pv_mask = np.isclose(types, 2.0)  # periveneous cell (outside)
+        inner_mask = np.isclose(types, 0.0)  # inner cell
+
+        values = np.full(len(types), np.nan)
+        values[pp_mask] = 0.0
+        values[pv_mask] = 1.0
+
+        # calculate pp-pv position for all inner cells, shortest distances
+        if position_mode == PositionMode.GEODESIC:
+            # cells not connected to pp and pv cells have no position
+            graph = cell_adjacency(m)
+            dpv = _geodesic_distances(graph, pv_mask)[inner_mask]
+            dpp = _geodesic_distances(graph, pp_mask)[inner_mask]
+        else:
+            dpv = _min_distances(centers[inner_mask], centers[pv_mask], position_mode)
+            dpp = _min_distances(centers[inner_mask], centers[pp_mask], position_mode)
+        with np.errstate(invalid="ignore"):
+            values[inner_mask] = np.where(
+                np.isfinite(dpv + dpp), dpp / (dpv + dpp), np.nan
+            )
+
+        position = values.astype(cell_type.dtype).reshape(cell_type.shape)
+        m.cell_data["position"] = _split_cell_blocks(m, position)
         return m
 
     @staticmethod
-    def _add_zonated_variable(
-        m: meshio.Mesh, variable_id: str, f_zonation: Callable
+    def evaluate_patterns(
+        position: np.ndarray,
+        volume: np.ndarray,
+        patterns: Sequence[Callable],
+        parameters: Optional[Sequence[dict[str, Any]]] = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Evaluate zonation patterns batched and scale them by volume.
+
+        Patterns with the same function and parameter names are evaluated in a
+        single call with the parameters broadcasted over the cells. The patterns
+        are scaled to the volume weighted mean of the constant pattern, the scaling
+        factors are calculated with a single matrix-vector product.
+
+        :param position: cell positions in [0, 1].
+        :param volume: cell volumes.
+        :param patterns: functions of `ZonationPatterns`, one per pattern.
+        :param parameters: keyword parameters of the functions, one per pattern,
+            without 'f_scale'.
+        :returns: scaled patterns (n_patterns, n_cells) and scaling factors.
+        """
+        p = np.asarray(position).reshape(-1)
+        if parameters is None:
+            parameters = [{}] * len(patterns)
+        if len(parameters) != len(patterns):
+            raise ValueError(
+                f"Number of parameters '{len(parameters)}' != number of patterns "
+                f"'{len(patterns)}'."
+            )
+
+        # group patterns by function and parameter names
+        groups: dict[tuple[Callable, tuple[str, ...]], list[int]] = {}
+        for k, (f_pattern, kwargs) in enumerate(zip(patterns, parameters)):
+            groups.setdefault((f_pattern, tuple(sorted(kwargs))), []).append(k)
+
+        # scaling to the constant pattern, cells without position are ignored
+        valid = np.isfinite(p)
+        volume_fraction = np.asarray(volume, dtype=float).reshape(-1)[valid]
+        volume_fraction = volume_fraction / volume_fraction.sum()
+        reference = ZonationPatterns.constant(p[valid]) @ volume_fraction
+
+        # rows per call, the temporaries of the patterns stay in the cache
+        chunk_size = max(1, _PATTERN_CHUNK_VALUES // max(1, len(p)))
+        data = np.empty((len(patterns), len(p)), dtype=np.result_type(p, float))
+        f_scale = np.empty(len(patterns))
+        for (f_pattern, names), group in groups.items():
+            for start in range(0, len(group), chunk_size):
+                rows = group[start : start + chunk_size]
+                kwargs = {
+                    name: np.array([parameters[k][name] for k in rows])[:, None]
+                    for name in names
+                }
+                shape = (len(rows), len(p))
+                values = np.broadcast_to(
+                    f_pattern(np.broadcast_to(p, shape), **kwargs), shape
+                )
+                f_scale[rows] = reference / (
+                    (values if valid.all() else values[:, valid]) @ volume_fraction
+                )
+                data[rows] = values * f_scale[rows, None]
+
+        return data, f_scale
+
+    @staticmethod
+    def _add_zonated_variables(
+        m: meshio.Mesh,
+        variable_ids: list[str],
+        patterns: Sequence[Callable],
+        parameters: Optional[Sequence[dict[str, Any]]] = None,
     ) -> meshio.Mesh:
-        """Add zonation variable to the mesh based on the position variable in [0,1].
+        """Add zonation variables to the mesh based on the position variable in [0,1].
 
-        :param variable_id: identifier in cell_data
-        :param f_zonation: function to calculate zonation
+        :param variable_ids: identifiers in cell_data
+        :param patterns: functions to calculate zonation, see `evaluate_patterns`
 
         position:
             0: periveneous
@@ -315,24 +503,34 @@ class ZonatedMesh:
                     f"'{key}' required in calculate zonation patterns, 'create_zonated_mesh' first."
                 )
 
-        position: np.ndarray = m.cell_data["position"][0]
-        volume: np.ndarray = m.cell_data["volume"][0]
+        position: np.ndarray = np.concatenate(m.cell_data["position"])
+        volume: np.ndarray = np.concatenate(m.cell_data["volume"])
 
-        # unscaled zonation data
-        protein_constant = ZonationPatterns.constant(position)
-        protein = f_zonation(position)
-
-        # scaling factor
-        volume_fraction = volume / volume.sum()
-        f_scale = (protein_constant * volume_fraction).sum() / (
-            protein * volume_fraction
-        ).sum()
-        console.print(f"{variable_id}: {f_scale=}")
+        data, f_scales = ZonatedMesh.evaluate_patterns(
+            position=position,
+            volume=volume,
+            patterns=patterns,
+            parameters=parameters,
+        )
+        for variable_id, protein_scaled, f_scale in zip(variable_ids, data, f_scales):
+            console.print(f"{variable_id}: {f_scale=}")
+            m.cell_data[variable_id] = _split_cell_blocks(
+                m, protein_scaled.astype(position.dtype).reshape(position.shape)
+            )
+        return m
 
-        protein_scaled = f_zonation(position, f_scale=f_scale)
+    @staticmethod
+    def _add_zonated_variable(
+        m: meshio.Mesh, variable_id: str, f_zonation: Callable
+    ) -> meshio.Mesh:
+        """Add zonation variable to the mesh based on the position variable in [0,1].
 
-        m.cell_data[variable_id] = [protein_scaled]
-        return m
+        :param variable_id: identifier in cell_data
+        :param f_zonation: function to calculate zonation
+        """
+        return ZonatedMesh._add_zonated_variables(
+            m=m, variable_ids=[variable_id], patterns=[f_zonation]
+        )
 
 
 data_layers = []
@@ -0,0 +1,193 @@
+"""Parameter sweeps of zonation patterns.
+
+The geometry is read and the positions are calculated once. All parameter sets
+of the sweep are evaluated batched (see `ZonatedMesh.evaluate_patterns`) and
+streamed as cell data of a single timestep into one XDMF/HDF5. The index table
+`<stem>_index.tsv` next to the XDMF maps the fields to the parameters.
+"""
+
+import inspect
+import itertools
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Sequence
+
+import meshio
+import numpy as np
+import pandas as pd
+
+from porous_media.console import console
+from porous_media.data.xdmf_reader import XDMFReader
+from porous_media.data.xdmf_writer import StorageProfile, XDMFWriter
+from porous_media.mesh.mesh_zonation import PositionMode, ZonatedMesh
+
+
+# parameters of the sweeps, 'f_scale' scales the volume normalized patterns
+SWEEP_PARAMETERS: list[str] = ["n", "value_min", "value_max", "f_scale"]
+
+
+def zonation_sweep_index_path(xdmf_path: Path) -> Path:
+    """Path of the index table of the sweep XDMF."""
+    return xdmf_path.parent / f"{xdmf_path.stem}_index.tsv"
+
+
+def zonation_sweep_parameters(
+    patterns: Sequence[Callable], grid: dict[str, Sequence[float]]
+) -> pd.DataFrame:
+    """Create the parameter sets of the sweep.
+
+    Every pattern is combined with the grid values of its parameters, i.e.
+    parameters which are not arguments of a pattern do not multiply its sets.
+
+    :param patterns: functions of `ZonationPatterns`.
+    :param grid: values of the `SWEEP_PARAMETERS`, {parameter: values}.
+    :returns: index table with columns field, pattern and the parameters, NaN
+        for parameters of other patterns.
+    """
+    unknown = set(grid) - set(SWEEP_PARAMETERS)
+    if unknown:
+        raise ValueError(
+            f"Unsupported sweep parameters {sorted(unknown)}, use {SWEEP_PARAMETERS}."
+        )
+
+    rows: list[dict] = []
+    for f_pattern in patterns:
+        arguments = inspect.signature(f_pattern).parameters
+        names = [name for name in grid if name in arguments or name == "f_scale"]
+        for k, values in enumerate(itertools.product(*[grid[n] for n in names])):
+            rows.append(
+                {
+                    "field": f"{f_pattern.__name__}__{k:04d}",
+                    "pattern": f_pattern.__name__,
+                    **dict(zip(names, values)),
+                }
+            )
+
+    df = pd.DataFrame(rows, columns=["field", "pattern", *SWEEP_PARAMETERS])
+    if df.field.duplicated().any():
+        raise ValueError("Patterns of the sweep must be unique.")
+    return df
+
+
+def create_zonation_sweep(
+    vtk_path: Path,
+    xdmf_path: Path,
+    patterns: Sequence[Callable],
+    grid: dict[str, Sequence[float]],
+    position_mode: PositionMode = PositionMode.KDTREE,
+    storage_profile: Optional[StorageProfile] = None,
+    chunk_size: int = 256,
+) -> pd.DataFrame:
+    """Create a zonation parameter sweep on the mesh of the VTK.
+
+    The XDMF has a single timestep with the 'position' and the fields of all
+    parameter sets. Fields are volume normalized like the patterns of
+    `ZonatedMesh.create_zonated_mesh_from_vtk` and multiplied with 'f_scale'.
+
+    :param grid: values of the `SWEEP_PARAMETERS`, see `zonation_sweep_parameters`.
+    :param chunk_size: number of fields which are evaluated at once.
+    :returns: index table, with the volume normalization in 'volume_scale'.
+    """
+    df = zonation_sweep_parameters(patterns, grid)
+    functions: dict[str, Callable] = {f.__name__: f for f in patterns}
+
+    mesh: meshio.Mesh = meshio.read(vtk_path)
+    m: meshio.Mesh = ZonatedMesh.create_zonated_mesh(mesh, position_mode=position_mode)
+    position: np.ndarray = np.concatenate(m.cell_data["position"]).reshape(-1)
+    volume: np.ndarray = np.concatenate(m.cell_data["volume"]).reshape(-1)
+
+    volume_scale = np.empty(len(df))
+    f_scale = df["f_scale"].fillna(1.0).to_numpy()
+
+    def fields() -> Iterator[tuple[str, str, np.ndarray]]:
+        """Fields of the sweep chunk by chunk."""
+        yield "Cell", "position", position
+        for start in range(0, len(df), chunk_size):
+            df_chunk = df.iloc[start : start + chunk_size]
+            parameters = [
+                {
+                    str(name): value
+                    for name, value in row.items()
+                    if name not in {"field", "pattern", "f_scale"}
+                    and not pd.isna(value)
+                }
+                for row in df_chunk.to_dict(orient="records")
+            ]
+            data, f_volume = ZonatedMesh.evaluate_patterns(
+                position=position,
+                volume=volume,
+                patterns=[functions[name] for name in df_chunk.pattern],
+                parameters=parameters,
+            )
+            rows = slice(start, start + len(df_chunk))
+            volume_scale[rows] = f_volume
+            data *= f_scale[rows, None]
+            for name, values in zip(df_chunk.field, data):
+                yield "Cell", name, values.astype(position.dtype)
+
+    xdmf_path.parent.mkdir(parents=True, exist_ok=True)
+    with XDMFWriter(xdmf_path, storage_profile=storage_profile) as writer:
+        writer.write_points_cells(m.points, m.cells)
+        writer.write_attributes(0.0, fields())
+
+    df["volume_scale"] = volume_scale
+    index_path = zonation_sweep_index_path(xdmf_path)
+    df.to_csv(index_path, index=False, sep="\t")
+    console.print(f"Zonation sweep with {len(df)} fields: file://{xdmf_path}")
+    return df
+
+
+def feb_data_from_zonation_sweep(
+    xdmf_path: Path, fields: Optional[list[str]] = None
+) -> dict[str, dict]:
+    """Create the contexts of a zonation sweep for `create_feb_files`.
+
+    Every field of the sweep is one simulation with the tags
+    - zonation_field: name of the field in the XDMF
+    - zonation_values: values of the field for the elements in mesh order
+    - the parameters of the index table, e.g. n, value_min, value_max, f_scale
+
+    The values are rendered as element data in the template, e.g.
+    {% for value in zonation_values %}<e lid="{{ loop.index }}">{{ value }}</e>{% endfor %}
+
+    :param xdmf_path: sweep xdmf with the index table next to it.
+    :param fields: subset of fields, all fields by default.
+    """
+    df = pd.read_csv(zonation_sweep_index_path(xdmf_path), sep="\t")
+    if fields is not None:
+        missing = set(fields) - set(df.field)
+        if missing:
+            raise ValueError(f"Fields {sorted(missing)} not in sweep: {xdmf_path}")
+        df = df[df.field.isin(fields)]
+
+    feb_data: dict[str, dict] = {}
+    with XDMFReader(xdmf_path) as reader:
+        for row in df.to_dict(orient="records"):
+            field = row["field"]
+            feb_data[field] = {
+                **{key: value for key, value in row.items() if not pd.isna(value)},
+                "zonation_field": field,
+                "zonation_values": reader.read_array(0, field).tolist(),
+            }
+    return feb_data
+
+
+if __name__ == "__main__":
+    from porous_media import RESOURCES_DIR, RESULTS_DIR
+    from porous_media.mesh.mesh_zonation import ZonationPatterns
+
+    df = create_zonation_sweep(
+        vtk_path=RESOURCES_DIR / "zonation" / "mesh_zonation_lobulus.vtk",
+        xdmf_path=RESULTS_DIR / "zonation_sweep" / "zonation_sweep.xdmf",
+        patterns=[
+            ZonationPatterns.sharp_periportal,
+            ZonationPatterns.sharp_periveneous,
+            ZonationPatterns.linear_increase,
+        ],
+        grid={
+            "n": [2.0, 5.0, 10.0, 20.0],
+            "value_min": [0.0, 0.2],
+            "value_max": [1.0, 2.0],
+            "f_scale": [0.5, 1.0],
+        },
+    )
+    console.print(df)
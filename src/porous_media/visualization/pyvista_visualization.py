@@ -16,6 +16,8 @@ from pyvista.plotting._typing import ColormapOptions
 from rich.progress import track
 from porous_media import RESOURCES_DIR, RESULTS_DIR
 from porous_media.console import console
+from porous_media.data.derived_variables import DerivedVariables
+from porous_media.data.xdmf_reader import XDMFReader
 from porous_media.data.xdmf_tools import (
     AttributeType,
     DataLimits,
@@ -96,11 +98,13 @@ def visualize_datalayers_timecourse(
     output_dir: Path,
     data_layers: Iterable[DataLayer],
     window_size: tuple[int, int] = (600, 600),
+    derived: Optional[DerivedVariables] = None,
 ) -> None:
     """Create visualizations for individual panels.
 
     :param xdmf_path: timecourse xdmf
     :param data_layers: iterable of data layers to visualize, for every layer a plot is generated
+    :param derived: derived variables which can be used as sids of the data layers
     """
 
     # FIXME: Create more flexible visualization combining multiple datalayers into a single plot;
@@ -111,14 +115,21 @@ def visualize_datalayers_timecourse(
         output_dir.mkdir(parents=True)
         console.print(f"output_dir created: {output_dir}")
 
-    with meshio.xdmf.TimeSeriesReader(xdmf_path) as reader:
+    # only the variables of the data layers are read
+    data_layers = list(data_layers)
+    variables: list[str] = list(dict.fromkeys(dl.sid for dl in data_layers))
+
+    with XDMFReader(xdmf_path) as reader:
         points, cells = reader.read_points_cells()
+        read_data = (
+            reader.read_data if derived is None else derived.reader(reader).read_data
+        )
 
         tnum = reader.num_steps
         for k in track(
             range(tnum), description=f"Creating {tnum} panels for {xdmf_path.stem} ..."
         ):
-            t, point_data, cell_data = reader.read_data(k)
+            t, point_data, cell_data = read_data(k, variables=variables)
 
             # Create mesh with single data point
             mesh: meshio = meshio.Mesh(
@@ -376,7 +387,7 @@ def visualize_interactive(
 
 def xdmf_to_mesh(xdmf_path: Path, k: int = 0) -> meshio.Mesh:
     """XDMF to mesh."""
-    with meshio.xdmf.TimeSeriesReader(xdmf_path) as reader:
+    with XDMFReader(xdmf_path) as reader:
         points, cells = reader.read_points_cells()
         t, point_data, cell_data = reader.read_data(k)
 
@@ -0,0 +1,129 @@
+"""Test the derived variables."""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from porous_media import RESOURCES_DIR
+from porous_media.data.derived_variables import (
+    DERIVED_VARIABLES,
+    DerivedVariable,
+    DerivedVariables,
+)
+from porous_media.data.xdmf_calculations import mesh_reductions
+from porous_media.data.xdmf_reader import XDMFReader
+from porous_media.data.xdmf_tools import AttributeType, DataLimits, vtks_to_xdmf
+
+
+@pytest.fixture
+def derived() -> DerivedVariables:
+    """Create registry of derived variables."""
+    return DerivedVariables(
+        [
+            DerivedVariable("pressure_mmHg", "pressure / 133.322", unit="mmHg"),
+            DerivedVariable("pressure_kPa", "pressure_mmHg * 0.133322", unit="kPa"),
+            DerivedVariable("substrate_uM", "`rr_(S_ext)` * 1000", unit="µM"),
+            DerivedVariable(
+                "flux_norm",
+                "sqrt(fluid_flux_TPM[:, 0]**2 + fluid_flux_TPM[:, 1]**2)",
+            ),
+            DerivedVariable("displacement_mm", "displacement * 1000", unit="mm"),
+            DerivedVariable(
+                "fluid_flux_mm",
+                "fluid_flux_TPM * 1000",
+                attribute_type=AttributeType.VECTOR,
+            ),
+        ]
+    )
+
+
+def test_expressions(derived: DerivedVariables) -> None:
+    """Test parsing and evaluation of the expressions."""
+    assert derived["substrate_uM"].variables == ["rr_(S_ext)"]
+    assert derived.dependencies("pressure_kPa") == ["pressure"]
+    assert derived.evaluate("pressure_mmHg", lambda _: np.array([133.322])) == [1.0]
+    mask = DerivedVariable("mask", "(pressure > 0) & ~(pressure > 1)")
+    np.testing.assert_array_equal(
+        mask.evaluate({"pressure": np.array([-1.0, 0.5, 2.0])}), [False, True, False]
+    )
+
+    for expression in [
+        "__import__('os')",
+        "pressure.real",
+        "lambda: 1",
+        "a +",
+        "(pressure > 0) and (pressure < 1)",
+        "not pressure",
+        "0 < pressure < 1",
+    ]:
+        with pytest.raises(ValueError):
+            DerivedVariable("invalid", expression)
+
+    with pytest.raises(ValueError):
+        derived.register(DerivedVariable("pressure", "pressure_kPa / 2"))
+    assert "pressure" not in derived
+
+    # xarray datasets
+    ds = xr.Dataset({"pressure": ("cell", [133.322, 266.644])})
+    ds = derived.assign(ds, ["pressure_kPa"])
+    np.testing.assert_allclose(ds["pressure_kPa"], [0.133322, 0.266644])
+    assert ds["pressure_kPa"].attrs["unit"] == "kPa"
+    assert "pressure_mmHg" not in ds
+    assert "element_volume_nl" in DERIVED_VARIABLES
+
+
+def test_derived_reader(tmp_path: Path, derived: DerivedVariables) -> None:
+    """Test the derived variables of the XDMF."""
+    vtk_dir = RESOURCES_DIR / "vtk" / "vtk_timecourse"
+    xdmf_path = tmp_path / "vtk_timecourse.xdmf"
+    vtks_to_xdmf(vtk_dir, xdmf_path=xdmf_path, overwrite=True)
+
+    with XDMFReader(xdmf_path) as reader:
+        source = derived.reader(reader)
+        pressure = reader.read_array(2, "pressure")
+        np.testing.assert_allclose(
+            source.read_array(2, "pressure_kPa"), pressure / 1000, rtol=1e-6
+        )
+        # memoised per step
+        assert source.read_array(2, "pressure_mmHg") is source.read_array(
+            2, "pressure_mmHg"
+        )
+        assert source.center("flux_norm") == "Cell"
+        assert source.center("displacement_mm") == "Node"
+
+        t, point_data, cell_data = source.read_data(
+            1, variables=["displacement_mm", "substrate_uM"]
+        )
+        assert t == reader.times[1]
+        np.testing.assert_allclose(
+            point_data["displacement_mm"], reader.read_array(1, "displacement") * 1000
+        )
+        assert len(cell_data["substrate_uM"]) == len(reader.read_cells())
+
+        derived.register(DerivedVariable("mixed", "pressure * displacement[:, 0]"))
+        with pytest.raises(ValueError):
+            source.center("mixed")
+
+    # limits
+    data_limits = DataLimits.from_xdmf(
+        xdmf_path, variables=["pressure", "pressure_mmHg"], derived=derived
+    )
+    assert data_limits.limits["pressure_mmHg"] == pytest.approx(
+        tuple(v / 133.322 for v in data_limits.limits["pressure"])
+    )
+
+    # reductions
+    df = mesh_reductions(
+        xdmf_path,
+        variables=["fluid_flux_TPM", "fluid_flux_mm", "substrate_uM"],
+        derived=derived,
+    )
+    metrics = ["integral", "mean", "min", "max"]
+    np.testing.assert_allclose(
+        df["fluid_flux_mm_magnitude"][metrics],
+        df["fluid_flux_TPM_magnitude"][metrics] * 1000,
+        rtol=1e-6,
+    )
+    assert list(df["substrate_uM"].columns)[:2] == ["integral", "mean"]
@@ -0,0 +1,82 @@
+"""Test the liver variables."""
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from porous_media.analyses.liver_variables import (
+    calculate_ensemble_metrics,
+    calculate_necrosis_fraction,
+)
+
+
+def ensemble(num_sims: int = 6, num_times: int = 4, num_cells: int = 50) -> xr.Dataset:
+    """Create random ensemble dataset."""
+    rng = np.random.default_rng(seed=42)
+    shape = (num_sims, num_times, num_cells)
+    position = np.broadcast_to(rng.random((num_sims, 1, num_cells)), shape).copy()
+    position[:, :, :3] = np.nan
+    return xr.Dataset(
+        data_vars={
+            "rr_necrosis": (("sim", "time", "cell"), rng.random(shape)),
+            "element_volume_point_TPM": (
+                ("sim", "time", "cell"),
+                rng.random(shape) + 0.5,
+            ),
+            "rr_(S_ext)": (("sim", "time", "cell"), rng.random(shape)),
+            "rr_(T)": (("sim", "time", "cell"), rng.random(shape)),
+            "rr_position": (("sim", "time", "cell"), position),
+        },
+        coords={
+            "sim": [f"sim{k:03d}" for k in range(num_sims)],
+            "time": np.arange(num_times, dtype=float),
+            "pattern_key": (("sim",), np.arange(num_sims) % 2),
+        },
+    )
+
+
+def test_ensemble_metrics() -> None:
+    """Test the batched metrics against the metrics of the single simulations."""
+    xr_ensemble = ensemble()
+    xr_metrics = calculate_ensemble_metrics(xr_ensemble, zones=4)
+    assert set(xr_metrics.data_vars) == {
+        "volume",
+        "necrosis_fraction",
+        "necrosis_zone",
+        "substrate_total",
+        "toxin_total",
+    }
+    assert xr_metrics["necrosis_zone"].dims == ("sim", "time", "zone")
+    np.testing.assert_array_equal(xr_metrics.pattern_key, xr_ensemble.pattern_key)
+
+    for sim_id in xr_ensemble.sim.values:
+        xr_cells = xr_ensemble.sel(sim=sim_id)
+        volume = xr_cells["element_volume_point_TPM"]
+        xr.testing.assert_allclose(
+            xr_metrics["necrosis_fraction"].sel(sim=sim_id),
+            calculate_necrosis_fraction(xr_cells),
+        )
+        np.testing.assert_allclose(
+            xr_metrics["substrate_total"].sel(sim=sim_id),
+            (xr_cells["rr_(S_ext)"] * volume).sum(dim="cell"),
+        )
+        position = xr_cells["rr_position"].isel(time=-1).values
+        for zone in range(4):
+            mask = (position >= zone / 4) & (position < (zone + 1) / 4)
+            np.testing.assert_allclose(
+                xr_metrics["necrosis_zone"].sel(sim=sim_id, zone=zone),
+                (xr_cells["rr_necrosis"] * volume)[:, mask].sum(dim="cell")
+                / volume[:, mask].sum(dim="cell"),
+            )
+
+    # chunked over simulations
+    xr.testing.assert_allclose(
+        calculate_ensemble_metrics(xr_ensemble, zones=4, max_memory=10_000),
+        xr_metrics,
+    )
+
+    xr_ensemble["rr_necrosis"][0, 0, 0] = 1.5
+    with pytest.raises(ValueError):
+        calculate_ensemble_metrics(xr_ensemble)
+    with pytest.raises(ValueError):
+        calculate_ensemble_metrics(xr_ensemble, volume_variable="volume")
@@ -0,0 +1,118 @@
+"""Test the point and cell averaging operators."""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+from meshio import CellBlock
+
+from porous_media import RESOURCES_DIR
+from porous_media.data.xdmf_calculations import (
+    cell_volumes,
+    mesh_datasets_from_xdmf,
+    point_volumes,
+)
+from porous_media.data.xdmf_reader import XDMFReader
+from porous_media.data.xdmf_tools import vtks_to_xdmf
+from porous_media.mesh import mesh_operators
+from porous_media.mesh.mesh_operators import (
+    MeshOperators,
+    clear_operator_cache,
+    mesh_operators_from_xdmf,
+)
+
+
+def test_mesh_operators() -> None:
+    """Test the operators against the averages of the cells."""
+    cells = [
+        CellBlock("triangle", np.array([[0, 1, 2], [1, 3, 2]])),
+        CellBlock("quad", np.array([[2, 3, 4, 5]])),
+    ]
+    volumes = np.array([1.0, 3.0, 2.0])
+    operators = MeshOperators.from_mesh(num_points=7, cells=cells, volumes=volumes)
+    assert (operators.num_points, operators.num_cells) == (7, 3)
+
+    point_data = np.arange(7, dtype=float)
+    np.testing.assert_allclose(operators.points_to_cells(point_data), [1, 2, 3.5])
+
+    cell_data = np.array([1.0, 2.0, 4.0])
+    # point 2 (all cells), point 6 without cells
+    np.testing.assert_allclose(
+        operators.cells_to_points(cell_data)[[0, 2, 4, 6]],
+        [1.0, (1 / 3 + 2 * 1 + 4 * 0.5) / (1 / 3 + 1 + 0.5), 4.0, 0.0],
+    )
+
+    # (time, n, component) blocks
+    blocks = np.random.default_rng(seed=1).random((5, 3, 2))
+    mapped = operators.cells_to_points(blocks, axis=1)
+    assert mapped.shape == (5, 7, 2)
+    np.testing.assert_allclose(
+        mapped[3, :, 1], operators.cells_to_points(blocks[3, :, 1])
+    )
+
+    # volume conservation with lumped point volumes
+    volume_point = point_volumes(7, cells, volumes)
+    assert volume_point @ operators.cells_to_points(cell_data) == pytest.approx(
+        volumes @ cell_data
+    )
+
+    with pytest.raises(ValueError):
+        operators.cells_to_points(point_data)
+
+
+def test_operator_cache_size(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that only the operators of the last geometries are cached."""
+    monkeypatch.setattr(mesh_operators, "_OPERATOR_CACHE_SIZE", 2)
+    clear_operator_cache()
+    vtk_dir = RESOURCES_DIR / "vtk" / "vtk_single"
+    xdmf_paths = [tmp_path / f"vtk_single{k}.xdmf" for k in range(3)]
+    for xdmf_path in xdmf_paths:
+        vtks_to_xdmf(vtk_dir, xdmf_path=xdmf_path, overwrite=True)
+
+    operators = mesh_operators_from_xdmf(xdmf_paths[0])
+    mesh_operators_from_xdmf(xdmf_paths[1])
+    # the least recently used geometry is removed
+    assert mesh_operators_from_xdmf(xdmf_paths[0]) is operators
+    mesh_operators_from_xdmf(xdmf_paths[2])
+    assert len(mesh_operators._operator_cache) == 2
+    assert mesh_operators_from_xdmf(xdmf_paths[0]) is operators
+    clear_operator_cache()
+
+
+def test_mesh_operators_from_xdmf(tmp_path: Path) -> None:
+    """Test the operators on the (time, n) datasets."""
+    vtk_dir = RESOURCES_DIR / "vtk" / "vtk_timecourse"
+    xdmf_path = tmp_path / "vtk_timecourse.xdmf"
+    vtks_to_xdmf(vtk_dir, xdmf_path=xdmf_path, overwrite=True)
+
+    operators = mesh_operators_from_xdmf(xdmf_path)
+    assert mesh_operators_from_xdmf(xdmf_path) is operators
+    clear_operator_cache()
+    assert mesh_operators_from_xdmf(xdmf_path) is not operators
+    operators = mesh_operators_from_xdmf(xdmf_path)
+
+    xr_cells, xr_points = mesh_datasets_from_xdmf(xdmf_path)
+    xr_mapped = operators.dataset_to_cells(
+        xr_points[["displacement", "effective_fluid_pressure_TPM"]]
+    )
+    assert xr_mapped["displacement"].dims == ("time", "cell", "component")
+    assert xr_mapped["effective_fluid_pressure_TPM"].dims == ("time", "cell")
+
+    with XDMFReader(xdmf_path) as reader:
+        points, cells = reader.read_points_cells()
+    nodes = cells[0].data
+    np.testing.assert_allclose(
+        xr_mapped["displacement"].isel(time=-1),
+        xr_points["displacement"].isel(time=-1).values[nodes].mean(axis=1),
+        rtol=1e-6,
+        atol=1e-12,
+    )
+
+    xr_necrosis = operators.dataset_to_points(xr_cells[["rr_necrosis"]])
+    assert dict(xr_necrosis.sizes) == {"time": 3, "point": 626}
+    volumes = cell_volumes(points, cells)
+    np.testing.assert_allclose(
+        xr_necrosis["rr_necrosis"].values @ point_volumes(626, cells, volumes),
+        xr_cells["rr_necrosis"].values @ volumes,
+        rtol=1e-6,
+    )
@@ -2,9 +2,207 @@
 
 from pathlib import Path
 
+import meshio
+import numpy as np
 import pytest
 
-from porous_media.mesh.mesh_zonation import example_mesh_zonation
+from porous_media import RESOURCES_DIR
+from porous_media.mesh import mesh_zonation
+from porous_media.mesh.mesh_zonation import (
+    PositionMode,
+    ZonatedMesh,
+    ZonationPatterns,
+    cell_adjacency,
+    clear_adjacency_cache,
+    example_mesh_zonation,
+)
+
+
+def positions_reference(m: meshio.Mesh) -> np.ndarray:
+    """Positions of the cells with the reference loops (single cell block)."""
+    cell_type: np.ndarray = m.cell_data["cell_type"][0]
+    position = np.nan * np.ones_like(cell_type)
+    pp_cells: dict[int, np.ndarray] = {}
+    pv_cells: dict[int, np.ndarray] = {}
+    inner_cells: dict[int, np.ndarray] = {}
+    for kc, cell in enumerate(m.cells[0].data):
+        center = np.zeros(shape=3)
+        for kp in cell:
+            center += m.points[kp]
+        center = center / len(cell)
+        if np.isclose(cell_type[kc], 1.0):
+            position[kc] = 0
+            pp_cells[kc] = center
+        elif np.isclose(cell_type[kc], 2.0):
+            position[kc] = 1.0
+            pv_cells[kc] = center
+        elif np.isclose(cell_type[kc], 0.0):
+            inner_cells[kc] = center
+
+    for kc, center in inner_cells.items():
+        dpv = min(
+            [1.0] + [float(np.linalg.norm(center - c)) for c in pv_cells.values()]
+        )
+        dpp = min(
+            [1.0] + [float(np.linalg.norm(center - c)) for c in pp_cells.values()]
+        )
+        position[kc] = dpp / (dpv + dpp)
+    return position
+
+
+def test_create_zonated_mesh() -> None:
+    """Test the positions against the reference loops."""
+    vtk_path = RESOURCES_DIR / "zonation" / "mesh_zonation_lobulus.vtk"
+    mesh = meshio.read(vtk_path)
+    m = ZonatedMesh.create_zonated_mesh(mesh)
+    position = m.cell_data["position"][0]
+    reference = positions_reference(mesh)
+    assert position.shape == reference.shape
+    assert position.dtype == reference.dtype
+    np.testing.assert_allclose(position, reference, rtol=1e-6)
+    m_euclidean = ZonatedMesh.create_zonated_mesh(
+        mesh, position_mode=PositionMode.EUCLIDEAN
+    )
+    np.testing.assert_allclose(m_euclidean.cell_data["position"][0], reference)
+
+    # independent of the length unit, i.e. mesh in [µm]
+    mesh_um = meshio.Mesh(
+        points=mesh.points * 1e6, cells=mesh.cells, cell_data=mesh.cell_data
+    )
+    np.testing.assert_allclose(
+        ZonatedMesh.create_zonated_mesh(mesh_um).cell_data["position"][0],
+        position,
+        rtol=1e-5,
+    )
+
+    # split in mixed cell blocks
+    n = len(mesh.cells[0]) // 2
+    cell_block = mesh.cells[0]
+    mesh_blocks = meshio.Mesh(
+        points=mesh.points,
+        cells=[
+            meshio.CellBlock(cell_block.type, cell_block.data[:n]),
+            meshio.CellBlock(cell_block.type, cell_block.data[n:]),
+        ],
+        cell_data={
+            key: [data[0][:n], data[0][n:]] for key, data in mesh.cell_data.items()
+        },
+    )
+    m_blocks = ZonatedMesh._add_zonated_variable(
+        ZonatedMesh.create_zonated_mesh(mesh_blocks),
+        variable_id="pattern",
+        f_zonation=ZonatedMesh.patterns[0],
+    )
+    assert [len(data) for data in m_blocks.cell_data["position"]] == [n, n + 1]
+    np.testing.assert_allclose(np.concatenate(m_blocks.cell_data["position"]), position)
+    assert len(m_blocks.cell_data["pattern"]) == 2
+
+
+def test_geodesic_position() -> None:
+    """Test the geodesic positions on a C-shaped mesh.
+
+    The periportal cell (0, 0) and perivenous cell (0, 4) are close in space,
+    but connected by a path of 24 cells.
+    """
+    nx, ny = 11, 5
+    points = np.array(
+        [[x, y, 0.0] for y in range(ny + 1) for x in range(nx + 1)], dtype=float
+    )
+    quads, keys = [], []
+    for y in range(ny):
+        for x in range(nx):
+            if x < 10 and 0 < y < 4:
+                continue
+            k = y * (nx + 1) + x
+            quads.append([k, k + 1, k + nx + 2, k + nx + 1])
+            keys.append((x, y))
+    cell_type = np.zeros((len(quads), 1))
+    cell_type[keys.index((0, 0))] = 1.0
+    cell_type[keys.index((0, 4))] = 2.0
+    mesh = meshio.Mesh(
+        points=points,
+        cells=[meshio.CellBlock("quad", np.array(quads))],
+        cell_data={
+            "cell_type": [cell_type],
+            "element_volume_point_TPM": [np.ones((len(quads), 1))],
+        },
+    )
+
+    m = ZonatedMesh.create_zonated_mesh(mesh, position_mode=PositionMode.GEODESIC)
+    position = m.cell_data["position"][0][:, 0]
+    for x in range(nx):
+        assert position[keys.index((x, 0))] == pytest.approx(x / 24)
+    assert position[keys.index((10, 2))] == pytest.approx(0.5)
+    assert position[keys.index((1, 4))] == pytest.approx(23 / 24)
+
+    # euclidean positions are wrong for the non-convex mesh
+    m_euclidean = ZonatedMesh.create_zonated_mesh(mesh)
+    assert m_euclidean.cell_data["position"][0][keys.index((1, 4)), 0] < 0.9
+
+    # adjacency graph is cached for the geometry
+    graph = cell_adjacency(m)
+    assert cell_adjacency(mesh) is graph
+    clear_adjacency_cache()
+    assert cell_adjacency(mesh) is not graph
+    assert graph.shape == (len(quads), len(quads))
+    assert graph.nnz == 2 * (len(quads) - 1)
+
+
+def test_adjacency_cache_size(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that only the graphs of the last meshes are cached."""
+    monkeypatch.setattr(mesh_zonation, "_ADJACENCY_CACHE_SIZE", 2)
+    clear_adjacency_cache()
+    cells = [("triangle", np.array([[0, 1, 2], [1, 3, 2]]))]
+    meshes = [
+        meshio.Mesh(np.array([[0, 0], [1, 0], [0, 1], [1, 1]]) * (k + 1.0), cells)
+        for k in range(3)
+    ]
+    graph = cell_adjacency(meshes[0])
+    cell_adjacency(meshes[1])
+    # the least recently used mesh is removed
+    assert cell_adjacency(meshes[0]) is graph
+    cell_adjacency(meshes[2])
+    assert len(mesh_zonation._adjacency_cache) == 2
+    assert cell_adjacency(meshes[0]) is graph
+    clear_adjacency_cache()
+
+
+def test_evaluate_patterns() -> None:
+    """Test the batched patterns against the single patterns."""
+    vtk_path = RESOURCES_DIR / "zonation" / "mesh_zonation_lobulus.vtk"
+    m = ZonatedMesh.create_zonated_mesh(meshio.read(vtk_path))
+    position = m.cell_data["position"][0].astype(float)
+    volume = m.cell_data["volume"][0].astype(float)
+    volume_fraction = volume / volume.sum()
+
+    patterns = [f for f in ZonatedMesh.patterns if f != ZonationPatterns.random]
+    patterns += [ZonationPatterns.sharp_periportal] * 3
+    parameters: list[dict] = [{}] * (len(patterns) - 3)
+    parameters += [{"n": n, "value_max": 2.0} for n in [2.0, 5.0, 10.0]]
+    data, f_scales = ZonatedMesh.evaluate_patterns(
+        position, volume, patterns=patterns, parameters=parameters
+    )
+    assert data.shape == (len(patterns), len(position))
+
+    for k, (f_pattern, kwargs) in enumerate(zip(patterns, parameters)):
+        protein = f_pattern(position, **kwargs)
+        f_scale = (ZonationPatterns.constant(position) * volume_fraction).sum() / (
+            protein * volume_fraction
+        ).sum()
+        assert f_scales[k] == pytest.approx(f_scale, rel=1e-5)
+        np.testing.assert_allclose(
+            data[k], f_pattern(position, f_scale=f_scale, **kwargs)[:, 0], rtol=1e-5
+        )
+
+    # volume weighted mean of the constant pattern
+    np.testing.assert_allclose(data @ volume_fraction[:, 0], 0.5, rtol=1e-5)
+
+    data, _ = ZonatedMesh.evaluate_patterns(
+        position, volume, patterns=[ZonationPatterns.random] * 2
+    )
+    assert not np.allclose(data[0], data[1])
+    with pytest.raises(ValueError):
+        ZonatedMesh.evaluate_patterns(position, volume, patterns, parameters[:2])
 
 
 @pytest.mark.skip(reason="Issues with pyvista plotting in test environment")
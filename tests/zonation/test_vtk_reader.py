@@ -0,0 +1,85 @@
+"""Test the FEBio VTK reader."""
+
+from pathlib import Path
+
+import meshio
+import numpy as np
+import pytest
+
+from porous_media import RESOURCES_DIR
+from porous_media.data.vtk_reader import VTKReader, _write_vtk_ascii
+
+
+def _assert_mesh_equal(reader: VTKReader, vtk_path: Path, mesh: meshio.Mesh) -> None:
+    """Assert that the VTK data is identical to the meshio mesh."""
+    _, point_data, cell_data = reader.read(vtk_path)
+    assert reader.points is not None and reader.cells is not None
+    np.testing.assert_array_equal(reader.points, mesh.points)
+    for cell_block, cell_block_meshio in zip(reader.cells, mesh.cells):
+        assert cell_block.type == cell_block_meshio.type
+        np.testing.assert_array_equal(cell_block.data, cell_block_meshio.data)
+
+    assert list(point_data) == list(mesh.point_data)
+    assert list(cell_data) == list(mesh.cell_data)
+    for name, data in mesh.point_data.items():
+        assert point_data[name].shape == data.shape
+        np.testing.assert_array_equal(point_data[name], data)
+    for name, data_blocks in mesh.cell_data.items():
+        for data, data_meshio in zip(cell_data[name], data_blocks):
+            assert data.shape == data_meshio.shape
+            np.testing.assert_array_equal(data, data_meshio)
+
+
+def test_read_ascii() -> None:
+    """Test that the ASCII VTKs are read identical to meshio."""
+    reader = VTKReader()
+    vtk_paths = sorted((RESOURCES_DIR / "vtk" / "vtk_timecourse").glob("*.vtk"))
+    times = []
+    for vtk_path in vtk_paths:
+        _assert_mesh_equal(reader, vtk_path, meshio.read(vtk_path))
+        times.append(reader.read(vtk_path)[0])
+    assert times == pytest.approx([0.0, 80.0, 220.0])
+
+    # geometry is only parsed once
+    points = reader.points
+    reader.read(vtk_paths[0])
+    assert reader.points is points
+
+
+def test_read_binary(tmp_path: Path) -> None:
+    """Test that binary VTKs are read identical to meshio."""
+    vtk_path = (
+        RESOURCES_DIR / "vtk" / "vtk_single" / "lobule_zonation_pattern.t0022.vtk"
+    )
+    mesh = meshio.read(vtk_path)
+    # meshio writes tensors with incorrect FIELD shapes
+    mesh.cell_data = {k: v for k, v in mesh.cell_data.items() if v[0].ndim < 3}
+
+    vtk_binary = tmp_path / "binary.vtk"
+    meshio.vtk.write(vtk_binary, mesh, fmt_version="4.2", binary=True)
+    mesh_binary = meshio.read(vtk_binary)
+    # FEBio header with time
+    content = vtk_binary.read_bytes().split(b"\n", 2)
+    vtk_binary.write_bytes(
+        b"\n".join([content[0], b"vtk output at time 22", content[2]])
+    )
+
+    reader = VTKReader()
+    _assert_mesh_equal(reader, vtk_binary, mesh_binary)
+    assert reader.read(vtk_binary)[0] == pytest.approx(22.0)
+
+
+def test_read_nan(tmp_path: Path) -> None:
+    """Test that lines starting with nan are not section headers."""
+    vtk_path = (
+        RESOURCES_DIR / "vtk" / "vtk_single" / "lobule_zonation_pattern.t0022.vtk"
+    )
+    reader = VTKReader()
+    t, point_data, cell_data = reader.read(vtk_path)
+    assert reader.points is not None and reader.cells is not None
+    cell_data["rr_necrosis"][0][::2] = np.nan
+    cell_data["rr_protein"][0][::3] = -np.inf
+
+    vtk_nan = tmp_path / "nan.vtk"
+    _write_vtk_ascii(vtk_nan, t, reader.points, reader.cells, point_data, cell_data)
+    _assert_mesh_equal(VTKReader(), vtk_nan, meshio.read(vtk_nan))
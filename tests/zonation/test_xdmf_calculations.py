@@ -0,0 +1,348 @@
+"""Test the calculations on the XDMF."""
+
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+from meshio import CellBlock
+
+from porous_media import RESOURCES_DIR
+from porous_media.analyses.liver_variables import calculate_necrosis_fraction
+from porous_media.data.xdmf_calculations import (
+    cell_volumes,
+    ensemble_dataset,
+    map_time_chunks,
+    mesh_datasets_from_xdmf,
+    mesh_reductions,
+    point_volumes,
+    zonation_profiles,
+)
+from porous_media.data.xdmf_reader import XDMFReader
+from porous_media.data.xdmf_tools import copy_xdmf, vtks_to_xdmf
+from porous_media.data.xdmf_writer import XDMFWriter
+
+
+@pytest.fixture
+def xdmf_timecourse(tmp_path: Path) -> Path:
+    """Create timecourse XDMF."""
+    vtk_dir = RESOURCES_DIR / "vtk" / "vtk_timecourse"
+    xdmf_path = tmp_path / "vtk_timecourse.xdmf"
+    vtks_to_xdmf(vtk_dir, xdmf_path=xdmf_path, overwrite=True)
+    return xdmf_path
+
+
+def test_mesh_datasets_from_xdmf(xdmf_timecourse: Path) -> None:
+    """Test the (time, cell) and (time, point) datasets."""
+    xr_cells, xr_points = mesh_datasets_from_xdmf(xdmf_timecourse, overwrite=True)
+
+    assert dict(xr_cells.sizes) == {
+        "time": 3,
+        "cell": 563,
+        "component": 3,
+        "tensor_component": 9,
+    }
+    assert dict(xr_points.sizes) == {"time": 3, "point": 626, "component": 3}
+    np.testing.assert_array_equal(xr_cells["index"], np.arange(563))
+    np.testing.assert_array_equal(xr_points["time"], [0.0, 80.0, 220.0])
+
+    with XDMFReader(xdmf_timecourse) as reader:
+        for key in ["rr_necrosis", "pressure"]:
+            assert xr_cells[key].dims == ("time", "cell")
+            np.testing.assert_array_equal(
+                xr_cells[key], reader.read_variable(key).squeeze()
+            )
+        key = "effective_fluid_pressure_TPM"
+        np.testing.assert_array_equal(
+            xr_points[key], reader.read_variable(key).squeeze()
+        )
+
+        # vectors with magnitude
+        displacement = reader.read_variable("displacement")
+        assert xr_points["displacement"].dims == ("time", "point", "component")
+        np.testing.assert_array_equal(xr_points["displacement"], displacement)
+        np.testing.assert_allclose(
+            xr_points["displacement_magnitude"],
+            np.linalg.norm(displacement, axis=-1),
+            rtol=1e-6,
+        )
+        assert list(xr_points["component"].values) == ["x", "y", "z"]
+
+        # tensors with trace
+        stress = reader.read_variable("stress")
+        assert xr_cells["stress"].dims == ("time", "cell", "tensor_component")
+        np.testing.assert_array_equal(
+            xr_cells["stress"].sel(tensor_component="xy"), stress[:, :, 0, 1]
+        )
+        np.testing.assert_allclose(
+            xr_cells["stress_trace"],
+            np.trace(stress, axis1=2, axis2=3),
+            rtol=1e-5,
+        )
+
+    # cached netCDF files
+    xr_cells_cached, xr_points_cached = mesh_datasets_from_xdmf(xdmf_timecourse)
+    xr.testing.assert_identical(xr_cells.drop_indexes("index"), xr_cells_cached.load())
+    xr.testing.assert_identical(
+        xr_points.drop_indexes("index"), xr_points_cached.load()
+    )
+    xr_cells_cached.close()
+    xr_points_cached.close()
+
+    # cache is rebuilt for changed xdmf
+    vtk_dir = RESOURCES_DIR / "vtk" / "vtk_single"
+    vtks_to_xdmf(vtk_dir, xdmf_path=xdmf_timecourse, overwrite=True)
+    xr_cells_changed, _ = mesh_datasets_from_xdmf(xdmf_timecourse)
+    assert xr_cells_changed.sizes["time"] == 1
+
+
+def test_mesh_datasets_lazy(tmp_path: Path) -> None:
+    """Test the lazy mode with bounded memory on a dataset larger than the limit."""
+    num_steps, num_cells = 60, 20000
+    rng = np.random.default_rng(seed=42)
+    xdmf_path = tmp_path / "large.xdmf"
+    with XDMFWriter(xdmf_path) as writer:
+        writer.write_points_cells(
+            rng.random((num_cells + 2, 3)),
+            [CellBlock("triangle", np.arange(num_cells)[:, None] + [0, 1, 2])],
+        )
+        for k in range(num_steps):
+            writer.write_data(
+                t=float(k),
+                cell_data={
+                    "rr_necrosis": [rng.random(num_cells).astype(np.float32)],
+                    "element_volume_point_TPM": [rng.random(num_cells) + 1.0],
+                    "fluid_flux_TPM": [rng.random((num_cells, 3))],
+                },
+            )
+
+    max_memory = 4 * 2**20
+    tracemalloc.start()
+    xr_cells, _ = mesh_datasets_from_xdmf(xdmf_path, max_memory=max_memory)
+    _, peak_create = tracemalloc.get_traced_memory()
+
+    tracemalloc.reset_peak()
+    means = map_time_chunks(
+        xr_cells[["rr_necrosis", "fluid_flux_TPM_magnitude"]],
+        lambda ds: ds.mean(dim="cell"),
+        max_memory=max_memory,
+    )
+    necrosis_fraction = calculate_necrosis_fraction(xr_cells, max_memory=max_memory)
+    _, peak_reduce = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert xr_cells.nbytes > 10 * max_memory
+    assert not xr_cells["rr_necrosis"].variable._in_memory
+    assert peak_create < max_memory
+    assert peak_reduce < max_memory
+
+    # identical to the eager results
+    xr_cells_eager, _ = mesh_datasets_from_xdmf(xdmf_path)
+    assert list(xr_cells.data_vars) == list(xr_cells_eager.data_vars)
+    xr.testing.assert_equal(xr_cells.load(), xr_cells_eager.drop_indexes("index"))
+    xr.testing.assert_allclose(
+        means,
+        xr_cells_eager[["rr_necrosis", "fluid_flux_TPM_magnitude"]].mean(dim="cell"),
+    )
+    xr.testing.assert_allclose(
+        necrosis_fraction, calculate_necrosis_fraction(xr_cells_eager)
+    )
+
+
+def test_ensemble_dataset(xdmf_timecourse: Path, tmp_path: Path) -> None:
+    """Test the stacking of simulations in the ensemble dataset."""
+    conditions = pd.DataFrame(
+        {"pattern_key": [0, 0, 1, 1], "boundary_flow_key": [0, 1, 0, 1]},
+        index=["sim001", "sim002", "sim003", "sim004"],
+    )
+    xdmf_paths: dict[str, Path] = {}
+    for sim_id in conditions.index:
+        xdmf_paths[sim_id] = tmp_path / f"{sim_id}.xdmf"
+        copy_xdmf(xdmf_timecourse, xdmf_paths[sim_id])
+
+    times = np.linspace(0, 220, num=12)
+    variables = ["rr_necrosis", "fluid_flux_TPM"]
+    ensemble = ensemble_dataset(
+        xdmf_paths,
+        ensemble_path=tmp_path / "ensemble.h5",
+        times=times,
+        conditions=conditions,
+        variables=variables,
+    )
+    assert list(ensemble.data_vars) == variables
+    assert ensemble["fluid_flux_TPM"].dims == ("sim", "time", "cell", "component")
+    assert list(ensemble.sim.values) == list(conditions.index)
+    np.testing.assert_array_equal(ensemble.pattern_key, [0, 0, 1, 1])
+    np.testing.assert_array_equal(ensemble.time, times)
+
+    xr_cells, _ = mesh_datasets_from_xdmf(xdmf_paths["sim003"])
+    np.testing.assert_allclose(
+        ensemble["rr_necrosis"].sel(sim="sim003"),
+        xr_cells["rr_necrosis"].interp(time=times),
+        rtol=1e-6,
+    )
+
+    # vectorised statistics and selection by condition
+    xr_mean = ensemble["rr_necrosis"].mean(dim="cell")
+    assert xr_mean.groupby("pattern_key").mean().sizes == {
+        "pattern_key": 2,
+        "time": 12,
+    }
+    xr_mean = xr_mean.set_xindex(["pattern_key", "boundary_flow_key"])
+    assert xr_mean.sel(pattern_key=1).sizes == {"boundary_flow_key": 2, "time": 12}
+    assert xr_mean.sel(pattern_key=1, boundary_flow_key=0).sizes == {"time": 12}
+
+
+def test_ensemble_dataset_dtypes(tmp_path: Path) -> None:
+    """Test that interpolated integer and float32 variables are not truncated."""
+    xdmf_path = tmp_path / "ids.xdmf"
+    with XDMFWriter(xdmf_path) as writer:
+        writer.write_points_cells(
+            np.eye(3), [CellBlock("triangle", np.array([[0, 1, 2], [0, 2, 1]]))]
+        )
+        for t, ids in [(0.0, [0, 1]), (10.0, [3, 4])]:
+            writer.write_data(
+                t=t,
+                cell_data={
+                    "cell_id": [np.array(ids, dtype=np.int64)],
+                    "rr_necrosis": [np.array(ids, dtype=np.float32) / 3],
+                },
+            )
+
+    times = np.array([0.0, 5.0, 7.5])
+    ensemble = ensemble_dataset(
+        {"sim001": xdmf_path},
+        ensemble_path=tmp_path / "ensemble.h5",
+        times=times,
+        variables=["cell_id", "rr_necrosis"],
+    )
+    assert ensemble["cell_id"].dtype == np.float64
+    np.testing.assert_allclose(
+        ensemble["cell_id"].sel(sim="sim001"),
+        np.array([[0.0, 1.0], [1.5, 2.5], [2.25, 3.25]]),
+    )
+    xr_cells, _ = mesh_datasets_from_xdmf(xdmf_path)
+    np.testing.assert_array_equal(
+        ensemble["rr_necrosis"].sel(sim="sim001"),
+        xr_cells["rr_necrosis"].interp(time=times),
+    )
+
+
+def test_cell_volumes() -> None:
+    """Test the volumes of the cell types on the unit cube."""
+    points = np.array(
+        [[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0], [0, 0, 1], [1, 0, 1], [1, 1, 1]],
+        dtype=float,
+    )
+    points = np.vstack([points, [0, 1, 1]])
+    cells = [
+        CellBlock("hexahedron", np.array([[0, 1, 2, 3, 4, 5, 6, 7]])),
+        CellBlock("wedge", np.array([[0, 1, 2, 4, 5, 6]])),
+        CellBlock("tetra", np.array([[0, 1, 3, 4]])),
+        CellBlock("quad", np.array([[0, 1, 2, 3]])),
+        CellBlock("triangle", np.array([[0, 1, 2]])),
+    ]
+    volumes = cell_volumes(points, cells)
+    np.testing.assert_allclose(volumes, [1.0, 0.5, 1 / 6, 1.0, 0.5])
+    assert point_volumes(len(points), cells[:1], volumes[:1]) == pytest.approx(
+        np.full(8, 0.125)
+    )
+
+    with pytest.raises(ValueError):
+        cell_volumes(points, [CellBlock("line", np.array([[0, 1]]))])
+
+
+def test_mesh_reductions(xdmf_timecourse: Path) -> None:
+    """Test the volume weighted reductions against the xarray datasets."""
+    df = mesh_reductions(
+        xdmf_timecourse,
+        variables=["rr_(S_ext)", "fluid_flux_TPM", "effective_fluid_pressure_TPM"],
+        quantiles=[0.5],
+        threshold=0.1,
+    )
+    assert list(df.index) == [0.0, 80.0, 220.0]
+    assert list(dict.fromkeys(df.columns.get_level_values(0))) == [
+        "rr_(S_ext)",
+        "fluid_flux_TPM_magnitude",
+        "effective_fluid_pressure_TPM",
+    ]
+
+    xr_cells, _ = mesh_datasets_from_xdmf(xdmf_timecourse)
+    with XDMFReader(xdmf_timecourse) as reader:
+        volumes = cell_volumes(*reader.read_points_cells())
+    for name in ["rr_(S_ext)", "fluid_flux_TPM_magnitude"]:
+        values = xr_cells[name].values.astype(float)
+        np.testing.assert_allclose(df[name]["integral"], values @ volumes)
+        np.testing.assert_allclose(df[name]["mean"], values @ volumes / volumes.sum())
+        np.testing.assert_allclose(
+            df[name]["fraction"], (values > 0.1) @ volumes / volumes.sum()
+        )
+        np.testing.assert_allclose(df[name]["min"], values.min(axis=1))
+        np.testing.assert_allclose(df[name]["max"], values.max(axis=1))
+        assert np.all(df[name]["q0.5"] >= df[name]["min"])
+        assert np.all(df[name]["q0.5"] <= df[name]["max"])
+
+    # point data is weighted with the lumped point volumes
+    assert df["effective_fluid_pressure_TPM"]["integral"].iloc[-1] == pytest.approx(
+        df["effective_fluid_pressure_TPM"]["mean"].iloc[-1] * volumes.sum()
+    )
+
+
+def test_zonation_profiles(xdmf_timecourse: Path) -> None:
+    """Test the volume weighted zone statistics against the xarray datasets."""
+    with XDMFReader(xdmf_timecourse) as reader:
+        points, cells = reader.read_points_cells()
+    volumes = cell_volumes(points, cells)
+    # positions along x with cells without position
+    centers = points[cells[0].data].mean(axis=1)[:, 0]
+    positions = (centers - centers.min()) / (centers.max() - centers.min())
+    positions[:10] = np.nan
+
+    xr_zones = zonation_profiles(
+        xdmf_timecourse,
+        variables=["rr_(S_ext)", "fluid_flux_TPM"],
+        zones=4,
+        positions=positions,
+    )
+    assert xr_zones["rr_(S_ext)"].dims == ("time", "zone")
+    assert dict(xr_zones.sizes) == {"time": 3, "zone": 4}
+    assert set(xr_zones.data_vars) == {
+        "rr_(S_ext)",
+        "rr_(S_ext)_std",
+        "fluid_flux_TPM_magnitude",
+        "fluid_flux_TPM_magnitude_std",
+        "volume",
+    }
+    np.testing.assert_allclose(xr_zones.position, [0.125, 0.375, 0.625, 0.875])
+    assert float(xr_zones["volume"].sum()) == pytest.approx(volumes[10:].sum())
+
+    xr_cells, _ = mesh_datasets_from_xdmf(xdmf_timecourse)
+    values = xr_cells["rr_(S_ext)"].values.astype(float)
+    for zone in range(4):
+        mask = (positions >= zone / 4) & (positions <= (zone + 1) / 4)
+        if zone < 3:
+            mask &= positions < (zone + 1) / 4
+        mean = values[:, mask] @ volumes[mask] / volumes[mask].sum()
+        std = np.sqrt(
+            (values[:, mask] - mean[:, None]) ** 2 @ volumes[mask] / volumes[mask].sum()
+        )
+        np.testing.assert_allclose(xr_zones["rr_(S_ext)"][:, zone], mean, rtol=1e-6)
+        np.testing.assert_allclose(
+            xr_zones["rr_(S_ext)_std"][:, zone], std, rtol=1e-4, atol=1e-9
+        )
+
+    # cached profiles, recalculated for changed zones
+    xr_cached = zonation_profiles(
+        xdmf_timecourse,
+        variables=["rr_(S_ext)", "fluid_flux_TPM"],
+        zones=4,
+        positions=positions,
+    )
+    xr.testing.assert_allclose(xr_zones, xr_cached.load())
+    xr_cached.close()
+    xr_zones = zonation_profiles(
+        xdmf_timecourse, variables=["pressure"], zones=[0, 0.5, 1], positions=positions
+    )
+    assert dict(xr_zones.sizes) == {"time": 3, "zone": 2}
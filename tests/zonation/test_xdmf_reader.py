@@ -0,0 +1,78 @@
+"""Test the XDMF reader."""
+
+from pathlib import Path
+
+import meshio
+import numpy as np
+import pytest
+
+from porous_media import RESOURCES_DIR
+from porous_media.data.xdmf_reader import XDMFReader
+from porous_media.data.xdmf_tools import DataLimits, vtks_to_xdmf
+
+
+@pytest.fixture
+def xdmf_timecourse(tmp_path: Path) -> Path:
+    """Create timecourse XDMF."""
+    vtk_dir = RESOURCES_DIR / "vtk" / "vtk_timecourse"
+    xdmf_path = tmp_path / "vtk_timecourse.xdmf"
+    vtks_to_xdmf(vtk_dir, xdmf_path=xdmf_path, overwrite=True)
+    return xdmf_path
+
+
+def test_read_data(xdmf_timecourse: Path) -> None:
+    """Test that the data is identical to the meshio reader."""
+    with (
+        XDMFReader(xdmf_timecourse) as reader,
+        meshio.xdmf.TimeSeriesReader(xdmf_timecourse) as reader_meshio,
+    ):
+        points, cells = reader.read_points_cells()
+        points_meshio, cells_meshio = reader_meshio.read_points_cells()
+        np.testing.assert_array_equal(points, points_meshio)
+        assert cells[0].type == cells_meshio[0].type
+        np.testing.assert_array_equal(cells[0].data, cells_meshio[0].data)
+
+        assert reader.num_steps == reader_meshio.num_steps
+        for k in range(reader.num_steps):
+            t, point_data, cell_data = reader.read_data(k)
+            t_meshio, point_data_meshio, cell_data_meshio = reader_meshio.read_data(k)
+            assert t == pytest.approx(t_meshio)
+            assert point_data.keys() == point_data_meshio.keys()
+            assert cell_data.keys() == cell_data_meshio.keys()
+            for key, data in point_data_meshio.items():
+                np.testing.assert_array_equal(point_data[key], data)
+            for key, data in cell_data_meshio.items():
+                np.testing.assert_array_equal(cell_data[key][0], data[0])
+
+
+def test_read_subset(xdmf_timecourse: Path) -> None:
+    """Test reading subsets of variables, steps and indices."""
+    with XDMFReader(xdmf_timecourse) as reader:
+        assert reader.times == pytest.approx([0.0, 80.0, 220.0])
+
+        _, point_data, cell_data = reader.read_data(1, variables=["rr_necrosis"])
+        assert not point_data
+        assert list(cell_data.keys()) == ["rr_necrosis"]
+
+        data = reader.read_array(2, "displacement")
+        assert isinstance(data, np.memmap)
+
+        data_steps = reader.read_variable("rr_(S)", steps=[0, 2], index=slice(10, 20))
+        assert data_steps.shape == (2, 10, 1)
+        np.testing.assert_array_equal(
+            data_steps[1], reader.read_array(2, "rr_(S)")[10:20]
+        )
+
+        with pytest.raises(KeyError):
+            reader.read_data(0, variables=["not_a_variable"])
+
+
+def test_data_limits_subset(xdmf_timecourse: Path) -> None:
+    """Test the limits for a subset of variables."""
+    data_limits = DataLimits.from_xdmf(xdmf_timecourse, overwrite=False)
+    data_limits_subset = DataLimits.from_xdmf(
+        xdmf_timecourse, overwrite=True, variables=["pressure", "displacement"]
+    )
+    assert set(data_limits_subset.limits) == {"pressure", "displacement"}
+    for name, limits in data_limits_subset.limits.items():
+        assert tuple(data_limits.limits[name]) == pytest.approx(limits)
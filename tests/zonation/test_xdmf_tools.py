@@ -1,11 +1,34 @@
 """Test xdmf functionality."""
 
+import json
+import os
+import shutil
+from concurrent.futures import Future
 from pathlib import Path
+from typing import Any, Callable
 
+import h5py
+import meshio
+import numpy as np
 import pytest
 
 from porous_media import RESOURCES_DIR
-from porous_media.data.xdmf_tools import XDMFInfo, vtks_to_xdmf
+from porous_media.data import xdmf_tools
+from porous_media.data.xdmf_reader import XDMFReader
+from porous_media.data.xdmf_writer import StorageProfile, XDMFWriter
+from porous_media.data.xdmf_tools import (
+    AttributeType,
+    ConversionManifest,
+    DataLimits,
+    InterpolationMethod,
+    XDMFInfo,
+    benchmark_storage_profiles,
+    copy_xdmf,
+    interpolate_xdmf,
+    vtks_to_xdmf,
+    xdmf_fingerprint,
+    xdmfs_from_directory,
+)
 
 
 def test_vtk_single_to_xdmf(tmp_path: Path) -> None:
@@ -47,3 +70,397 @@ def test_vtk_timecourse_to_xdmf(tmp_path: Path) -> None:
     assert xdmf_info.num_steps == 3
     assert xdmf_info.tstart == pytest.approx(0.0)
     assert xdmf_info.tend == pytest.approx(220.0)
+
+
+def test_vtk_timecourse_to_xdmf_parallel(tmp_path: Path) -> None:
+    """Test that the parallel VTK parsing gives the serial results."""
+    vtk_dir = RESOURCES_DIR / "vtk" / "vtk_timecourse"
+    xdmf_serial = tmp_path / "serial" / "vtk_timecourse.xdmf"
+    xdmf_parallel = tmp_path / "parallel" / "vtk_timecourse.xdmf"
+    vtks_to_xdmf(vtk_dir, xdmf_path=xdmf_serial, overwrite=True)
+    vtks_to_xdmf(
+        vtk_dir, xdmf_path=xdmf_parallel, overwrite=True, n_workers=2, max_pending=1
+    )
+
+    with (
+        meshio.xdmf.TimeSeriesReader(xdmf_serial) as reader_serial,
+        meshio.xdmf.TimeSeriesReader(xdmf_parallel) as reader_parallel,
+    ):
+        reader_serial.read_points_cells()
+        reader_parallel.read_points_cells()
+        assert reader_serial.num_steps == reader_parallel.num_steps
+        for k in range(reader_serial.num_steps):
+            t1, point_data1, cell_data1 = reader_serial.read_data(k)
+            t2, point_data2, cell_data2 = reader_parallel.read_data(k)
+            assert t1 == pytest.approx(t2)
+            for key, data in point_data1.items():
+                np.testing.assert_array_equal(data, point_data2[key])
+            for key, data in cell_data1.items():
+                np.testing.assert_array_equal(data[0], cell_data2[key][0])
+
+
+def test_iter_vtk_steps_pending(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that at most max_pending steps are submitted, parsed or consumed."""
+    submitted: list[Any] = []
+
+    class Executor:
+        """Synchronous executor recording the submitted steps."""
+
+        def __init__(self, **_: Any) -> None:
+            pass
+
+        def __enter__(self) -> "Executor":
+            return self
+
+        def __exit__(self, *_: Any) -> None:
+            pass
+
+        def submit(self, _: Callable, vtk_path: Any) -> Future:
+            submitted.append(vtk_path)
+            future: Future = Future()
+            future.set_result(vtk_path)
+            return future
+
+    monkeypatch.setattr(xdmf_tools, "ProcessPoolExecutor", Executor)
+    vtk_paths = [Path(f"step{k}.vtk") for k in range(6)]
+    steps = xdmf_tools._iter_vtk_steps(vtk_paths, n_workers=2, max_pending=2)
+    for k, step in enumerate(steps):
+        assert step == vtk_paths[k]
+        # the consumed step and the submitted steps
+        assert len(submitted) - k <= 2
+    assert submitted == vtk_paths
+
+
+def test_vtks_to_xdmf_limits(tmp_path: Path) -> None:
+    """Test that the limits of the conversion match recalculated limits."""
+    vtk_dir = RESOURCES_DIR / "vtk" / "vtk_timecourse"
+    xdmf_path = tmp_path / "vtk_timecourse.xdmf"
+    vtks_to_xdmf(vtk_dir, xdmf_path=xdmf_path, overwrite=True)
+    assert DataLimits.json_path_from_xdmf(xdmf_path).exists()
+
+    data_limits = DataLimits.from_xdmf(xdmf_path, overwrite=False)
+    data_limits_recalculated = DataLimits.from_xdmf(xdmf_path, overwrite=True)
+    assert data_limits.limits.keys() == data_limits_recalculated.limits.keys()
+    for name, limits in data_limits_recalculated.limits.items():
+        assert tuple(data_limits.limits[name]) == pytest.approx(limits)
+
+
+def test_xdmf_info_cache(tmp_path: Path) -> None:
+    """Test the cached XDMFInfo and lazy geometry."""
+    vtk_dir = RESOURCES_DIR / "vtk" / "vtk_timecourse"
+    xdmf_path = tmp_path / "vtk_timecourse.xdmf"
+    vtks_to_xdmf(vtk_dir, xdmf_path=xdmf_path, overwrite=True)
+
+    xdmf_info = XDMFInfo.from_path(xdmf_path)
+    json_path = XDMFInfo.json_path_from_xdmf(xdmf_path)
+    assert json_path.exists()
+    assert xdmf_info.num_points == 626
+    assert xdmf_info.num_cells == 563
+    assert xdmf_info.cell_data["stress"].attribute_type == AttributeType.TENSOR
+    assert xdmf_info.cell_data["stress"].shape == (563, 3, 3)
+    assert xdmf_info.point_data["displacement"].attribute_type == AttributeType.VECTOR
+    assert xdmf_info.points.shape == (626, 3)
+    assert len(xdmf_info.cells[0]) == 563
+
+    # cached information
+    xdmf_info_cached = XDMFInfo.from_path(xdmf_path)
+    assert xdmf_info_cached == xdmf_info
+
+    # cache is invalidated by changes of the xdmf
+    vtk_dir = RESOURCES_DIR / "vtk" / "vtk_single"
+    vtks_to_xdmf(vtk_dir, xdmf_path=xdmf_path, overwrite=True)
+    xdmf_info_changed = XDMFInfo.from_path(xdmf_path)
+    assert xdmf_info_changed.num_steps == 1
+
+
+def test_fingerprints(tmp_path: Path) -> None:
+    """Test that derived artifacts are reused until their inputs change."""
+    vtk_dir = RESOURCES_DIR / "vtk" / "vtk_timecourse"
+    xdmf_path = tmp_path / "vtk_timecourse.xdmf"
+    xdmf_interpolated = tmp_path / "vtk_timecourse_interpolated.xdmf"
+    vtks_to_xdmf(vtk_dir, xdmf_path=xdmf_path, overwrite=True)
+
+    limits_path = DataLimits.json_path_from_xdmf(xdmf_path)
+    with open(limits_path, "r") as f_json:
+        assert json.load(f_json)["fingerprint"] == xdmf_fingerprint(xdmf_path)
+
+    # valid artifacts are reused
+    mtime_ns = limits_path.stat().st_mtime_ns
+    DataLimits.from_xdmf(xdmf_path)
+    assert limits_path.stat().st_mtime_ns == mtime_ns
+
+    times = np.array([0.0, 40.0, 220.0])
+    interpolate_xdmf(xdmf_path, xdmf_interpolated, times_interpolate=times)
+    mtime_ns_interpolated = xdmf_interpolated.stat().st_mtime_ns
+    interpolate_xdmf(xdmf_path, xdmf_interpolated, times_interpolate=times)
+    assert xdmf_interpolated.stat().st_mtime_ns == mtime_ns_interpolated
+
+    # changes of the HDF5 data invalidate the artifacts
+    with XDMFReader(xdmf_path) as reader:
+        data_item = reader.steps[1]["rr_necrosis"].data_item
+    with h5py.File(data_item.h5_path, "r+") as f:
+        f[data_item.dataset][0] = 5.0
+    assert DataLimits.from_xdmf(xdmf_path).limits["rr_necrosis"][1] == 5.0
+    assert limits_path.stat().st_mtime_ns != mtime_ns
+
+    interpolate_xdmf(xdmf_path, xdmf_interpolated, times_interpolate=times)
+    assert xdmf_interpolated.stat().st_mtime_ns != mtime_ns_interpolated
+    assert DataLimits.from_xdmf(xdmf_interpolated).limits["rr_necrosis"][1] > 1.0
+
+    # changes of the interpolation parameters
+    mtime_ns_interpolated = xdmf_interpolated.stat().st_mtime_ns
+    interpolate_xdmf(xdmf_path, xdmf_interpolated, times_interpolate=times[1:])
+    assert xdmf_interpolated.stat().st_mtime_ns != mtime_ns_interpolated
+
+    # changes of the storage profile and geometry directory
+    profile = StorageProfile(compression="gzip", compression_opts=4, shuffle=True)
+    interpolate_xdmf(
+        xdmf_path,
+        xdmf_interpolated,
+        times_interpolate=times[1:],
+        storage_profile=profile,
+        geometry_dir=tmp_path / "geometry",
+    )
+    with XDMFReader(xdmf_interpolated) as reader:
+        data_item = reader.steps[0]["rr_necrosis"].data_item
+        assert reader.geometry.h5_path.parent == tmp_path / "geometry"
+    with h5py.File(data_item.h5_path, "r") as f:
+        assert f[data_item.dataset].compression == "gzip"
+
+    # changes of the output
+    with h5py.File(data_item.h5_path, "r+") as f:
+        del f[data_item.dataset]
+    mtime_ns_interpolated = xdmf_interpolated.stat().st_mtime_ns
+    interpolate_xdmf(
+        xdmf_path,
+        xdmf_interpolated,
+        times_interpolate=times[1:],
+        storage_profile=profile,
+        geometry_dir=tmp_path / "geometry",
+    )
+    assert xdmf_interpolated.stat().st_mtime_ns != mtime_ns_interpolated
+    with XDMFReader(xdmf_interpolated) as reader:
+        assert len(reader.read_array(0, "rr_necrosis")) == reader.num_cells
+
+
+def _assert_xdmf_equal(xdmf_path1: Path, xdmf_path2: Path) -> None:
+    """Assert that the timecourses are identical."""
+    with XDMFReader(xdmf_path1) as reader1, XDMFReader(xdmf_path2) as reader2:
+        assert reader1.times == pytest.approx(reader2.times)
+        np.testing.assert_array_equal(reader1.read_points(), reader2.read_points())
+        for k in range(reader1.num_steps):
+            _, point_data1, cell_data1 = reader1.read_data(k)
+            _, point_data2, cell_data2 = reader2.read_data(k)
+            assert point_data1.keys() == point_data2.keys()
+            assert cell_data1.keys() == cell_data2.keys()
+            for key, data in point_data1.items():
+                np.testing.assert_array_equal(data, point_data2[key])
+            for key, data_blocks in cell_data1.items():
+                np.testing.assert_array_equal(data_blocks[0], cell_data2[key][0])
+
+
+def test_vtks_to_xdmf_incremental(tmp_path: Path) -> None:
+    """Test appending new VTK steps and resuming interrupted conversions."""
+    vtk_paths = sorted((RESOURCES_DIR / "vtk" / "vtk_timecourse").glob("*.vtk"))
+    vtk_dir = tmp_path / "vtks"
+    vtk_dir.mkdir()
+    xdmf_path = tmp_path / "incremental.xdmf"
+    xdmf_full = tmp_path / "full.xdmf"
+    manifest_path = ConversionManifest.json_path_from_xdmf(xdmf_path)
+
+    # new steps are appended
+    for vtk_path in vtk_paths[:2]:
+        shutil.copy(vtk_path, vtk_dir)
+    vtks_to_xdmf(vtk_dir, xdmf_path=xdmf_path)
+    assert XDMFInfo.from_path(xdmf_path).num_steps == 2
+    shutil.copy(vtk_paths[2], vtk_dir)
+    vtks_to_xdmf(vtk_dir, xdmf_path=xdmf_path)
+    vtks_to_xdmf(vtk_dir, xdmf_path=xdmf_full, overwrite=True)
+    _assert_xdmf_equal(xdmf_path, xdmf_full)
+
+    manifest = ConversionManifest.load(manifest_path)
+    assert manifest is not None
+    assert [step.time for step in manifest.steps] == pytest.approx([0, 80, 220])
+
+    # limits include the existing and appended steps
+    data_limits = DataLimits.from_xdmf(xdmf_path)
+    data_limits_full = DataLimits.from_xdmf(xdmf_full)
+    for name, limits in data_limits_full.limits.items():
+        assert tuple(data_limits.limits[name]) == pytest.approx(limits)
+
+    # interrupted conversion is resumed from the last complete step
+    manifest.steps = manifest.steps[:1]
+    manifest.save(manifest_path)
+    vtks_to_xdmf(vtk_dir, xdmf_path=xdmf_path)
+    _assert_xdmf_equal(xdmf_path, xdmf_full)
+
+    # steps are converted again from the first modified VTK
+    vtk_path = vtk_dir / vtk_paths[1].name
+    stat = vtk_path.stat()
+    os.utime(vtk_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    vtks_to_xdmf(vtk_dir, xdmf_path=xdmf_path)
+    manifest = ConversionManifest.load(manifest_path)
+    assert manifest is not None
+    assert manifest.steps[1].mtime_ns == stat.st_mtime_ns + 10**9
+    _assert_xdmf_equal(xdmf_path, xdmf_full)
+
+    # compatible with meshio
+    with meshio.xdmf.TimeSeriesReader(xdmf_path) as reader:
+        reader.read_points_cells()
+        assert reader.num_steps == 3
+        t, _, _ = reader.read_data(2)
+        assert t == pytest.approx(220.0)
+
+
+def test_xdmfs_from_directory_parallel(tmp_path: Path) -> None:
+    """Test that the parallel conversion of directories gives the serial results."""
+    input_dir = tmp_path / "febio"
+    for name in ["vtk_single", "vtk_timecourse"]:
+        shutil.copytree(RESOURCES_DIR / "vtk" / name, input_dir / "sims" / name)
+
+    xdmf_dict = xdmfs_from_directory(input_dir, xdmf_dir=tmp_path / "serial")
+    xdmf_dict_parallel = xdmfs_from_directory(
+        input_dir, xdmf_dir=tmp_path / "parallel", n_workers=2
+    )
+    assert {p.name for p in xdmf_dict} == {p.name for p in xdmf_dict_parallel}
+    assert {p.name for p in xdmf_dict} == {
+        "sims__vtk_single.xdmf",
+        "sims__vtk_timecourse.xdmf",
+    }
+    for xdmf_path in xdmf_dict:
+        _assert_xdmf_equal(xdmf_path, tmp_path / "parallel" / xdmf_path.name)
+    assert not list(Path.cwd().glob("sims__*.h5"))
+
+    # merged limits of all simulations
+    with open(tmp_path / "serial" / "merged_limits.json", "r") as f_json:
+        limits = json.load(f_json)["limits"]
+    with open(tmp_path / "parallel" / "merged_limits.json", "r") as f_json:
+        limits_parallel = json.load(f_json)["limits"]
+    assert limits == limits_parallel
+    for xdmf_path in xdmf_dict:
+        for name, (dmin, dmax) in DataLimits.from_xdmf(xdmf_path).limits.items():
+            assert limits[name][0] <= dmin
+            assert limits[name][1] >= dmax
+
+
+def test_xdmfs_from_directory_shared_geometry(tmp_path: Path) -> None:
+    """Test that the ensemble geometry is stored once and shared."""
+    input_dir = tmp_path / "febio"
+    for name in ["vtk_single", "vtk_timecourse"]:
+        shutil.copytree(RESOURCES_DIR / "vtk" / name, input_dir / "sims" / name)
+
+    xdmf_dict = xdmfs_from_directory(input_dir, xdmf_dir=tmp_path / "separate")
+    xdmf_dict_shared = xdmfs_from_directory(
+        input_dir, xdmf_dir=tmp_path / "shared", shared_geometry=True
+    )
+    geometry_paths = list((tmp_path / "shared" / "geometry").glob("*.h5"))
+    assert len(geometry_paths) == 1
+
+    points_shared = []
+    for xdmf_path, xdmf_shared in zip(xdmf_dict, xdmf_dict_shared):
+        _assert_xdmf_equal(xdmf_path, xdmf_shared)
+        assert xdmf_shared.with_suffix(".h5").stat().st_size < (
+            xdmf_path.with_suffix(".h5").stat().st_size
+        )
+        with meshio.xdmf.TimeSeriesReader(xdmf_shared) as reader_meshio:
+            points, _ = reader_meshio.read_points_cells()
+            assert points.shape == (626, 3)
+
+        # geometry is read once per process
+        with XDMFReader(xdmf_shared) as reader:
+            points_shared.append(reader.read_points())
+    assert points_shared[0] is points_shared[1]
+    assert not points_shared[0].flags.writeable
+
+
+@pytest.mark.parametrize("method", list(InterpolationMethod))
+def test_interpolate_xdmf(tmp_path: Path, method: InterpolationMethod) -> None:
+    """Test interpolation of point and cell data."""
+    vtk_dir = RESOURCES_DIR / "vtk" / "vtk_timecourse"
+    xdmf_path = tmp_path / "vtk_timecourse.xdmf"
+    xdmf_interpolated = tmp_path / "vtk_timecourse_interpolated.xdmf"
+    vtks_to_xdmf(vtk_dir, xdmf_path=xdmf_path, overwrite=True)
+
+    # data timepoints are [0, 80, 220]
+    times = np.array([0.0, 40.0, 80.0, 150.0, 220.0])
+    interpolate_xdmf(
+        xdmf_in=xdmf_path,
+        xdmf_out=xdmf_interpolated,
+        times_interpolate=times,
+        overwrite=True,
+        method=method,
+    )
+
+    with XDMFReader(xdmf_path) as reader, XDMFReader(xdmf_interpolated) as reader_int:
+        assert reader_int.times == pytest.approx(times)
+        for name in ["displacement", "rr_(S_ext)", "stress"]:
+            data = reader.read_variable(name)
+            data_int = reader_int.read_variable(name)
+            assert data_int.shape == (len(times), *data.shape[1:])
+
+            # data timepoints are reproduced
+            for k_int, k in [(0, 0), (2, 1), (4, 2)]:
+                np.testing.assert_allclose(data_int[k_int], data[k], rtol=1e-5)
+
+            # interpolated values
+            for k_int, k in [(1, 0), (3, 1)]:
+                lower = np.minimum(data[k], data[k + 1])
+                upper = np.maximum(data[k], data[k + 1])
+                if method == InterpolationMethod.LINEAR:
+                    s = (times[k_int] - reader.times[k]) / (
+                        reader.times[k + 1] - reader.times[k]
+                    )
+                    np.testing.assert_allclose(
+                        data_int[k_int],
+                        (1 - s) * data[k] + s * data[k + 1],
+                        rtol=1e-5,
+                        atol=1e-12,
+                    )
+                # monotone interpolation within the data range
+                atol = 1e-6 * np.abs(data).max()
+                assert np.all(data_int[k_int] >= lower - atol)
+                assert np.all(data_int[k_int] <= upper + atol)
+
+
+def test_storage_profiles(tmp_path: Path) -> None:
+    """Test compressed, chunked and downcast storage."""
+    vtk_dir = RESOURCES_DIR / "vtk" / "vtk_timecourse"
+    xdmf_path = tmp_path / "vtk_timecourse.xdmf"
+    xdmf_gzip = tmp_path / "vtk_timecourse_gzip.xdmf"
+    vtks_to_xdmf(vtk_dir, xdmf_path=xdmf_path)
+    profile = StorageProfile(
+        compression="gzip", compression_opts=4, shuffle=True, chunk_bytes=2**12
+    )
+    copy_xdmf(xdmf_path, xdmf_gzip, storage_profile=profile)
+    _assert_xdmf_equal(xdmf_path, xdmf_gzip)
+    assert (tmp_path / "vtk_timecourse_gzip.h5").stat().st_size < (
+        tmp_path / "vtk_timecourse.h5"
+    ).stat().st_size
+
+    with XDMFReader(xdmf_gzip) as reader:
+        data_item = reader.steps[0]["stress"].data_item
+    with h5py.File(data_item.h5_path, "r") as f_h5:
+        dset = f_h5[data_item.dataset]
+        assert dset.compression == "gzip"
+        assert dset.chunks == (113, 3, 3)
+
+    # float32 downcast of selected variables
+    xdmf_float32 = tmp_path / "float32.xdmf"
+    with XDMFReader(xdmf_path) as reader:
+        points, cells = reader.read_points_cells()
+    data = np.linspace(0, 1, len(points), dtype=np.float64)
+    with XDMFWriter(
+        xdmf_float32, storage_profile=StorageProfile(float32_variables=["a"])
+    ) as writer:
+        writer.write_points_cells(points, cells)
+        writer.write_data(0.0, point_data={"a": data, "b": data})
+    with meshio.xdmf.TimeSeriesReader(xdmf_float32) as reader_meshio:
+        reader_meshio.read_points_cells()
+        _, point_data, _ = reader_meshio.read_data(0)
+        assert point_data["a"].dtype == np.float32
+        assert point_data["b"].dtype == np.float64
+        np.testing.assert_allclose(point_data["a"], data, rtol=1e-7)
+
+    df = benchmark_storage_profiles(xdmf_path, output_dir=tmp_path)
+    sizes = df["size_mb"].to_dict()
+    assert sizes["gzip"] < sizes["default"]
@@ -0,0 +1,96 @@
+"""Test the zonation parameter sweeps."""
+
+from pathlib import Path
+from typing import Callable, Sequence
+
+import meshio
+import numpy as np
+import pandas as pd
+import pytest
+
+from porous_media import RESOURCES_DIR
+from porous_media.data.xdmf_reader import XDMFReader
+from porous_media.febio.febio_manipulation import create_feb_files
+from porous_media.mesh.mesh_zonation import ZonatedMesh, ZonationPatterns
+from porous_media.mesh.zonation_sweep import (
+    create_zonation_sweep,
+    feb_data_from_zonation_sweep,
+    zonation_sweep_index_path,
+    zonation_sweep_parameters,
+)
+
+
+def test_zonation_sweep(tmp_path: Path) -> None:
+    """Test the fields of the sweep against the single zonated meshes."""
+    vtk_path = RESOURCES_DIR / "zonation" / "mesh_zonation_lobulus.vtk"
+    xdmf_path = tmp_path / "sweep.xdmf"
+    patterns: list[Callable] = [
+        ZonationPatterns.sharp_periportal,
+        ZonationPatterns.linear_increase,
+    ]
+    grid: dict[str, Sequence[float]] = {
+        "n": [2.0, 10.0],
+        "value_max": [1.0, 3.0],
+        "f_scale": [1.0, 2.0],
+    }
+    df = create_zonation_sweep(
+        vtk_path, xdmf_path, patterns=patterns, grid=grid, chunk_size=3
+    )
+    # linear_increase has no parameter n
+    assert list(df.pattern.value_counts()) == [8, 4]
+    pd.testing.assert_frame_equal(
+        pd.read_csv(zonation_sweep_index_path(xdmf_path), sep="\t"), df
+    )
+
+    m = ZonatedMesh.create_zonated_mesh(meshio.read(vtk_path))
+    volume = np.concatenate(m.cell_data["volume"]).reshape(-1).astype(float)
+    with XDMFReader(xdmf_path) as reader:
+        assert reader.cell_variables == ["position", *df.field]
+        np.testing.assert_allclose(
+            reader.read_array(0, "position"),
+            np.concatenate(m.cell_data["position"]).reshape(-1),
+        )
+        columns = ["field", "pattern", "n", "value_max", "f_scale", "volume_scale"]
+        for field, pattern, n, value_max, f_scale, volume_scale in df[
+            columns
+        ].itertuples(index=False):
+            kwargs = {"value_max": value_max}
+            if pattern == "sharp_periportal":
+                kwargs["n"] = n
+            reference, f_volume = ZonatedMesh.evaluate_patterns(
+                reader.read_array(0, "position"),
+                volume,
+                patterns=[getattr(ZonationPatterns, pattern)],
+                parameters=[kwargs],
+            )
+            assert volume_scale == pytest.approx(f_volume[0], rel=1e-6)
+            values = reader.read_array(0, field)
+            np.testing.assert_allclose(values, f_scale * reference[0], rtol=1e-5)
+            # volume mean of the constant pattern
+            assert values @ volume / volume.sum() == pytest.approx(
+                0.5 * f_scale, rel=1e-5
+            )
+
+    # febio templates
+    feb_data = feb_data_from_zonation_sweep(xdmf_path, fields=["linear_increase__0003"])
+    context = feb_data["linear_increase__0003"]
+    assert context["value_max"] == 3.0 and context["f_scale"] == 2.0
+    assert "n" not in context
+    assert len(context["zonation_values"]) == len(volume)
+
+    feb_template = tmp_path / "zonation.feb.template"
+    feb_template.write_text(
+        '<ElementData var="{{ zonation_field }}">\n'
+        "{% for value in zonation_values %}"
+        '<e lid="{{ loop.index }}">{{ value }}</e>\n'
+        "{% endfor %}"
+        "</ElementData>\n"
+    )
+    create_feb_files(feb_template, feb_data=feb_data, output_dir=tmp_path / "febs")
+    feb_str = (tmp_path / "febs" / "zonation_linear_increase__0003.feb").read_text()
+    assert feb_str.count("<e lid=") == len(volume)
+
+    with pytest.raises(ValueError):
+        feb_data_from_zonation_sweep(xdmf_path, fields=["missing"])
+    with pytest.raises(ValueError):
+        zonation_sweep_parameters(patterns, grid={"value": [1.0]})